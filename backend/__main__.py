@@ -1,12 +1,111 @@
-from .app import app
-from .db import init_db
+import argparse
+import contextlib
+import gzip
+import json
+import os
+import sys
+from . import batch, server
 
-def main():
+
+def serve(args):
+    if args.dev:
+        from .app import serving_app
+        serving_app().run(host=args.host, port=args.port, debug=True)
+        return 0
+    if not hasattr(os, "fork"):
+        print("serve: worker processes need os.fork(); use --dev on this platform", file=sys.stderr)
+        return 2
+    from .app import serving_app
+    server.Master(
+        serving_app(), serving_app, host=args.host, port=args.port, workers=args.workers, threads=args.threads,
+        max_requests=args.max_requests, max_requests_jitter=args.max_requests_jitter,
+        graceful_timeout=args.graceful_timeout, access_log=args.access_log,
+    ).run()
+    return 0
+
+
+def _results_command(args):
+    from . import db, materialize
+    from .policy_plan import get_plan
+    db.init_db()
+    with db.DBManager() as d:
+        plan = get_plan(d.conn)
+        if args.command == "rebuild-results":
+            report = {"rows": materialize.rebuild(d.conn, plan)}
+        else:
+            report = materialize.check_consistency(d.conn, plan, deep=args.deep)
+    print(json.dumps(report, indent=2))
+    return 0 if report.get("consistent", True) else 1
+
+
+def _open_output(path):
+    if path in (None, "-"):
+        return contextlib.nullcontext(sys.stdout)
+    if path.endswith(".gz"):
+        return gzip.open(path, "wt", encoding="utf-8", newline="")
+    return open(path, "w", encoding="utf-8", newline="")
+
+
+def _evaluate_command(args):
+    from .evaluators import compile_policies
+    fmt = args.format or ("csv" if (args.out or "").removesuffix(".gz").endswith(".csv") else "ndjson")
+    try:
+        plan = compile_policies(batch.load_policies(args.policies))
+    except (OSError, ValueError) as e:
+        print(f"policies: {e}", file=sys.stderr)
+        return 2
     try:
-        init_db()
-    except Exception:
-        pass
-    app.run(host="127.0.0.1", port=8000, debug=True)
+        with _open_output(args.out) as out:
+            summary = batch.run(args.users, plan, out, fmt, args.workers, args.chunk_size)
+    except (OSError, ValueError) as e:
+        print(f"users: {e}", file=sys.stderr)
+        return 2
+    text = json.dumps(summary, indent=2)
+    if args.summary:
+        with open(args.summary, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text, file=sys.stderr)
+    return 1 if "error" in summary else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m backend")
+    sub = parser.add_subparsers(dest="command")
+    srv = sub.add_parser("serve", help="run the HTTP server with pre-forked worker processes (default)")
+    srv.add_argument("--host", default=server.HOST)
+    srv.add_argument("--port", type=int, default=server.PORT)
+    srv.add_argument("--workers", type=int, default=server.WORKERS, help="worker processes (default: CPU count)")
+    srv.add_argument("--threads", type=int, default=server.THREADS, help="requests each worker handles at once")
+    srv.add_argument("--max-requests", type=int, default=server.MAX_REQUESTS, help="replace a worker after this many requests (0 = never)")
+    srv.add_argument("--max-requests-jitter", type=int, default=server.MAX_REQUESTS_JITTER,
+                     help="add up to this many requests per worker so they are not all replaced at once")
+    srv.add_argument("--graceful-timeout", type=float, default=server.GRACEFUL_TIMEOUT,
+                     help="seconds a stopping worker gets to finish in-flight requests before it is killed")
+    srv.add_argument("--access-log", action="store_true", help="log every request to stderr")
+    srv.add_argument("--dev", action="store_true", help="single-process Werkzeug debug server with reloader")
+    sub.add_parser("rebuild-results", help="recompute the materialized compliance_results table")
+    check = sub.add_parser("check-results", help="verify compliance_results against users x policies")
+    check.add_argument("--deep", action="store_true", help="also recompute and compare every outcome")
+    ev = sub.add_parser("evaluate", help="evaluate a users file against a policies file, without the server or database")
+    ev.add_argument("--users", required=True, help="users .json or .csv (the /upload/users formats)")
+    ev.add_argument("--policies", required=True, help="policies .json or .csv (the /upload/policies formats)")
+    ev.add_argument("-o", "--out", help="results file (.gz is compressed); default stdout")
+    ev.add_argument("--format", choices=batch.FORMATS, help="ndjson (one result per user) or csv (one row per check); "
+                                                      "default from the --out extension, else ndjson")
+    ev.add_argument("--summary", help="write the summary JSON here instead of stderr")
+    ev.add_argument("--workers", type=int, default=batch.WORKERS, help="worker processes (default: CPU count)")
+    ev.add_argument("--chunk-size", type=int, default=batch.CHUNK_SIZE, help="users per worker task")
+    args = parser.parse_args(argv)
+    if args.command is None:
+        args = parser.parse_args(["serve"])
+
+    if args.command in ("rebuild-results", "check-results"):
+        return _results_command(args)
+    if args.command == "evaluate":
+        return _evaluate_command(args)
+    return serve(args)
+
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
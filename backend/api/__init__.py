@@ -3,6 +3,7 @@ from .policies import policies_bp
 from .users import users_bp
 from .evaluate import eval_bp
 from .upload import upload_bp
+from backend import profiling
 
 def register_blueprints(app):
     app.register_blueprint(health_bp)
@@ -10,3 +11,5 @@ def register_blueprints(app):
     app.register_blueprint(users_bp)
     app.register_blueprint(eval_bp)
     app.register_blueprint(upload_bp)
+    if app.config.get("PROFILING_ENABLED"):
+        profiling.instrument(app)
@@ -1,32 +1,409 @@
-from flask import Blueprint, jsonify
-from backend.db import DBManager
-from backend.models import Policies, Users
-from backend.evaluators import evaluate_user
-import json
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context, url_for
+from backend import jobs, metrics, versions
+from backend.db import DBManager, current_db_path
+from backend.http_cache import cached
+from backend.models import ComplianceResults, Policies, PolicyStats, Users
+from backend.evaluators import evaluate_user, evaluate_verdict
+from backend.policy_plan import get_plan, policy_version
+import backend.formats as formats
+import backend.materialize as materialize
+import backend.parallel as parallel
+import backend.pushdown as pushdown
+import backend.vectorized as vectorized
+import backend.verdict as verdict
+from backend.api import listing
 
 eval_bp = Blueprint("evaluate", __name__)
 
-def _decode_policy_value(v):
-    if isinstance(v, str):
-        try:
-            return json.loads(v)
-        except Exception:
-            return v
-    return v
+ENGINES = ("stored", "python", "vector", "sql", "parallel")
+FORMATS = ("json", "bitset")
+MODES = ("full", "verdict")
+VERDICT_ENGINES = ("stored", "python")
+NDJSON = "application/x-ndjson"
+STREAM_CHUNK_BYTES = 64 * 1024
+RESULT_TABLES = (Users.table_name, Policies.table_name, ComplianceResults.table_name)
+MAX_SUBSET = 1000          # users per POST /evaluate subset request
+SUBSET_BATCH = 500         # keys per IN (...) lookup
+
+def _engine_results(conn, plan, engine):
+    if engine == "stored":
+        return materialize.iter_results(conn, plan)
+    if engine == "sql":
+        query = pushdown.PushdownQuery(conn, plan)
+        return query.results(conn.execute(query.select(), query.params))
+    if engine == "vector" and vectorized.available():
+        return vectorized.iter_results(conn, plan)
+    if engine == "parallel":
+        return parallel.iter_results(conn, current_db_path(), plan)
+    return None
+
+def _iter_results(conn, plan, engine):
+    """Yield per-user results lazily from the selected engine (which counts the rows it reads)."""
+    results = _engine_results(conn, plan, engine)
+    if results is None:
+        for u in Users.iter_all(conn):
+            yield evaluate_user(u, plan)
+        return
+    yield from results
+
+def _iter_verdicts(conn, plan, engine):
+    """Verdicts for every user; outcomes of live evaluation are added to policy_stats afterwards."""
+    stats = verdict.VerdictStats(len(plan))
+    yield from verdict.iter_verdicts(conn, plan, engine, stats)
+    if stats.users:
+        with DBManager() as db:
+            verdict.save_stats(db.conn, plan, stats)
+
+def _stream_format():
+    s = (request.args.get("stream") or "").strip().lower()
+    if s in ("1", "true", "yes", "ndjson"):
+        return "ndjson"
+    if s == "array":
+        return "array"
+    if any(mt == NDJSON for mt, _ in request.accept_mimetypes):
+        return "ndjson"
+    return None
+
+def _chunked(parts, size=STREAM_CHUNK_BYTES):
+    """Coalesce small string parts into ~size chunks; the first part is sent at once."""
+    buf, n = [], 0
+    first = True
+    for part in parts:
+        buf.append(part)
+        n += len(part)
+        if first or n >= size:
+            yield "".join(buf)
+            buf, n = [], 0
+            first = False
+    if buf:
+        yield "".join(buf)
+
+def _phase(engine, mode):
+    return f"evaluate.{engine}" if mode == "full" else f"evaluate.{engine}.{mode}"
+
+def _stream_results(engine, fmt, mode="full"):
+    dumps = current_app.json.dumps
+    produce = _iter_verdicts if mode == "verdict" else _iter_results
+    with DBManager(readonly=True) as db:
+        results = metrics.timed_iter(_phase(engine, mode), produce(db.conn, get_plan(db.conn), engine))
+        if fmt == "ndjson":
+            for r in results:
+                yield dumps(r) + "\n"
+        else:
+            yield "["
+            sep = ""
+            for r in results:
+                yield sep + dumps(r)
+                sep = ","
+            yield "]\n"
+
+def _verdict_tables(req):
+    """policy_stats orders mode=verdict results only; other modes do not read it."""
+    return (PolicyStats.table_name,) if req.args.get("mode") == "verdict" else ()
+
+def _fetch_users(conn, column, keys):
+    """Users whose `column` is in keys, by index, SUBSET_BATCH keys per query."""
+    rows = []
+    for i in range(0, len(keys), SUBSET_BATCH):
+        rows += Users.query(conn, [(column, "in", keys[i:i + SUBSET_BATCH])])
+    return rows
+
+def _evaluator(conn, plan, mode):
+    """Per-user evaluation function for the subset endpoints; results carry user_id."""
+    if mode == "verdict":
+        order = verdict.load_order(conn, plan)
+        return lambda u: {"user_id": u["user_id"], **evaluate_verdict(u, plan, order)}
+    return lambda u: {"user_id": u["user_id"], **evaluate_user(u, plan)}
+
+def _subset_keys(body):
+    """(user_ids, usernames) from a POST body, or raise ValueError."""
+    ids = body.get("user_ids") or []
+    names = body.get("usernames") or []
+    if not isinstance(ids, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+        raise ValueError("user_ids must be a list of integers")
+    if not isinstance(names, list) or not all(isinstance(n, str) for n in names):
+        raise ValueError("usernames must be a list of strings")
+    ids, names = list(dict.fromkeys(ids)), list(dict.fromkeys(names))
+    if not ids and not names:
+        raise ValueError("provide user_ids and/or usernames")
+    if len(ids) + len(names) > MAX_SUBSET:
+        raise ValueError(f"at most {MAX_SUBSET} users per request")
+    return ids, names
+
+def _evaluate_subset(body, mode):
+    try:
+        ids, names = _subset_keys(body)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    with DBManager(readonly=True) as db, metrics.phase(_phase("subset", mode)):
+        plan = get_plan(db.conn)
+        by_id = {u["user_id"]: u for u in _fetch_users(db.conn, "user_id", ids)}
+        by_name = {}   # usernames are not unique: every user with a requested name is evaluated
+        for u in _fetch_users(db.conn, "username", names):
+            by_name.setdefault(u["username"], []).append(u)
+        users = [by_id[i] for i in ids if i in by_id]
+        seen = set(by_id)
+        for n in names:
+            for u in by_name.get(n, ()):
+                if u["user_id"] not in seen:
+                    seen.add(u["user_id"])
+                    users.append(u)
+        evaluate = _evaluator(db.conn, plan, mode)
+        results = [evaluate(u) for u in users]
+
+    missing = {
+        "user_ids": [i for i in ids if i not in by_id],
+        "usernames": [n for n in names if n not in by_name],
+    }
+    return jsonify({"results": results, "missing": missing}), 200
+
+@eval_bp.get("/evaluate/<int:user_id>")
+@cached(*RESULT_TABLES, extra=_verdict_tables)
+def evaluate_one(user_id):
+    mode = request.args.get("mode", "full")
+    if mode not in MODES:
+        return jsonify({"error": f"unknown mode '{mode}'. allowed: {list(MODES)}"}), 400
+    with DBManager(readonly=True) as db, metrics.phase(_phase("user", mode)):
+        user = Users.get(db.conn, user_id)
+        if user is None:
+            return jsonify({"error": "not found"}), 404
+        out = _evaluator(db.conn, get_plan(db.conn), mode)(user)
+    return jsonify(out), 200
 
 @eval_bp.route("/evaluate", methods=["GET", "POST"])
+@cached(*RESULT_TABLES, extra=_verdict_tables)
 def run_evaluation():
+    if request.method == "POST" and request.get_data():
+        body = request.get_json(silent=True)
+        if not isinstance(body, dict):
+            return jsonify({"error": "body must be a JSON object with user_ids and/or usernames"}), 400
+        mode = request.args.get("mode", "full")
+        if mode not in MODES:
+            return jsonify({"error": f"unknown mode '{mode}'. allowed: {list(MODES)}"}), 400
+        return _evaluate_subset(body, mode)
+
+    engine = request.args.get("engine", "stored")
+    if engine not in ENGINES:
+        return jsonify({"error": f"unknown engine '{engine}'. allowed: {list(ENGINES)}"}), 400
+    out_format = request.args.get("format", "json")
+    if out_format not in FORMATS:
+        return jsonify({"error": f"unknown format '{out_format}'. allowed: {list(FORMATS)}"}), 400
+    mode = request.args.get("mode", "full")
+    if mode not in MODES:
+        return jsonify({"error": f"unknown mode '{mode}'. allowed: {list(MODES)}"}), 400
+    if mode == "verdict":
+        if engine not in VERDICT_ENGINES:
+            return jsonify({"error": f"mode=verdict supports engines {list(VERDICT_ENGINES)}"}), 400
+        if out_format != "json":
+            return jsonify({"error": "mode=verdict only supports format=json"}), 400
+
+    if out_format == "bitset":
+        with DBManager(readonly=True) as db, metrics.phase(f"evaluate.{engine}.bitset"):
+            plan = get_plan(db.conn)
+            if engine == "vector" and vectorized.available():
+                payload = formats.bitset_from_matrix(vectorized.evaluate_matrix(db.conn, plan))
+            else:
+                payload = formats.bitset_from_results(plan, _iter_results(db.conn, plan, engine))
+        with metrics.phase("evaluate.serialize"):
+            return jsonify(payload), 200
+
+    fmt = _stream_format()
+    if fmt is not None:
+        body = stream_with_context(_chunked(_stream_results(engine, fmt, mode)))
+        return Response(body, status=200, mimetype=NDJSON if fmt == "ndjson" else "application/json")
+
+    produce = _iter_verdicts if mode == "verdict" else _iter_results
+    with DBManager(readonly=True) as db, metrics.phase(_phase(engine, mode)):
+        results = list(produce(db.conn, get_plan(db.conn), engine))
+
+    with metrics.phase("evaluate.serialize"):
+        return jsonify(results), 200
+
+def _job_results(app, db_path, plan, engine):
+    with app.app_context(), DBManager(db_path, readonly=True) as db:   # job threads run with the app's settings
+        yield from metrics.timed_iter(f"evaluate.job.{engine}", _iter_results(db.conn, plan, engine))
+
+def _job_body(job, created=None):
+    body = job.to_dict()
+    body["status_url"] = url_for("evaluate.evaluation_job", job_id=job.id)
+    body["result_url"] = url_for("evaluate.evaluation_job_result", job_id=job.id)
+    if created is not None:
+        body["deduplicated"] = not created
+    return body
+
+@eval_bp.post("/evaluate/jobs")
+def create_evaluation_job():
+    engine = request.args.get("engine", "stored")
+    if engine not in ENGINES:
+        return jsonify({"error": f"unknown engine '{engine}'. allowed: {list(ENGINES)}"}), 400
+
+    app = current_app._get_current_object()
+    db_path = current_db_path()
+    with DBManager(readonly=True) as db:
+        plan = get_plan(db.conn)
+        total = db.conn.execute(f"SELECT COUNT(*) FROM {Users.table_name}").fetchone()[0]
+    key = (db_path, policy_version(), versions.current(Users.table_name), engine)
+    job, created = jobs.submit(
+        key, total, {"engine": engine},
+        lambda: _job_results(app, db_path, plan, engine), app.json.dumps,
+    )
+    body = _job_body(job, created)
+    return jsonify(body), 202, {"Location": body["status_url"]}
+
+@eval_bp.get("/evaluate/jobs/<job_id>")
+def evaluation_job(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "not found"}), 404
+    return jsonify(_job_body(job)), 200
+
+@eval_bp.get("/evaluate/jobs/<job_id>/result")
+def evaluation_job_result(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "not found"}), 404
+    if job.status == "failed":
+        return jsonify({"error": f"job failed: {job.error}"}), 500
+    if job.status != "done":
+        return jsonify({"error": f"job is {job.status}", **_job_body(job)}), 409
+
+    if _stream_format() == "ndjson":
+        return Response(jobs.iter_lines(job), status=200, mimetype=NDJSON)
+
+    def as_array():
+        yield "["
+        sep = ""
+        for line in jobs.iter_lines(job):
+            yield sep + line.rstrip("\n")
+            sep = ","
+        yield "]\n"
+
+    return Response(_chunked(as_array()), status=200, mimetype="application/json")
+
+CHECK_FILTERS = {
+    "user_id": ("user_id", "in", int),
+    "username": ("username", "in", str),
+    "policy_id": ("policy_id", "in", str),
+    "passed": ("passed", "=", listing.bool01),
+}
+
+def _refresh_stale():
+    """Fold writes made outside the API into compliance_results before it is read row by row."""
+    with DBManager(readonly=True) as db:
+        if not materialize.stale_marks(db.conn):
+            return
     with DBManager() as db:
-        pols = []
-        for p in Policies.all(db.conn):
-            pols.append({
-                "policy_id":  p.get("policy_id"),
-                "description": p.get("description"),
-                "field":       p.get("field"),
-                "operator":    p.get("operator"),
-                "value":       _decode_policy_value(p.get("value")),
-            })
-        users = Users.all(db.conn)
-
-    results = [evaluate_user(u, pols) for u in users]
-    return jsonify(results), 200
+        materialize.refresh_stale(db.conn)
+
+def _check_query(args):
+    """(filters, sort, descending) for the flat check endpoints."""
+    filters, _ = listing.parse({k: v for k, v in args.items() if k in CHECK_FILTERS}, CHECK_FILTERS)
+    sort = args.get("sort") or None
+    if sort is not None and sort not in materialize.CHECK_COLUMNS:
+        raise ValueError(f"invalid sort '{sort}'. allowed: {list(materialize.CHECK_COLUMNS)}")
+    order = args.get("order", "asc").lower()
+    if order not in ("asc", "desc"):
+        raise ValueError("order must be 'asc' or 'desc'")
+    return filters, sort, order == "desc"
+
+@eval_bp.get("/evaluate/checks")
+@cached(*RESULT_TABLES)
+def evaluation_checks():
+    try:
+        filters, sort, descending = _check_query(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        limit = int(request.args.get("limit", listing.DEFAULT_LIMIT))
+        offset = int(request.args.get("offset", 0))
+    except ValueError:
+        return jsonify({"error": "limit and offset must be integers"}), 400
+    if not 1 <= limit <= listing.MAX_LIMIT:
+        return jsonify({"error": f"limit must be between 1 and {listing.MAX_LIMIT}"}), 400
+    if offset < 0:
+        return jsonify({"error": "offset must be >= 0"}), 400
+
+    _refresh_stale()
+    with DBManager(readonly=True) as db, metrics.phase("evaluate.checks"):
+        total = materialize.count_checks(db.conn, filters)
+        items = list(materialize.iter_checks(db.conn, filters, sort, descending, limit, offset))
+    return jsonify({"items": items, "total": total, "offset": offset, "limit": limit}), 200
+
+EXPORT_COLUMNS = ("username", "policy_id", "description", "field", "operator", "expected", "actual", "passed", "note")
+
+@eval_bp.get("/evaluate/export")
+def export_checks():
+    try:
+        filters, sort, descending = _check_query(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    columns = [c.strip() for c in request.args.get("columns", "").split(",") if c.strip()] or list(EXPORT_COLUMNS)
+    unknown = [c for c in columns if c not in materialize.CHECK_COLUMNS]
+    if unknown:
+        return jsonify({"error": f"unknown columns {unknown}. allowed: {list(materialize.CHECK_COLUMNS)}"}), 400
+    compress = request.args.get("compress", "")
+    if compress not in ("", "gzip"):
+        return jsonify({"error": "compress must be 'gzip'"}), 400
+
+    _refresh_stale()
+
+    def rows():
+        with DBManager(readonly=True) as db:
+            yield from metrics.timed_iter(
+                "evaluate.export", materialize.iter_checks(db.conn, filters, sort, descending),
+            )
+
+    body = formats.csv_chunks(rows(), columns, STREAM_CHUNK_BYTES)
+    filename = "evaluate.csv"
+    mimetype = "text/csv"
+    if compress:
+        body = formats.gzip_chunks(body)
+        filename += ".gz"
+        mimetype = "application/gzip"
+    return Response(
+        stream_with_context(body), status=200, mimetype=mimetype,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+SUMMARY_GROUP_COLUMNS = tuple(c for c in Users.columns() if c != "password")
+
+def _pct(part, whole):
+    return round(100.0 * part / whole, 2) if whole else 0.0
+
+@eval_bp.get("/evaluate/summary")
+@cached(*RESULT_TABLES)
+def evaluation_summary():
+    group_by = request.args.get("group_by") or None
+    if group_by is not None and group_by not in SUMMARY_GROUP_COLUMNS:
+        return jsonify({"error": f"invalid group_by '{group_by}'. allowed: {list(SUMMARY_GROUP_COLUMNS)}"}), 400
+
+    with DBManager(readonly=True) as db, metrics.phase("evaluate.summary"):
+        plan = get_plan(db.conn)
+        counts = pushdown.aggregate_counts(db.conn, plan, group_by)
+
+    users = counts["users"]
+    policies = []
+    for (_, _, _, t), c in zip(plan.checks, counts["policies"]):
+        policies.append({
+            "policy_id": t["policy_id"],
+            "description": t["description"],
+            "field": t["field"],
+            "operator": t["operator"],
+            "passed": c["passed"],
+            "failed": c["failed"],
+            "missing": c["missing"],
+            "pass_pct": _pct(c["passed"], users),
+        })
+    out = {
+        "users": users,
+        "compliant": counts["compliant"],
+        "compliant_pct": _pct(counts["compliant"], users),
+        "policies": policies,
+    }
+    if group_by:
+        out["group_by"] = group_by
+        out["groups"] = [
+            {**g, "compliant_pct": _pct(g["compliant"], g["users"])} for g in counts["groups"]
+        ]
+    return jsonify(out), 200
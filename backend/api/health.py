@@ -1,7 +1,12 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, Response, jsonify
+from backend import metrics
 
 health_bp = Blueprint("health", __name__)
 
 @health_bp.get("/ping")
 def ping():
     return jsonify({"status": "ok"}), 200
+
+@health_bp.get("/metrics")
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
@@ -0,0 +1,72 @@
+import base64
+import json
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+
+def bool01(v):
+    s = v.strip().lower()
+    if s in ("1", "true", "yes"):
+        return 1
+    if s in ("0", "false", "no"):
+        return 0
+    raise ValueError("expected a boolean")
+
+
+def lower(v):
+    """For columns the validators store lowercased (email, role)."""
+    return v.strip().lower()
+
+
+def encode_cursor(pk):
+    return base64.urlsafe_b64encode(json.dumps(pk).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token):
+    try:
+        return json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    except Exception:
+        raise ValueError("invalid cursor")
+
+
+def parse(args, spec):
+    """Turn query args into (filters, page) for Model.query.
+
+    `spec` maps a query parameter to (column, op, cast); `in` filters take a
+    comma-separated list. `page` is None unless `limit` or `cursor` is given.
+    """
+    filters = []
+    for name, (col, op, cast) in spec.items():
+        raw = args.get(name)
+        if raw is None or raw == "":
+            continue
+        try:
+            value = [cast(x.strip()) for x in raw.split(",")] if op == "in" else cast(raw)
+        except ValueError:
+            raise ValueError(f"invalid value for '{name}': {raw!r}")
+        filters.append((col, op, value))
+
+    if "limit" not in args and "cursor" not in args:
+        return filters, None
+    try:
+        limit = int(args.get("limit", DEFAULT_LIMIT))
+    except ValueError:
+        raise ValueError("limit must be an integer")
+    if not 1 <= limit <= MAX_LIMIT:
+        raise ValueError(f"limit must be between 1 and {MAX_LIMIT}")
+    cursor = args.get("cursor")
+    return filters, {"limit": limit, "after": decode_cursor(cursor) if cursor else None}
+
+
+def fetch(conn, model, filters, page, render):
+    """All matching rows as a list, or one keyset page as {"items", "next"}."""
+    if page is None:
+        return [render(r) for r in model.query(conn, filters)]
+    rows = model.query(conn, filters, after=page["after"], limit=page["limit"] + 1)
+    more = len(rows) > page["limit"]
+    rows = rows[:page["limit"]]
+    return {
+        "items": [render(r) for r in rows],
+        "next": encode_cursor(rows[-1][model.pk_name]) if more else None,
+    }
@@ -1,11 +1,20 @@
 from flask import Blueprint, request, jsonify
 from backend.db import DBManager
+from backend.http_cache import cached
 from backend.models import Policies
 import backend.validators as validators
+import backend.materialize as materialize
+from backend.api import listing
+from backend.policy_plan import get_plan
 import json
 
 policies_bp = Blueprint("policies", __name__)
 
+_FILTERS = {
+    "field": ("field", "=", str),
+    "operator": ("operator", "in", str),
+}
+
 def _to_db_policy(p):
     v = p.get("value")
     if not isinstance(v, str):
@@ -36,19 +45,19 @@ def _from_db_policy(r):
         "value": v,
     }
 
-def _save_policy(conn, db_obj):
-    existing = Policies.get(conn, db_obj["policy_id"])
-    if existing:
-        Policies.update(conn, db_obj["policy_id"], **db_obj)
-        return "updated"
-    Policies.insert(conn, **db_obj)
-    return "inserted"
+def _refresh(conn, policy_ids):
+    """After a committed policy write (the model bumped the policy version): recompute those result columns."""
+    materialize.refresh_policies(conn, get_plan(conn), policy_ids)
 
 @policies_bp.get("/policies")
+@cached(Policies.table_name)
 def list_policies():
+    try:
+        filters, page = listing.parse(request.args, _FILTERS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     with DBManager() as db:
-        items = Policies.all(db.conn)
-    out = [_from_db_policy(r) for r in items]
+        out = listing.fetch(db.conn, Policies, filters, page, _from_db_policy)
     return jsonify(out), 200
 
 @policies_bp.get("/policies/<policy_id>")
@@ -66,17 +75,15 @@ def create_policies():
         return jsonify({"error": "missing JSON body"}), 400
     payload = data if isinstance(data, list) else [data]
 
-    validated = []
-    for p in payload:
-        try:
-            validated.append(validators.validate_policy(p))
-        except ValueError as e:
-            return jsonify({"error": str(e), "bad_policy": p}), 400
+    validated, errors = validators.validate_policies(payload, batch=True)
+    if errors:
+        first = errors[0]
+        return jsonify({"error": first["error"], "bad_policy": payload[first["row"] - 1], "errors": errors}), 400
 
     with DBManager() as db:
-        for p in validated:
-            db_obj = _to_db_policy(p)
-            _save_policy(db.conn, db_obj)
+        rows = [_to_db_policy(p) for p in validated]
+        Policies.upsert_many(db.conn, rows)
+        _refresh(db.conn, [r["policy_id"] for r in rows])
 
     return jsonify({"stored": len(validated)}), 201
 
@@ -93,7 +100,8 @@ def put_policy(policy_id):
     obj["id"] = policy_id
     db_obj = _to_db_policy(obj)
     with DBManager() as db:
-        _save_policy(db.conn, db_obj)
+        Policies.upsert(db.conn, **db_obj)
+        _refresh(db.conn, [db_obj["policy_id"]])
     return jsonify({"updated": policy_id}), 200
 
 @policies_bp.patch("/policies/<policy_id>")
@@ -118,7 +126,8 @@ def patch_policy(policy_id):
             return jsonify({"error": str(e)}), 400
 
         db_obj = _to_db_policy(merged_valid)
-        _save_policy(db.conn, db_obj)
+        Policies.upsert(db.conn, **db_obj)
+        _refresh(db.conn, [db_obj["policy_id"]])
 
     return jsonify({"updated": policy_id}), 200
 
@@ -126,6 +135,7 @@ def patch_policy(policy_id):
 def delete_policy(policy_id):
     with DBManager() as db:
         removed = Policies.delete(db.conn, policy_id)
+        _refresh(db.conn, [policy_id])
     if removed == 0:
         return jsonify({"error": "not found"}), 404
     return ("", 204)
@@ -1,57 +1,107 @@
-import io, json, csv
+import json
 from flask import Blueprint, request, jsonify
 from backend.db import DBManager
 from backend.models import Policies, Users
+import backend.ingest as ingest
+import backend.materialize as materialize
 import backend.validators as validators
+from backend.policy_plan import get_plan
 
 upload_bp = Blueprint("upload", __name__, url_prefix="/upload")
 
 def _truthy(v):
     return str(v).strip().lower() in ("1", "true", "yes", "y", "on")
 
-def _coerce_policy_value(op, raw):
-    s = str(raw).strip()
-    if op == "in":
-        if s.startswith("["):
-            try:
-                v = json.loads(s)
-                return v if isinstance(v, list) else [s]
-            except Exception:
-                pass
-        return [x.strip() for x in s.split(",")] if s else []
-    if op == "includes":
-        return s
-    try:
-        if s and s.lower() not in ("true", "false", "null"):
-            n = float(s)
-            return int(n) if n.is_integer() else n
-    except Exception:
-        pass
-    if s.lower() == "true":
-        return True
-    if s.lower() == "false":
-        return False
-    if s.startswith("{") or s.startswith("["):
+def _to_db_policy(p):
+    v = p.get("value")
+    if not isinstance(v, str):
         try:
-            return json.loads(s)
+            v = json.dumps(v)
         except Exception:
-            pass
-    return raw
-
-def _policies_from_csv(file_stream):
-    text = file_stream.read().decode("utf-8", errors="ignore")
-    rd = csv.DictReader(io.StringIO(text))
-    items = []
-    for row in rd:
-        op = (row.get("operator") or "").strip()
-        items.append({
-            "policy_id": (row.get("policy_id") or row.get("id") or "").strip(),
-            "description": (row.get("description") or "").strip(),
-            "field": (row.get("field") or "").strip(),
-            "operator": op,
-            "value": _coerce_policy_value(op, row.get("value")),
-        })
-    return items
+            v = str(v)
+    return {
+        "policy_id": p["policy_id"],
+        "description": p.get("description"),
+        "field": p.get("field"),
+        "operator": p.get("operator"),
+        "value": v,
+    }
+
+def _prepare_user(u):
+    vu = validators.validate_user(u)
+    return {k: vu.get(k) for k in Users.db_columns.keys() if k != "user_id"}
+
+def _prepare_policy(p):
+    return _to_db_policy(validators.validate_policy(p))
+
+def _reader(f, from_csv_row, from_json_item):
+    """A function that lazily parses the uploaded file from the start; None if the extension is unsupported."""
+    if ingest.read_items(f.filename, f.stream, from_csv_row, from_json_item) is None:
+        return None
+
+    def read():
+        f.stream.seek(0)
+        return ingest.read_items(f.filename, f.stream, from_csv_row, from_json_item)
+    return read
+
+def _run_upload(model, read, prepare, write_rows, clear, dry_run=False):
+    """Stream items into `model` in batches; clear the table right before the first write.
+
+    With `dry_run` the whole file is validated and nothing is written. With
+    `clear` the file is parsed once beforehand, so a malformed file leaves the
+    table untouched instead of wiped and partly loaded.
+    """
+    if dry_run:
+        report = ingest.ingest(read(), prepare, lambda rows: None, batch_size=model.batch_size)
+        body = {
+            "dry_run": True,
+            "valid": report["accepted"],
+            "rejected": report["rejected"],
+            "errors": report["errors"],
+            "errors_by_field": report["errors_by_field"],
+        }
+        if "error" in report:
+            body["error"] = report["error"]
+            return jsonify(body), 400
+        return jsonify(body), 200
+
+    if clear:
+        error = ingest.parse_error(read())
+        if error is not None:
+            body = {"stored": 0, "rejected": 0, "errors": [], "errors_by_field": {}, "cleared": False, "error": error}
+            return jsonify(body), 400
+
+    state = {"cleared": False}
+
+    def do_clear(conn):
+        if clear and not state["cleared"]:
+            model.delete_all(conn)
+            materialize.clear(conn)
+            state["cleared"] = True
+
+    with DBManager() as db:
+        def write(rows):
+            do_clear(db.conn)
+            write_rows(db.conn, rows)
+
+        report = ingest.ingest(read(), prepare, write, batch_size=model.batch_size)
+        if "error" not in report and report["rejected"] == 0:
+            do_clear(db.conn)
+
+    body = {
+        "stored": report["accepted"],
+        "rejected": report["rejected"],
+        "errors": report["errors"],
+        "errors_by_field": report["errors_by_field"],
+        "cleared": state["cleared"],
+    }
+    if "error" in report:
+        body["error"] = report["error"]
+        return jsonify(body), 400
+    if report["accepted"] == 0 and report["rejected"]:
+        body["error"] = report["errors"][0]["error"]
+        return jsonify(body), 400
+    return jsonify(body), 201
 
 @upload_bp.post("/policies")
 def upload_policies():
@@ -60,69 +110,19 @@ def upload_policies():
 
     f = request.files["file"]
     clear = _truthy(request.form.get("clear"))
+    read = _reader(f, ingest.policy_from_csv_row, ingest.policy_from_json_item)
+    if read is None:
+        return jsonify({"error": "unsupported file type; use .json or .csv"}), 400
+
+    def write_rows(conn, rows):
+        Policies.upsert_many(conn, rows, batch_size=len(rows))
+        materialize.refresh_policies(conn, get_plan(conn), [r["policy_id"] for r in rows])
 
     try:
-        if f.filename.lower().endswith(".json"):
-            payload = json.load(f.stream)
-            items = payload if isinstance(payload, list) else [payload]
-            fixed = []
-            for p in items:
-                p = dict(p)
-                if "policy_id" not in p and "id" in p:
-                    p["policy_id"] = p.pop("id")
-                fixed.append(p)
-            validated = validators.validate_policies(fixed)
-        elif f.filename.lower().endswith(".csv"):
-            items = _policies_from_csv(f.stream)
-            validated = validators.validate_policies(items)
-        else:
-            return jsonify({"error": "unsupported file type; use .json or .csv"}), 400
-
-        with DBManager() as db:
-            if clear:
-                Policies.delete_all(db.conn)
-            for p in validated:
-                v = p.get("value")
-                if not isinstance(v, str):
-                    try:
-                        v = json.dumps(v)
-                    except Exception:
-                        v = str(v)
-                Policies.upsert(
-                    db.conn,
-                    policy_id=p["policy_id"],
-                    description=p.get("description"),
-                    field=p.get("field"),
-                    operator=p.get("operator"),
-                    value=v,
-                )
-        return jsonify({"stored": len(validated), "cleared": bool(clear)}), 201
-
-    except ValueError as e:
-        return jsonify({"error": str(e)}), 400
+        return _run_upload(Policies, read, _prepare_policy, write_rows, clear, _truthy(request.form.get("dry_run")))
     except Exception as e:
         return jsonify({"error": f"failed to process file: {str(e)}"}), 500
 
-def _users_from_csv(file_stream):
-    text = file_stream.read().decode("utf-8", errors="ignore")
-    rd = csv.DictReader(io.StringIO(text))
-    out = []
-    for row in rd:
-        r = dict(row)
-        v = (r.get("mfa_enabled") or "").strip().lower()
-        if v in ("1", "true", "yes", "y"):
-            r["mfa_enabled"] = 1
-        elif v in ("0", "false", "no", "n"):
-            r["mfa_enabled"] = 0
-        for k in ("age", "age_days", "login_count", "income"):
-            if k in r and r[k] not in (None, ""):
-                try:
-                    r[k] = float(r[k]) if k == "income" else int(float(r[k]))
-                except Exception:
-                    pass
-        out.append(r)
-    return out
-
 @upload_bp.post("/users")
 def upload_users():
     if "file" not in request.files:
@@ -130,31 +130,15 @@ def upload_users():
 
     f = request.files["file"]
     clear = _truthy(request.form.get("clear"))
+    read = _reader(f, ingest.user_from_csv_row, lambda u: u)
+    if read is None:
+        return jsonify({"error": "unsupported file type; use .json or .csv"}), 400
+
+    def write_rows(conn, rows):
+        ids = Users.insert_many(conn, rows, batch_size=len(rows))
+        materialize.refresh_users(conn, get_plan(conn), ids)
 
     try:
-        if f.filename.lower().endswith(".json"):
-            payload = json.load(f.stream)
-            items = payload if isinstance(payload, list) else [payload]
-        elif f.filename.lower().endswith(".csv"):
-            items = _users_from_csv(f.stream)
-        else:
-            return jsonify({"error": "unsupported file type; use .json or .csv"}), 400
-
-        prepared = []
-        for u in items:
-            vu = validators.validate_user(u)
-            db_obj = {k: vu.get(k) for k in Users.db_columns.keys() if k != "user_id"}
-            prepared.append(db_obj)
-
-        with DBManager() as db:
-            if clear:
-                Users.delete_all(db.conn)
-            for obj in prepared:
-                Users.insert(db.conn, **obj)
-
-        return jsonify({"stored": len(prepared), "cleared": bool(clear)}), 201
-
-    except ValueError as e:
-        return jsonify({"error": str(e)}), 400
+        return _run_upload(Users, read, _prepare_user, write_rows, clear, _truthy(request.form.get("dry_run")))
     except Exception as e:
         return jsonify({"error": f"failed to process file: {str(e)}"}), 500
@@ -1,7 +1,11 @@
 from flask import Blueprint, request, jsonify
 from backend.db import DBManager
+from backend.http_cache import cached
 from backend.models import Users
+import backend.materialize as materialize
 import backend.validators as validators
+from backend.api import listing
+from backend.policy_plan import get_plan
 
 users_bp = Blueprint("users", __name__)
 
@@ -10,6 +14,19 @@ _PUBLIC_FIELDS = [
     "mfa_enabled", "login_count", "age_days", "age", "income",
 ]
 
+_FILTERS = {
+    "role": ("role", "in", listing.lower),
+    "username": ("username", "=", str),
+    "email": ("email", "=", listing.lower),
+    "mfa_enabled": ("mfa_enabled", "=", listing.bool01),
+    "age_min": ("age", ">=", int),
+    "age_max": ("age", "<=", int),
+    "income_min": ("income", ">=", float),
+    "income_max": ("income", "<=", float),
+    "login_count_min": ("login_count", ">=", int),
+    "login_count_max": ("login_count", "<=", int),
+}
+
 def _pick_public(r):
     return {k: r.get(k) for k in _PUBLIC_FIELDS if k in r}
 
@@ -18,10 +35,14 @@ def _prepare_db_obj(valid_user):
     return {k: v for k, v in out.items() if k in Users.db_columns and k != "user_id"}
 
 @users_bp.get("/users")
+@cached(Users.table_name)
 def list_users():
+    try:
+        filters, page = listing.parse(request.args, _FILTERS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     with DBManager() as db:
-        rows = Users.all(db.conn)
-    out = [_pick_public(r) for r in rows]
+        out = listing.fetch(db.conn, Users, filters, page, _pick_public)
     return jsonify(out), 200
 
 @users_bp.get("/users/<int:user_id>")
@@ -39,20 +60,14 @@ def create_users():
         return jsonify({"error": "missing JSON body"}), 400
     payload = data if isinstance(data, list) else [data]
 
-    validated = []
-    for u in payload:
-        try:
-            vu = validators.validate_user(u)
-            validated.append(vu)
-        except ValueError as e:
-            return jsonify({"error": str(e), "bad_user": u}), 400
+    validated, errors = validators.validate_users(payload, batch=True)
+    if errors:
+        first = errors[0]
+        return jsonify({"error": first["error"], "bad_user": payload[first["row"] - 1], "errors": errors}), 400
 
-    created_ids = []
     with DBManager() as db:
-        for vu in validated:
-            db_obj = _prepare_db_obj(vu)
-            new_id = Users.insert(db.conn, **db_obj)
-            created_ids.append(new_id)
+        created_ids = Users.insert_many(db.conn, [_prepare_db_obj(vu) for vu in validated])
+        materialize.refresh_users(db.conn, get_plan(db.conn), created_ids)
     return jsonify({"created_ids": created_ids}), 201
 
 @users_bp.put("/users/<int:user_id>")
@@ -71,6 +86,7 @@ def put_user(user_id):
             return jsonify({"error": "not found"}), 404
         db_obj = _prepare_db_obj(vu)
         updated = Users.update(db.conn, user_id, **db_obj)
+        materialize.refresh_users(db.conn, get_plan(db.conn), [user_id])
 
     if updated == 0:
         return jsonify({"updated": user_id, "note": "no changes"}), 200
@@ -96,6 +112,7 @@ def patch_user(user_id):
 
         db_obj = _prepare_db_obj(vu)
         updated = Users.update(db.conn, user_id, **db_obj)
+        materialize.refresh_users(db.conn, get_plan(db.conn), [user_id])
 
     if updated == 0:
         return jsonify({"updated": user_id, "note": "no changes"}), 200
@@ -105,6 +122,8 @@ def patch_user(user_id):
 def delete_user(user_id):
     with DBManager() as db:
         removed = Users.delete(db.conn, user_id)
+        if removed:
+            materialize.refresh_users(db.conn, get_plan(db.conn), [user_id])
     if removed == 0:
         return jsonify({"error": "not found"}), 404
     return ("", 204)
@@ -1,16 +1,100 @@
 from flask import Flask
-from backend.db import init_db
+from backend import db, http_cache, jobs, materialize, metrics, parallel, profiling
 from backend.api import register_blueprints
+from backend.policy_plan import get_plan
 
 
-def create_app():
+def create_app(config=None):
+    """Build the app; its settings apply while it handles a request or its app context is pushed.
+
+    Other apps in the same process keep their own settings. No database work
+    happens here; see startup().
+    """
     app = Flask(__name__)
+    app.config.from_mapping(
+        DB_PATH=str(db.DB_PATH),
+        DB_POOL_SIZE=db.POOL_SIZE,
+        DB_POOL_TIMEOUT=db.POOL_TIMEOUT,
+        DB_JOURNAL_MODE=db.PRAGMAS["journal_mode"],
+        DB_SYNCHRONOUS=db.PRAGMAS["synchronous"],
+        DB_MMAP_SIZE=db.PRAGMAS["mmap_size"],
+        DB_CACHE_SIZE=db.PRAGMAS["cache_size"],
+        DB_BUSY_TIMEOUT=db.PRAGMAS["busy_timeout"],
+        EVAL_WORKERS=parallel.WORKERS,
+        EVAL_PARALLEL_THRESHOLD=parallel.THRESHOLD,
+        EVAL_CHUNK_SIZE=parallel.CHUNK_SIZE,
+        EVAL_JOB_WORKERS=jobs.WORKERS,
+        EVAL_JOB_TTL=jobs.TTL,
+        EVAL_JOB_DIR=str(jobs.JOBS_DIR),
+        HTTP_CACHE_ENABLED=True,
+        HTTP_CACHE_BYTES=http_cache.MAX_BYTES,
+        RESULTS_CHECK_ON_START=True,
+        METRICS_ENABLED=True,
+        PROFILING_ENABLED=False,
+        PROFILE_TOKEN=None,
+        PROFILE_DIR=str(profiling.PROFILE_DIR),
+        PROFILE_TOP_N=profiling.TOP_N,
+        PROFILE_SAMPLE_INTERVAL=profiling.SAMPLE_INTERVAL,
+    )
+    if config:
+        app.config.update(config)
+    db.configure(
+        db_path=app.config["DB_PATH"],
+        pool_size=app.config["DB_POOL_SIZE"],
+        timeout=app.config["DB_POOL_TIMEOUT"],
+        pragmas={
+            "journal_mode": app.config["DB_JOURNAL_MODE"],
+            "synchronous": app.config["DB_SYNCHRONOUS"],
+            "mmap_size": app.config["DB_MMAP_SIZE"],
+            "cache_size": app.config["DB_CACHE_SIZE"],
+            "busy_timeout": app.config["DB_BUSY_TIMEOUT"],
+        },
+        app=app,
+    )
+    parallel.configure(
+        workers=app.config["EVAL_WORKERS"],
+        threshold=app.config["EVAL_PARALLEL_THRESHOLD"],
+        chunk_size=app.config["EVAL_CHUNK_SIZE"],
+        app=app,
+    )
+    jobs.configure(
+        workers=app.config["EVAL_JOB_WORKERS"],
+        ttl=app.config["EVAL_JOB_TTL"],
+        directory=app.config["EVAL_JOB_DIR"],
+        app=app,
+    )
+    http_cache.configure(
+        enabled=app.config["HTTP_CACHE_ENABLED"], max_bytes=app.config["HTTP_CACHE_BYTES"], app=app,
+    )
+    metrics.configure(enabled=app.config["METRICS_ENABLED"], app=app)
     register_blueprints(app)
+    if app.config["METRICS_ENABLED"]:
+        metrics.init_app(app)
+    return app
+
+
+def startup(app):
+    """Start-up database work before serving: schema bootstrap and the compliance_results check."""
+    with app.app_context():
+        db.init_db()  # once per server, not per request
+        if app.config["RESULTS_CHECK_ON_START"]:
+            with db.DBManager() as d:
+                materialize.ensure_consistent(d.conn, get_plan(d.conn))
     return app
 
 
-app = create_app()
+def serving_app(config=None):
+    """create_app() followed by startup(); the factory for `python -m backend serve` and `flask run`."""
+    return startup(create_app(config))
+
+
+def __getattr__(name):
+    """`backend.app:app` for WSGI servers: serving_app() with the defaults, built on first access."""
+    if name == "app":
+        globals()["app"] = serving_app()
+        return globals()["app"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 if __name__ == "__main__":
-    init_db()  # ensure tables once at startup
-    app.run(host="127.0.0.1", port=8000, debug=True)
+    serving_app().run(host="127.0.0.1", port=8000, debug=True)
@@ -0,0 +1,186 @@
+import csv
+import json
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from backend import formats, ingest, validators
+from backend.evaluators import evaluate_user
+from backend.models import Users
+from backend.policy_plan import decode_policy_value
+
+WORKERS = os.cpu_count() or 1   # worker processes for offline evaluation
+CHUNK_SIZE = 2000               # users per worker task
+FORMATS = ("ndjson", "csv")
+CSV_COLUMNS = ("username", "policy_id", "description", "field", "operator", "expected", "actual", "passed", "note")
+
+_USER_COLUMNS = [k for k in Users.db_columns if k != "user_id"]
+_plan = None   # compiled plan of a worker process, set by _init_worker
+
+
+def load_policies(path):
+    """Validated policies from a .json/.csv file in the /upload/policies formats.
+
+    Values go through the same text round trip as policies stored by the
+    server, and a repeated policy_id replaces the earlier row (as an upsert
+    would). Raises validators.ValidationError listing every bad row.
+    """
+    with open(path, "rb") as f:
+        items = ingest.read_items(path, f, ingest.policy_from_csv_row, ingest.policy_from_json_item)
+        if items is None:
+            raise ValueError(f"unsupported policies file '{path}'; use .json or .csv")
+        valid, errors = validators.validate_batch("policies", list(items))
+    if errors:
+        raise validators.ValidationError([(None, f"row {e['row']}: {e['error']}") for e in errors])
+    by_id = {}
+    for p in valid:
+        v = p["value"]
+        by_id[p["policy_id"]] = {**p, "value": decode_policy_value(v if isinstance(v, str) else json.dumps(v))}
+    return list(by_id.values())
+
+
+def _init_worker(plan):
+    global _plan
+    _plan = plan
+
+
+def _evaluate_chunk(start, items, fmt, plan=None):
+    """Validate and evaluate one chunk of raw user items; returns (serialized text, stats)."""
+    if plan is None:
+        plan = _plan
+    results, errors, by_field = [], [], {}
+    rejected = compliant = 0
+    passed = [0] * len(plan)
+    for row, item in enumerate(items, start=start):
+        vu, errs = validators.check_user(item)
+        if errs:
+            rejected += 1
+            for field, message in errs:
+                key = field or "_row"
+                by_field[key] = by_field.get(key, 0) + 1
+                if len(errors) < ingest.MAX_REPORTED_ERRORS:
+                    errors.append({"row": row, "field": field, "error": message})
+            continue
+        r = evaluate_user({k: vu.get(k) for k in _USER_COLUMNS}, plan)
+        compliant += r["overall_compliant"]
+        for j, c in enumerate(r["checks"]):
+            if c["passed"]:
+                passed[j] += 1
+        results.append(r)
+
+    if fmt == "csv":
+        checks = ({"username": r["username"], **c} for r in results for c in r["checks"])
+        text = "".join(formats.csv_chunks(checks, CSV_COLUMNS, header=False))
+    else:
+        text = "".join(json.dumps(r, default=str) + "\n" for r in results)
+    stats = {
+        "evaluated": len(results),
+        "rejected": rejected,
+        "compliant": compliant,
+        "passed": passed,
+        "errors": errors,
+        "errors_by_field": by_field,
+    }
+    return text, stats
+
+
+def _read_chunks(items, size, state):
+    """(first row number, items) chunks; a malformed file ends the stream and sets state["error"]."""
+    chunk, start, row = [], 1, 0
+    try:
+        for row, item in enumerate(items, start=1):
+            chunk.append(item)
+            if len(chunk) >= size:
+                yield start, chunk
+                chunk, start = [], row + 1
+    except (ValueError, csv.Error) as e:
+        state["error"] = f"row {row + 1}: {e}"
+    if chunk:
+        yield start, chunk
+
+
+def _ordered(executor, tasks, fmt, window):
+    """Run tasks on the pool with at most `window` in flight, yielding results in order."""
+    pending = deque()
+    for start, chunk in tasks:
+        pending.append(executor.submit(_evaluate_chunk, start, chunk, fmt))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def _pct(part, whole):
+    return round(100.0 * part / whole, 2) if whole else 0.0
+
+
+def run(users_path, plan, out, fmt="ndjson", workers=WORKERS, chunk_size=CHUNK_SIZE):
+    """Evaluate a users .json/.csv file against `plan`, writing one result per valid user to `out`.
+
+    Users are parsed as a stream in the /upload/users formats and validated and
+    evaluated in `workers` processes, `chunk_size` users per task with at most
+    two tasks per worker in flight, so memory does not grow with the file.
+    Output is ndjson (evaluate_user results) or csv (one row per check).
+    Returns the summary.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown format '{fmt}'. allowed: {list(FORMATS)}")
+    t0 = time.perf_counter()
+    totals = {"evaluated": 0, "rejected": 0, "compliant": 0, "passed": [0] * len(plan)}
+    errors, by_field, state = [], {}, {}
+    if fmt == "csv":
+        out.write("".join(formats.csv_chunks((), CSV_COLUMNS)))
+
+    with open(users_path, "rb") as f:
+        items = ingest.read_items(users_path, f, ingest.user_from_csv_row, lambda u: u)
+        if items is None:
+            raise ValueError(f"unsupported users file '{users_path}'; use .json or .csv")
+        tasks = _read_chunks(items, chunk_size, state)
+        executor = None
+        if workers > 1:
+            executor = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker, initargs=(plan,),
+            )
+            results = _ordered(executor, tasks, fmt, 2 * workers)
+        else:
+            results = (_evaluate_chunk(start, chunk, fmt, plan) for start, chunk in tasks)
+        try:
+            for text, stats in results:
+                out.write(text)
+                for k in ("evaluated", "rejected", "compliant"):
+                    totals[k] += stats[k]
+                totals["passed"] = [a + b for a, b in zip(totals["passed"], stats["passed"])]
+                errors.extend(stats["errors"][:ingest.MAX_REPORTED_ERRORS - len(errors)])
+                for k, n in stats["errors_by_field"].items():
+                    by_field[k] = by_field.get(k, 0) + n
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+
+    evaluated = totals["evaluated"]
+    seconds = time.perf_counter() - t0
+    summary = {
+        "users": evaluated + totals["rejected"],
+        "evaluated": evaluated,
+        "rejected": totals["rejected"],
+        "compliant": totals["compliant"],
+        "compliant_pct": _pct(totals["compliant"], evaluated),
+        "policies": [
+            {
+                "policy_id": t["policy_id"],
+                "passed": n,
+                "failed": evaluated - n,
+                "pass_pct": _pct(n, evaluated),
+            }
+            for (_, _, _, t), n in zip(plan.checks, totals["passed"])
+        ],
+        "errors": errors,
+        "errors_by_field": by_field,
+        "seconds": round(seconds, 3),
+        "users_per_sec": round(evaluated / seconds) if seconds else None,
+    }
+    if "error" in state:
+        summary["error"] = state["error"]
+    return summary
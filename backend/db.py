@@ -1,45 +1,212 @@
+import atexit
 import sqlite3
+import threading
 from pathlib import Path
-from backend.models import Users, Policies
+from backend import metrics
+from backend.settings import Settings
+from backend.models import Users, Policies, ComplianceResults, PolicyStats
 
 DB_PATH = Path(__file__).parent / ".." / "data" / "compliance.db"
+POOL_SIZE = 8          # max open connections per database file
+POOL_TIMEOUT = 30.0    # seconds to wait for a free connection
 
+# storage profile applied to every connection
+PRAGMAS = {
+    "journal_mode": "WAL",       # readers and one writer proceed concurrently
+    "synchronous": "NORMAL",     # WAL-safe; fsync at checkpoints instead of every commit
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -32 * 1024,    # KiB (negative) per connection
+    "busy_timeout": 5000,        # ms to wait on a locked database
+}
 
-def get_conn():
-    return sqlite3.connect(DB_PATH)
+MODELS = (Users, Policies, ComplianceResults, PolicyStats)
+
+_settings = Settings("db", {"db_path": DB_PATH, "pool_size": POOL_SIZE, "timeout": POOL_TIMEOUT, "pragmas": dict(PRAGMAS)})
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def connect(db_path, readonly=False, pragmas=None):
+    """Open a connection with the storage profile applied; `readonly` opens the file with mode=ro."""
+    pragmas = _settings["pragmas"] if pragmas is None else pragmas
+    timeout = pragmas.get("busy_timeout", 5000) / 1000.0
+    if readonly:
+        uri = Path(db_path).resolve().as_uri() + "?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, timeout=timeout, check_same_thread=False)
+    else:
+        conn = sqlite3.connect(db_path, timeout=timeout, check_same_thread=False)
+    for name, value in pragmas.items():
+        if readonly and name == "journal_mode":
+            continue  # persisted in the file; set by the writer
+        conn.execute(f"PRAGMA {name} = {value}")
+    return conn
+
+
+def get_conn(db_path=None, readonly=False):
+    return connect(db_path or _settings["db_path"], readonly=readonly)
 
 
 def _ensure_tables(conn):
-    Users.create_table(conn)
-    Policies.create_table(conn)
+    for model in MODELS:
+        model.create_table(conn)
 
 
-def init_db():
-    conn = get_conn()
+def init_db(db_path=None):
+    """Create the schema; run once at startup, not per request."""
+    conn = get_conn(db_path)
     try:
         _ensure_tables(conn)
     finally:
         conn.close()
 
 
+class ConnectionPool:
+    """Bounded pool of reusable SQLite connections for one database file."""
+
+    def __init__(self, db_path, size=POOL_SIZE, timeout=POOL_TIMEOUT, readonly=False, pragmas=None):
+        self.db_path = db_path
+        self.size = size
+        self.timeout = timeout
+        self.readonly = readonly
+        self.pragmas = pragmas
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._idle = []
+        self._local = threading.local()
+        self._closed = False
+
+    def _connect(self):
+        return connect(self.db_path, readonly=self.readonly, pragmas=self.pragmas)
+
+    @staticmethod
+    def _healthy(conn):
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _take_idle(self):
+        with self._lock:
+            mine = getattr(self._local, "conn", None)
+            for i, c in enumerate(self._idle):
+                if c is mine:
+                    return self._idle.pop(i)
+            return self._idle.pop() if self._idle else None
+
+    def acquire(self):
+        """Borrow a ready connection, preferring the one this thread used last."""
+        if self._closed:
+            raise RuntimeError("connection pool is closed")
+        with metrics.phase("db.acquire"):
+            if not self._slots.acquire(timeout=self.timeout):
+                raise TimeoutError(f"no database connection available within {self.timeout}s")
+            try:
+                conn = self._take_idle()
+                if conn is not None and not self._healthy(conn):
+                    conn.close()
+                    conn = None
+                return conn if conn is not None else self._connect()
+            except Exception:
+                self._slots.release()
+                raise
+
+    def release(self, conn):
+        """Return a connection; uncommitted work is rolled back."""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            keep = True
+        except sqlite3.Error:
+            keep = False
+        with self._lock:
+            if keep and not self._closed:
+                self._idle.append(conn)
+                self._local.conn = conn
+            else:
+                conn.close()
+        self._slots.release()
+
+    def close(self):
+        """Close idle connections; borrowed ones are closed when released."""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for c in idle:
+            c.close()
+
+
+def configure(db_path=None, pool_size=None, timeout=None, pragmas=None, app=None):
+    """Set the default database file, pool limits and storage PRAGMAs used by DBManager.
+
+    With `app` they apply to that Flask app only and open pools are kept.
+    """
+    values = {}
+    if db_path is not None:
+        values["db_path"] = db_path
+    if pool_size is not None:
+        values["pool_size"] = int(pool_size)
+    if timeout is not None:
+        values["timeout"] = float(timeout)
+    if pragmas is not None:
+        values["pragmas"] = {k: v for k, v in {**PRAGMAS, **pragmas}.items() if v is not None}
+    _settings.update(values, app)
+    if app is None:
+        close_pools()
+
+
+def current_db_path():
+    return str(_settings["db_path"])
+
+
+def get_pool(db_path=None, readonly=False):
+    """The pool for this file under the active settings; apps with different pool settings get their own."""
+    size, timeout, pragmas = _settings["pool_size"], _settings["timeout"], _settings["pragmas"]
+    key = (str(db_path or _settings["db_path"]), readonly, size, timeout, tuple(sorted(pragmas.items())))
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = ConnectionPool(key[0], size, timeout, readonly, pragmas)
+                _pools[key] = pool
+    return pool
+
+
+def close_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for p in pools:
+        p.close()
+
+
+atexit.register(close_pools)
+
+
 class DBManager:
-    def __init__(self, db_path=DB_PATH):
+    """Borrow a pooled connection; readonly=True uses the separate read-only pool."""
+
+    def __init__(self, db_path=None, readonly=False):
         self.db_path = db_path
+        self.readonly = readonly
+        self._pool = None
         self._conn = None
 
     def __enter__(self):
-        self._conn = sqlite3.connect(self.db_path)
-        _ensure_tables(self._conn)
+        self._pool = get_pool(self.db_path, self.readonly)
+        self._conn = self._pool.acquire()
         return self
 
     def __exit__(self, exc_type, exc, tb):
         if self._conn is not None:
-            self._conn.close()
+            self._pool.release(self._conn)
         self._conn = None
+        self._pool = None
 
     @property
     def conn(self):
         if self._conn is None:
-            self._conn = sqlite3.connect(self.db_path)
-            _ensure_tables(self._conn)
+            self._pool = get_pool(self.db_path, self.readonly)
+            self._conn = self._pool.acquire()
         return self._conn
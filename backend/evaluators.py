@@ -1,3 +1,6 @@
+import time
+from backend import metrics
+
 OPS = {
     "==": lambda a, b: a == b,
     "!=": lambda a, b: a != b,
@@ -10,51 +13,128 @@ OPS = {
 }
 
 
+def _in_members(a, b):
+    members, items = b
+    try:
+        return a in members
+    except TypeError:
+        return a in items
+
+
+def _compile_operand(operator, expected):
+    """Return (fn, operand) with the expected value normalized for `operator`."""
+    fn = OPS.get(operator)
+    if operator == "in" and isinstance(expected, (list, tuple, set, frozenset)):
+        try:
+            return _in_members, (frozenset(expected), tuple(expected))
+        except TypeError:
+            return fn, tuple(expected)
+    return fn, expected
+
+
+class PolicyPlan:
+    """Policy set compiled once for repeated evaluation."""
+
+    def __init__(self, policies):
+        self.policies = [dict(p) for p in policies]
+        self.fields = []
+        self.checks = []
+        field_index = {}
+        for p in self.policies:
+            field = p["field"]
+            if field not in field_index:
+                field_index[field] = len(self.fields)
+                self.fields.append(field)
+            fn, operand = _compile_operand(p["operator"], p["value"])
+            template = {
+                "policy_id": p["policy_id"],
+                "description": p["description"],
+                "field": field,
+                "operator": p["operator"],
+                "expected": p["value"],
+            }
+            self.checks.append((field_index[field], fn, operand, template))
+
+    def __len__(self):
+        return len(self.checks)
+
+    def __getstate__(self):
+        return {"policies": self.policies}
+
+    def __setstate__(self, state):
+        self.__init__(state["policies"])
+
+
+def compile_policies(policies):
+    """Compile decoded policies into a PolicyPlan."""
+    return PolicyPlan(policies)
+
+
+def check_outcome(fn, operand, template, actual):
+    """(passed, note) for one compiled check against one actual value."""
+    if actual is None:
+        return False, "missing field"
+    if fn is None:
+        metrics.policy_error(template["policy_id"], "unsupported_operator")
+        return False, f"unsupported operator {template['operator']}"
+    try:
+        return fn(actual, operand), ""
+    except Exception as e:
+        metrics.policy_error(template["policy_id"], "exception")
+        return False, f"error: {str(e)}"
+
+
 def evaluate_user(user_obj, policies):
-    """Evaluate one user against all policies."""
+    """Evaluate one user against all policies (a list or a compiled PolicyPlan)."""
+    plan = policies if isinstance(policies, PolicyPlan) else PolicyPlan(policies)
+    get = user_obj.get
+    actuals = [get(f) for f in plan.fields]
     checks = []
+    overall_ok = True
 
-    for p in policies:
-        policy_id = p["policy_id"]
-        desc = p["description"]
-        field = p["field"]
-        operator = p["operator"]
-        expected = p["value"]
-
-        actual = user_obj.get(field)
-        note = ""
-        passed = False
-
-        if actual is None:
-            passed = False
-            note = "missing field"
-        else:
-            fn = OPS.get(operator)
-            if fn is None:
-                passed = False
-                note = f"unsupported operator {operator}"
-            else:
-                try:
-                    passed = fn(actual, expected)
-                except Exception as e:
-                    passed = False
-                    note = f"error: {str(e)}"
-
-        checks.append({
-            "policy_id": policy_id,
-            "description": desc,
-            "field": field,
-            "operator": operator,
-            "expected": expected,
-            "actual": actual,
-            "passed": passed,
-            "note": note,
-        })
-
-    overall_ok = all(c["passed"] for c in checks)
+    outcome = check_outcome
+    for field_idx, fn, operand, template in plan.checks:
+        actual = actuals[field_idx]
+        passed, note = outcome(fn, operand, template, actual)
+        if not passed:
+            overall_ok = False
+        check = template.copy()
+        check["actual"] = actual
+        check["passed"] = passed
+        check["note"] = note
+        checks.append(check)
 
     return {
         "username": user_obj.get("username", "<unknown>"),
         "overall_compliant": overall_ok,
         "checks": checks,
     }
+
+
+def evaluate_verdict(user_obj, policies, order=None, stats=None):
+    """Overall verdict only, stopping at the first failing policy.
+
+    `order` is a sequence of check indexes into the plan (default: plan order;
+    see backend.verdict for the adaptive order). `stats`, if given, records
+    each check that ran via stats.record(index, passed, elapsed_ns or None).
+    """
+    plan = policies if isinstance(policies, PolicyPlan) else PolicyPlan(policies)
+    get = user_obj.get
+    fields, checks = plan.fields, plan.checks
+    timed = stats is not None and stats.sample()
+    clock = time.perf_counter_ns
+    failed = None
+    for j in (range(len(checks)) if order is None else order):
+        field_idx, fn, operand, template = checks[j]
+        t0 = clock() if timed else 0
+        passed, _ = check_outcome(fn, operand, template, get(fields[field_idx]))
+        if stats is not None:
+            stats.record(j, passed, clock() - t0 if timed else None)
+        if not passed:
+            failed = template["policy_id"]
+            break
+    return {
+        "username": user_obj.get("username", "<unknown>"),
+        "overall_compliant": failed is None,
+        "failed_policy": failed,
+    }
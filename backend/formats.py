@@ -0,0 +1,126 @@
+import base64
+import csv
+import io
+import json
+import zlib
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def _b64(raw):
+    return base64.b64encode(raw).decode("ascii")
+
+
+def policy_header(plan):
+    return [
+        {
+            "policy_id": t["policy_id"],
+            "description": t["description"],
+            "field": t["field"],
+            "operator": t["operator"],
+            "expected": t["expected"],
+        }
+        for _, _, _, t in plan.checks
+    ]
+
+
+def bitset_from_results(plan, results):
+    """Compact evaluate_user-shaped results.
+
+    Bit j of a user's bitset (LSB-first within each byte) is set when policy j
+    passed; `failures` lists [policy_index, actual, note] for failed checks only.
+    """
+    nbytes = (len(plan) + 7) // 8
+    users, bits, failures = [], [], []
+    for r in results:
+        mask = 0
+        failed = []
+        for j, c in enumerate(r["checks"]):
+            if c["passed"]:
+                mask |= 1 << j
+            else:
+                failed.append([j, c["actual"], c["note"]])
+        users.append(r["username"])
+        bits.append(_b64(mask.to_bytes(nbytes, "little")))
+        failures.append(failed)
+    return {
+        "format": "bitset",
+        "policies": policy_header(plan),
+        "users": users,
+        "bits": bits,
+        "failures": failures,
+    }
+
+
+def bitset_from_matrix(matrix):
+    """Same payload as bitset_from_results, built straight from a vectorized ResultMatrix."""
+    plan = matrix.plan
+    fields = [t["field"] for _, _, _, t in plan.checks]
+    cols = [matrix.columns.get(f) for f in fields]
+    packed = np.packbits(matrix.passed, axis=1, bitorder="little")
+    bits = [_b64(row.tobytes()) for row in packed]
+    failures = [[] for _ in range(len(matrix))]
+    rows, idx = np.nonzero(~matrix.passed)
+    notes = matrix.notes
+    for i, j in zip(rows.tolist(), idx.tolist()):
+        col = cols[j]
+        actual = None if col is None else col[i]
+        note = "missing field" if actual is None else notes.get((i, j), "")
+        failures[i].append([j, actual, note])
+    return {
+        "format": "bitset",
+        "policies": policy_header(plan),
+        "users": list(matrix.usernames),
+        "bits": bits,
+        "failures": failures,
+    }
+
+
+_CSV_SPECIAL = (bool, list, dict, bytes)   # csv.writer renders None, str and numbers itself
+
+
+def _csv_value(v):
+    """Cell text as the UI export wrote it: JSON for lists/objects, lowercase booleans."""
+    if isinstance(v, bool):
+        return "true" if v else "false"
+    if isinstance(v, (list, dict)):
+        return json.dumps(v, separators=(",", ":"))
+    if isinstance(v, bytes):
+        return v.decode("utf-8", "replace")
+    return v
+
+
+def csv_chunks(rows, columns, size=64 * 1024, header=True):
+    """Yield CSV text (header first, on its own) in ~size chunks from an iterable of dicts."""
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    if header:
+        writer.writerow(columns)
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    for r in rows:
+        writer.writerow([_csv_value(v) if type(v) in _CSV_SPECIAL else v for v in map(r.get, columns)])
+        if buf.tell() >= size:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+
+def gzip_chunks(chunks, level=6):
+    """Gzip a stream of text chunks; the first chunk is flushed so the download starts at once."""
+    z = zlib.compressobj(level, zlib.DEFLATED, 31)   # wbits 31: gzip container
+    first = True
+    for chunk in chunks:
+        out = z.compress(chunk.encode("utf-8"))
+        if first:
+            out += z.flush(zlib.Z_SYNC_FLUSH)
+            first = False
+        if out:
+            yield out
+    yield z.flush()
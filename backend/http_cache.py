@@ -0,0 +1,123 @@
+import functools
+import hashlib
+import threading
+from collections import OrderedDict
+from flask import Response, current_app, request
+from backend import metrics, versions
+from backend.db import current_db_path
+from backend.settings import Settings
+
+MAX_BYTES = 64 * 1024 * 1024   # serialized bodies kept before the least recently used are evicted
+
+_settings = Settings("http_cache", {"enabled": True, "max_bytes": MAX_BYTES})
+_lock = threading.Lock()
+_entries = OrderedDict()       # key -> (etag, body, content_type)
+_size = [0]
+
+LOOKUPS = metrics.Counter(
+    "pcc_http_cache_requests_total", "Cacheable GET requests by outcome (hit, not_modified, miss, skip).",
+    ("result",),
+)
+EVICTIONS = metrics.Counter("pcc_http_cache_evictions_total", "Response cache entries evicted for the memory budget.")
+
+
+def configure(enabled=None, max_bytes=None, app=None):
+    values = {}
+    if enabled is not None:
+        values["enabled"] = bool(enabled)
+    if max_bytes is not None:
+        values["max_bytes"] = max(0, int(max_bytes))
+    _settings.update(values, app)
+    if app is None:
+        clear()
+
+
+def clear():
+    with _lock:
+        _entries.clear()
+        _size[0] = 0
+
+
+def stats():
+    with _lock:
+        return {"entries": len(_entries), "bytes": _size[0], "max_bytes": _settings["max_bytes"]}
+
+
+def _lookup(key):
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None:
+            _entries.move_to_end(key)
+        return entry
+
+
+def _store(key, entry):
+    size = len(entry[1])
+    if size > _settings["max_bytes"]:
+        return
+    with _lock:
+        old = _entries.pop(key, None)
+        if old is not None:
+            _size[0] -= len(old[1])
+        _entries[key] = entry
+        _size[0] += size
+        while _size[0] > _settings["max_bytes"]:
+            _, dropped = _entries.popitem(last=False)
+            _size[0] -= len(dropped[1])
+            EVICTIONS.inc()
+
+
+def _not_modified(etag):
+    return request.if_none_match.contains(etag.strip('"'))
+
+
+def _reply(etag, body, content_type):
+    if _not_modified(etag):
+        response = Response(status=304)
+    else:
+        response = Response(body, status=200, content_type=content_type)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+def cached(*tables, extra=None):
+    """Cache a GET view's serialized 200 response until one of `tables` is written.
+
+    The key is the database file, full path with query string, Accept header
+    and the in-process data version of each table (bumped by the Model write
+    methods), so hits and 304s are answered without opening a connection.
+    `extra(request)` may name further tables that only some requests read.
+    Streamed responses, and responses whose rendering wrote one of the keyed
+    tables (e.g. verdict runs recording policy_stats), are passed through
+    untouched: their key is out of date before it is stored.
+    """
+    def decorate(view):
+        @functools.wraps(view)
+        def cached_view(*args, **kwargs):
+            if not _settings["enabled"] or request.method != "GET":
+                return view(*args, **kwargs)
+            keyed = tables + (tuple(extra(request)) if extra else ())
+            key = (
+                current_db_path(), request.full_path, request.headers.get("Accept", ""),
+                tuple(versions.current(t) for t in keyed),
+            )
+            entry = _lookup(key)
+            if entry is not None:
+                LOOKUPS.inc(1, "not_modified" if _not_modified(entry[0]) else "hit")
+                return _reply(*entry)
+
+            response = current_app.make_response(view(*args, **kwargs))
+            if (response.status_code != 200 or response.is_streamed
+                    or tuple(versions.current(t) for t in keyed) != key[3]):
+                LOOKUPS.inc(1, "skip")
+                return response
+            body = response.get_data()
+            entry = ('"' + hashlib.sha1(body).hexdigest() + '"', body, response.content_type)
+            _store(key, entry)
+            LOOKUPS.inc(1, "miss")
+            return _reply(*entry)
+
+        return cached_view
+
+    return decorate
@@ -0,0 +1,254 @@
+import codecs
+import csv
+import json
+import re
+import time
+from backend import metrics
+
+CHUNK_SIZE = 64 * 1024          # bytes read from the upload per step
+MAX_ITEM_BYTES = 16 * 1024 * 1024  # largest single JSON element we will buffer
+MAX_REPORTED_ERRORS = 1000      # per-field errors echoed back in the response
+
+_WS = re.compile(r"[ \t\n\r]*")
+_decoder = json.JSONDecoder()
+
+
+def iter_lines(stream, chunk_size=CHUNK_SIZE):
+    """Decode a binary stream incrementally and yield text lines (newline kept)."""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+    tail = ""
+    while True:
+        chunk = stream.read(chunk_size)
+        text = decoder.decode(chunk or b"", final=not chunk)
+        if text:
+            parts = (tail + text).split("\n")
+            tail = parts.pop()
+            for p in parts:
+                yield p + "\n"
+        if not chunk:
+            break
+    if tail:
+        yield tail
+
+
+def iter_csv_rows(stream, chunk_size=CHUNK_SIZE):
+    """Yield CSV rows as dicts keyed by the header, one at a time."""
+    return csv.DictReader(iter_lines(stream, chunk_size))
+
+
+def _iter_text_chunks(stream, chunk_size):
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+    while True:
+        chunk = stream.read(chunk_size)
+        text = decoder.decode(chunk or b"", final=not chunk)
+        if text:
+            yield text
+        if not chunk:
+            return
+
+
+def iter_json_items(stream, chunk_size=CHUNK_SIZE):
+    """Yield the elements of a top-level JSON array (or a single object) incrementally."""
+    chunks = _iter_text_chunks(stream, chunk_size)
+    buf, pos, eof = "", 0, False
+
+    def more():
+        nonlocal buf, pos, eof
+        if eof:
+            return False
+        try:
+            nxt = next(chunks)
+        except StopIteration:
+            eof = True
+            return False
+        buf = buf[pos:] + nxt
+        pos = 0
+        return True
+
+    def skip_ws():
+        nonlocal pos
+        while True:
+            pos = _WS.match(buf, pos).end()
+            if pos < len(buf) or not more():
+                return
+
+    def decode_value():
+        nonlocal pos
+        while True:
+            try:
+                value, end = _decoder.raw_decode(buf, pos)
+                if end < len(buf) or eof:
+                    pos = end
+                    return value
+            except json.JSONDecodeError as e:
+                if eof:
+                    raise ValueError(f"invalid JSON: {e.msg}")
+                if len(buf) - pos > MAX_ITEM_BYTES:
+                    raise ValueError("invalid JSON: element too large or malformed")
+            more()
+
+    skip_ws()
+    if pos >= len(buf):
+        raise ValueError("invalid JSON: empty document")
+    if buf[pos] != "[":
+        yield decode_value()
+        skip_ws()
+        if pos < len(buf):
+            raise ValueError("invalid JSON: extra data after top-level value")
+        return
+
+    pos += 1
+    skip_ws()
+    if buf[pos:pos + 1] == "]":
+        return
+    while True:
+        yield decode_value()
+        skip_ws()
+        sep = buf[pos:pos + 1]
+        if sep == "]":
+            return
+        if sep != ",":
+            raise ValueError("invalid JSON: expected ',' or ']' in array")
+        pos += 1
+        skip_ws()
+
+
+# ---- upload file formats (shared by /upload and the offline CLI) ----
+
+def coerce_policy_value(op, raw):
+    s = str(raw).strip()
+    if op == "in":
+        if s.startswith("["):
+            try:
+                v = json.loads(s)
+                return v if isinstance(v, list) else [s]
+            except Exception:
+                pass
+        return [x.strip() for x in s.split(",")] if s else []
+    if op == "includes":
+        return s
+    try:
+        if s and s.lower() not in ("true", "false", "null"):
+            n = float(s)
+            return int(n) if n.is_integer() else n
+    except Exception:
+        pass
+    if s.lower() == "true":
+        return True
+    if s.lower() == "false":
+        return False
+    if s.startswith("{") or s.startswith("["):
+        try:
+            return json.loads(s)
+        except Exception:
+            pass
+    return raw
+
+
+def policy_from_csv_row(row):
+    op = (row.get("operator") or "").strip()
+    return {
+        "policy_id": (row.get("policy_id") or row.get("id") or "").strip(),
+        "description": (row.get("description") or "").strip(),
+        "field": (row.get("field") or "").strip(),
+        "operator": op,
+        "value": coerce_policy_value(op, row.get("value")),
+    }
+
+
+def policy_from_json_item(p):
+    if not isinstance(p, dict):
+        return p
+    p = dict(p)
+    if "policy_id" not in p and "id" in p:
+        p["policy_id"] = p.pop("id")
+    return p
+
+
+def user_from_csv_row(row):
+    r = dict(row)
+    v = (r.get("mfa_enabled") or "").strip().lower()
+    if v in ("1", "true", "yes", "y"):
+        r["mfa_enabled"] = 1
+    elif v in ("0", "false", "no", "n"):
+        r["mfa_enabled"] = 0
+    for k in ("age", "age_days", "login_count", "income"):
+        if k in r and r[k] not in (None, ""):
+            try:
+                r[k] = float(r[k]) if k == "income" else int(float(r[k]))
+            except Exception:
+                pass
+    return r
+
+
+def read_items(filename, stream, from_csv_row, from_json_item):
+    """Lazily parse a .json or .csv file into items; None if the extension is unsupported."""
+    name = filename.lower()
+    if name.endswith(".json"):
+        return (from_json_item(x) for x in iter_json_items(stream))
+    if name.endswith(".csv"):
+        return (from_csv_row(r) for r in iter_csv_rows(stream))
+    return None
+
+
+def parse_error(items):
+    """Parse every item without validating it; the malformed-file message, or None."""
+    try:
+        for _ in items:
+            pass
+    except (ValueError, csv.Error) as e:
+        return str(e)
+    return None
+
+
+def ingest(items, prepare, write, batch_size=1000, max_errors=MAX_REPORTED_ERRORS):
+    """Validate items one at a time and write them in fixed-size batches.
+
+    `prepare(item)` returns the row to store or raises ValueError to reject it;
+    `write(rows)` persists one batch. Returns accepted/rejected counts, the
+    first `max_errors` errors as {row, field, error} (every field problem of a
+    row when `prepare` raises validators.ValidationError), error counts per
+    field over the whole file and, if the file itself is malformed, an
+    `error` message (rows before that point are still written).
+    """
+    report = {"accepted": 0, "rejected": 0, "errors": [], "errors_by_field": {}}
+    by_field = report["errors_by_field"]
+    batch = []
+    parse_s = validate_s = 0.0
+    it = enumerate(items, start=1)
+    while True:
+        t0 = time.perf_counter()
+        try:
+            row_no, item = next(it)
+        except StopIteration:
+            break
+        except (ValueError, csv.Error) as e:
+            report["error"] = str(e)
+            break
+        finally:
+            t1 = time.perf_counter()
+            parse_s += t1 - t0
+        try:
+            batch.append(prepare(item))
+        except ValueError as e:
+            report["rejected"] += 1
+            for field, message in getattr(e, "errors", None) or [(None, str(e))]:
+                key = field or "_row"
+                by_field[key] = by_field.get(key, 0) + 1
+                if len(report["errors"]) < max_errors:
+                    report["errors"].append({"row": row_no, "field": field, "error": message})
+            continue
+        finally:
+            validate_s += time.perf_counter() - t1
+        if len(batch) >= batch_size:
+            with metrics.phase("upload.write"):
+                write(batch)
+            report["accepted"] += len(batch)
+            batch = []
+    if batch:
+        with metrics.phase("upload.write"):
+            write(batch)
+        report["accepted"] += len(batch)
+    metrics.observe_phase("upload.parse", parse_s)
+    metrics.observe_phase("upload.validate", validate_s)
+    return report
@@ -0,0 +1,253 @@
+import fcntl
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from backend.settings import Settings
+
+WORKERS = 2                 # evaluation jobs running at once
+PROGRESS_EVERY = 1000       # users between progress updates
+TTL = 3600                  # seconds a finished job and its result file are kept
+JOBS_DIR = Path(__file__).parent / ".." / "data" / "jobs"
+
+_settings = Settings("jobs", {"workers": WORKERS, "ttl": TTL, "dir": JOBS_DIR})
+_executors = {}  # worker count -> thread pool
+_lock = threading.Lock()
+_jobs = {}       # id -> Job started by this process
+_EPOCH = time.time()   # data versions restart with the server; older jobs are never reused
+_ID = re.compile(r"[0-9a-f]{32}")
+_STATE = ("id", "key", "status", "params", "total", "processed", "error", "created", "started", "finished", "pid")
+
+
+class Job:
+    """One background evaluation; results are spooled to an NDJSON file as they are produced.
+
+    The job's state is also written next to the results (`<id>.json`) so other
+    server worker processes can report on it and deduplicate against it.
+    """
+
+    def __init__(self, key, total, params):
+        self.id = uuid.uuid4().hex
+        self.key = json.loads(json.dumps(key))   # as it reads back from the state file
+        self.total = total
+        self.params = params
+        self.status = "queued"
+        self.processed = 0
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.pid = os.getpid()
+        self.path = Path(_settings["dir"]) / f"{self.id}.ndjson"
+        self.future = None
+
+    @property
+    def state_path(self):
+        return self.path.with_suffix(".json")
+
+    @classmethod
+    def load(cls, path):
+        """A job from its state file, as written by save() in this or another process."""
+        with open(path, encoding="utf-8") as f:
+            state = json.load(f)
+        job = cls(None, state["total"], state["params"])
+        for name in _STATE:
+            setattr(job, name, state[name])
+        job.path = path.with_suffix(".ndjson")
+        if job.finished is None and not _alive(job.pid):
+            job.status = "failed"
+            job.error = "the server process running the job exited"
+            job.finished = time.time()
+            job.save()
+        return job
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f"{self.id}.{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({name: getattr(self, name) for name in _STATE}, f)
+        os.replace(tmp, self.state_path)
+
+    def advance(self, n):
+        self.processed += n
+        self.save()
+
+    def to_dict(self):
+        now = self.finished or time.time()
+        elapsed = now - self.started if self.started else 0.0
+        eta = None
+        if self.status == "running" and self.processed:
+            eta = round(elapsed / self.processed * max(self.total - self.processed, 0), 3)
+        elif self.status == "done":
+            eta = 0.0
+        return {
+            "id": self.id,
+            "status": self.status,
+            **self.params,
+            "total": self.total,
+            "processed": self.processed,
+            "percent": round(100.0 * self.processed / self.total, 2) if self.total else 100.0,
+            "elapsed": round(elapsed, 3),
+            "eta": eta,
+            "created_at": self.created,
+            "finished_at": self.finished,
+            "error": self.error,
+        }
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def configure(workers=None, ttl=None, directory=None, app=None):
+    """Set the worker count, result retention and spool directory; with `app` for that Flask app only."""
+    values = {}
+    if workers is not None:
+        values["workers"] = max(1, int(workers))
+    if ttl is not None:
+        values["ttl"] = float(ttl)
+    if directory is not None:
+        values["dir"] = Path(directory)
+    _settings.update(values, app)
+    if app is None:
+        shutdown()
+
+
+def _get_executor():
+    workers = _settings["workers"]
+    ex = _executors.get(workers)
+    if ex is None:
+        ex = _executors[workers] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="eval-job")
+    return ex
+
+
+def shutdown(wait=False):
+    """Cancel queued jobs (they are marked failed); `wait` blocks until the running ones finish."""
+    with _lock:
+        executors = list(_executors.values())
+        _executors.clear()
+    if not executors:
+        return
+    for ex in executors:
+        ex.shutdown(wait=False, cancel_futures=True)
+    if wait:
+        for ex in executors:
+            ex.shutdown(wait=True)
+    with _lock:
+        for job in list(_jobs.values()):
+            if job.future is not None and job.future.cancelled() and job.finished is None:
+                job.status = "failed"
+                job.error = "cancelled: the server stopped or was reconfigured before the job started"
+                job.finished = time.time()
+                job.save()
+
+
+@contextmanager
+def _dir_lock():
+    """Serialize submissions across the server's worker processes (they share the spool directory)."""
+    directory = Path(_settings["dir"])
+    directory.mkdir(parents=True, exist_ok=True)
+    with open(directory / ".lock", "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _forget(job):
+    _jobs.pop(job.id, None)
+    for path in (job.path, job.state_path):
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _prune(now):
+    """Drop expired jobs, including ones left on disk by other (or exited) processes; returns the rest."""
+    known = {job.id: job for job in _jobs.values()}
+    for path in Path(_settings["dir"]).glob("*.json"):
+        if path.stem not in known and _ID.fullmatch(path.stem):
+            try:
+                known[path.stem] = Job.load(path)
+            except (OSError, ValueError, KeyError):
+                continue
+    for job in known.values():
+        if job.finished is not None and now - job.finished > _settings["ttl"]:
+            _forget(job)
+            del known[job.id]
+    return known.values()
+
+
+def _run(job, produce, dumps):
+    job.status = "running"
+    job.started = time.time()
+    job.save()
+    pending = 0
+    try:
+        job.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(job.path, "w", encoding="utf-8") as out:
+            for r in produce():
+                out.write(dumps(r) + "\n")
+                pending += 1
+                if pending >= PROGRESS_EVERY:
+                    job.advance(pending)
+                    pending = 0
+        job.advance(pending)
+        job.total = job.processed  # rows may have changed since the job was counted
+        job.status = "done"
+    except Exception as e:
+        job.error = str(e)
+        job.status = "failed"   # the next identical request starts a new job
+    finally:
+        job.finished = time.time()
+        job.save()
+
+
+def submit(key, total, params, produce, dumps):
+    """Start a job for `key` unless an identical one is queued, running or done.
+
+    Jobs of every process sharing the spool directory count, so the same
+    request on two server workers runs once. `produce()` yields per-user
+    results and runs on an executor thread; `dumps` serializes one result.
+    Returns (job, created).
+    """
+    with _lock, _dir_lock():
+        job = Job(key, total, params)
+        for existing in _prune(time.time()):
+            if existing.key == job.key and existing.status != "failed" and existing.created >= _EPOCH:
+                return existing, False
+        job.save()
+        _jobs[job.id] = job
+        job.future = _get_executor().submit(_run, job, produce, dumps)
+    return job, True
+
+
+def get(job_id):
+    """The job with this id, from memory or from the state file another process wrote."""
+    job = _jobs.get(job_id)
+    if job is None and _ID.fullmatch(job_id):
+        try:
+            job = Job.load(Path(_settings["dir"]) / f"{job_id}.json")
+        except (OSError, ValueError, KeyError):
+            return None
+    return job
+
+
+def iter_lines(job):
+    """Yield the spooled NDJSON lines of a finished job."""
+    with open(job.path, encoding="utf-8") as f:
+        yield from f
+
@@ -0,0 +1,428 @@
+from itertools import groupby
+from backend import metrics, versions
+from backend.evaluators import check_outcome, evaluate_user
+from backend.models import ComplianceResults, Policies, Users
+from backend.models.abs_model import QUERY_OPS
+from backend.policy_plan import bump_policy_version, decode_policy_value, get_plan
+from backend.pushdown import column_families, compile_check
+
+ID_BATCH = 500   # ids per IN (...) clause
+
+_TABLE = ComplianceResults.table_name
+_STALE_USERS = ComplianceResults.stale_table(Users)
+_STALE_POLICIES = ComplianceResults.stale_table(Policies)
+_COLS = ", ".join(ComplianceResults.columns())
+
+
+def _insert_sql(table):
+    return f"INSERT INTO {table} ({_COLS}) VALUES (?, ?, ?, ?, ?)"
+
+
+def _chunks(items, size=ID_BATCH):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _marks(items):
+    return ", ".join("?" for _ in items)
+
+
+def result_rows(user, plan):
+    """Result-table rows (user_id, policy_id, actual, passed, note) for one user."""
+    uid = user["user_id"]
+    return [
+        (uid, c["policy_id"], c["actual"], int(bool(c["passed"])), c["note"])
+        for c in evaluate_user(user, plan)["checks"]
+    ]
+
+
+def _fill_policy(conn, check, families, table=_TABLE):
+    """Insert one policy's outcome for every user, in SQL when the check can be pushed down."""
+    _, fn, operand, t = check
+    pid, field = t["policy_id"], t["field"]
+    if field not in Users.db_columns:
+        conn.execute(
+            f"INSERT INTO {table} ({_COLS}) "
+            f"SELECT user_id, ?, NULL, 0, 'missing field' FROM {Users.table_name}",
+            (pid,),
+        )
+        return
+    compiled = compile_check(t, families)
+    if compiled is not None:
+        cond, params = compiled
+        conn.execute(
+            f"INSERT INTO {table} ({_COLS}) "
+            f"SELECT user_id, ?, {field}, "
+            f"CASE WHEN {field} IS NOT NULL AND ({cond}) THEN 1 ELSE 0 END, "
+            f"CASE WHEN {field} IS NULL THEN 'missing field' ELSE '' END "
+            f"FROM {Users.table_name}",
+            [pid, *params],
+        )
+        return
+    cur = conn.execute(f"SELECT user_id, {field} FROM {Users.table_name}")
+    insert = _insert_sql(table)
+    while True:
+        rows = cur.fetchmany(ComplianceResults.batch_size)
+        if not rows:
+            break
+        out = []
+        for uid, actual in rows:
+            passed, note = check_outcome(fn, operand, t, actual)
+            out.append((uid, pid, actual, int(bool(passed)), note))
+        conn.executemany(insert, out)
+
+
+def _fill_all(conn, plan, table):
+    families = column_families(conn, plan.fields)
+    for check in plan.checks:
+        _fill_policy(conn, check, families, table)
+
+
+def refresh_users(conn, plan, user_ids):
+    """Re-evaluate the given users and replace their stored rows; ids no longer in users are pruned."""
+    user_ids = list(dict.fromkeys(user_ids))
+    cols = Users.columns()
+    before = conn.total_changes
+    try:
+        with metrics.phase("materialize.refresh_users"):
+            for chunk in _chunks(user_ids):
+                conn.execute(f"DELETE FROM {_TABLE} WHERE user_id IN ({_marks(chunk)})", chunk)
+                conn.execute(f"DELETE FROM {_STALE_USERS} WHERE user_id IN ({_marks(chunk)})", chunk)
+                users = conn.execute(
+                    f"SELECT {', '.join(cols)} FROM {Users.table_name} WHERE user_id IN ({_marks(chunk)})",
+                    chunk,
+                ).fetchall()
+                metrics.rows_read(Users.table_name, len(users))
+                rows = [r for u in users for r in result_rows(dict(zip(cols, u)), plan)]
+                conn.executemany(_insert_sql(_TABLE), rows)
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    metrics.rows_written(_TABLE, conn.total_changes - before)
+    versions.bump(_TABLE)
+
+
+def refresh_policies(conn, plan, policy_ids):
+    """Recompute the given policies for every user; ids no longer in the plan are pruned."""
+    policy_ids = list(dict.fromkeys(policy_ids))
+    wanted = set(policy_ids)
+    checks = [c for c in plan.checks if c[3]["policy_id"] in wanted]
+    before = conn.total_changes
+    try:
+        with metrics.phase("materialize.refresh_policies"):
+            for chunk in _chunks(policy_ids):
+                conn.execute(f"DELETE FROM {_TABLE} WHERE policy_id IN ({_marks(chunk)})", chunk)
+                conn.execute(f"DELETE FROM {_STALE_POLICIES} WHERE policy_id IN ({_marks(chunk)})", chunk)
+            if checks:
+                families = column_families(conn, [c[3]["field"] for c in checks])
+                for check in checks:
+                    _fill_policy(conn, check, families)
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    metrics.rows_written(_TABLE, conn.total_changes - before)
+    versions.bump(_TABLE)
+
+
+def rebuild(conn, plan):
+    """Recompute the whole table from users and policies; returns the row count."""
+    before = conn.total_changes
+    try:
+        with metrics.phase("materialize.rebuild"):
+            _clear_all(conn)
+            _fill_all(conn, plan, _TABLE)
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    metrics.rows_written(_TABLE, conn.total_changes - before)
+    versions.bump(_TABLE)
+    return conn.execute(f"SELECT COUNT(*) FROM {_TABLE}").fetchone()[0]
+
+
+def _clear_all(conn):
+    for table in (_TABLE, _STALE_USERS, _STALE_POLICIES):
+        conn.execute(f"DELETE FROM {table}")
+
+
+def clear(conn):
+    """Empty the store (and its stale marks), e.g. when users or policies are cleared."""
+    try:
+        _clear_all(conn)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    versions.bump(_TABLE)
+
+
+def stale_marks(conn):
+    """Users and policies written since their rows were computed (and not refreshed yet)."""
+    return sum(conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0] for t in (_STALE_USERS, _STALE_POLICIES))
+
+
+def refresh_stale(conn):
+    """Refresh the users and policies marked stale; returns how many marks were cleared.
+
+    Marked policies were written outside the API, so the cached plan is
+    recompiled before their rows are recomputed.
+    """
+    users = [r[0] for r in conn.execute(f"SELECT user_id FROM {_STALE_USERS}")]
+    policies = [r[0] for r in conn.execute(f"SELECT policy_id FROM {_STALE_POLICIES}")]
+    if policies:
+        bump_policy_version()
+    plan = get_plan(conn)
+    if policies:
+        refresh_policies(conn, plan, policies)
+    if users:
+        refresh_users(conn, plan, users)
+    return len(users) + len(policies)
+
+
+def is_fresh(conn, plan):
+    """True when the store covers users x policies and no user or policy changed since it was computed."""
+    for table in (_STALE_USERS, _STALE_POLICIES):
+        if conn.execute(f"SELECT EXISTS (SELECT 1 FROM {table})").fetchone()[0]:
+            return False
+    users = conn.execute(f"SELECT COUNT(*) FROM {Users.table_name}").fetchone()[0]
+    rows = conn.execute(f"SELECT COUNT(*) FROM {_TABLE}").fetchone()[0]
+    return rows == users * len(plan)
+
+
+def check_consistency(conn, plan, deep=False):
+    """Compare the stored rows with users x policies.
+
+    The default check is structural (row counts and orphans) plus the stale
+    marks left by writes that were not refreshed, e.g. direct SQL or another
+    tool. `deep` also recomputes every outcome into a temp table and counts
+    rows that differ.
+    """
+    users = conn.execute(f"SELECT COUNT(*) FROM {Users.table_name}").fetchone()[0]
+    rows = conn.execute(f"SELECT COUNT(*) FROM {_TABLE}").fetchone()[0]
+    orphaned = conn.execute(
+        f"SELECT COUNT(*) FROM {_TABLE} r "
+        f"WHERE NOT EXISTS (SELECT 1 FROM {Users.table_name} u WHERE u.user_id = r.user_id) "
+        f"OR NOT EXISTS (SELECT 1 FROM {Policies.table_name} p WHERE p.policy_id = r.policy_id)"
+    ).fetchone()[0]
+    expected = users * len(plan)
+    report = {
+        "users": users,
+        "policies": len(plan),
+        "expected_rows": expected,
+        "rows": rows,
+        "orphaned": orphaned,
+        "missing": expected - (rows - orphaned),
+        "marked_stale": stale_marks(conn),
+    }
+    ok = report["orphaned"] == 0 and report["missing"] == 0 and report["marked_stale"] == 0
+    if deep:
+        conn.execute("DROP TABLE IF EXISTS temp.expected_results")
+        conn.execute(f"CREATE TEMP TABLE expected_results AS SELECT * FROM {_TABLE} WHERE 0")
+        try:
+            _fill_all(conn, plan, "temp.expected_results")
+            report["stale"] = conn.execute(
+                f"SELECT COUNT(*) FROM (SELECT {_COLS} FROM temp.expected_results "
+                f"EXCEPT SELECT {_COLS} FROM {_TABLE})"
+            ).fetchone()[0]
+        finally:
+            conn.rollback()
+            conn.execute("DROP TABLE IF EXISTS temp.expected_results")
+        ok = ok and report["stale"] == 0
+    report["consistent"] = ok
+    return report
+
+
+def ensure_consistent(conn, plan):
+    """Rebuild when the structural or stale-mark check fails; returns the check report."""
+    report = check_consistency(conn, plan)
+    if not report["consistent"]:
+        report["rebuilt_rows"] = rebuild(conn, plan)
+    return report
+
+
+def _iter_joined(conn, plan):
+    """Row-by-row read of the store; users whose rows do not cover the plan are evaluated live."""
+    templates = [t for _, _, _, t in plan.checks]
+    pos = {t["policy_id"]: j for j, t in enumerate(templates)}
+    cur = conn.execute(
+        f"SELECT u.user_id, u.username, r.policy_id, r.actual, r.passed, r.note "
+        f"FROM {Users.table_name} u LEFT JOIN {_TABLE} r ON r.user_id = u.user_id "
+        f"ORDER BY u.user_id"
+    )
+    n = 0
+    for uid, rows in groupby(cur, key=lambda r: r[0]):
+        slots = [None] * len(templates)
+        username = None
+        for _, username, pid, actual, passed, note in rows:
+            j = pos.get(pid)
+            if j is not None:
+                slots[j] = (actual, bool(passed), note)
+        if None in slots:
+            yield evaluate_user(Users.get(conn, uid), plan)   # counted by the model
+            continue
+        n += 1
+        yield _result(username, templates, slots)
+    metrics.rows_read(Users.table_name, n)
+
+
+def _result(username, templates, slots):
+    checks = []
+    overall_ok = True
+    for t, (actual, passed, note) in zip(templates, slots):
+        if not passed:
+            overall_ok = False
+        check = t.copy()
+        check["actual"] = actual
+        check["passed"] = passed
+        check["note"] = note
+        checks.append(check)
+    return {"username": username, "overall_compliant": overall_ok, "checks": checks}
+
+
+def iter_results(conn, plan):
+    """Yield evaluate_user-shaped results from the store, in user_id order.
+
+    When the row count matches users x policies only failing rows are read
+    and merged with one scan of users (actual values are the user's columns);
+    otherwise falls back to a row-by-row read that evaluates gaps live. While
+    any user or policy is marked stale the stored outcomes cannot be trusted,
+    so every user is evaluated live.
+    """
+    if stale_marks(conn):
+        for u in Users.iter_all(conn):
+            yield evaluate_user(u, plan)
+        return
+    users = conn.execute(f"SELECT COUNT(*) FROM {Users.table_name}").fetchone()[0]
+    rows = conn.execute(f"SELECT COUNT(*) FROM {_TABLE}").fetchone()[0]
+    if rows != users * len(plan):
+        yield from _iter_joined(conn, plan)
+        return
+
+    fields = [f for f in plan.fields if f in Users.db_columns]
+    col_pos = {f: k + 2 for k, f in enumerate(fields)}
+    layout = [(t, t["policy_id"], col_pos.get(t["field"])) for _, _, _, t in plan.checks]
+    failures = conn.execute(
+        f"SELECT user_id, policy_id, note FROM {_TABLE} WHERE passed = 0 ORDER BY user_id, policy_id"
+    )
+    pending = next(failures, None)
+    cur = conn.execute(
+        f"SELECT {', '.join(['user_id', 'username'] + fields)} FROM {Users.table_name} ORDER BY user_id"
+    )
+    n = 0
+    for row in cur:
+        n += 1
+        uid = row[0]
+        failed = {}
+        while pending is not None and pending[0] <= uid:
+            if pending[0] == uid:
+                failed[pending[1]] = pending[2]
+            pending = next(failures, None)
+        checks = []
+        for t, pid, p in layout:
+            check = t.copy()
+            check["actual"] = None if p is None else row[p]
+            if pid in failed:
+                check["passed"] = False
+                check["note"] = failed[pid]
+            else:
+                check["passed"] = True
+                check["note"] = ""
+            checks.append(check)
+        yield {"username": row[1], "overall_compliant": not failed, "checks": checks}
+    metrics.rows_read(Users.table_name, n)
+
+
+# ---- flat check rows (results grid, export) ----
+
+CHECK_COLUMNS = {   # name in the API -> SQL expression
+    "user_id": "r.user_id",
+    "username": "u.username",
+    "policy_id": "r.policy_id",
+    "description": "p.description",
+    "field": "p.field",
+    "operator": "p.operator",
+    "expected": "p.value",
+    "actual": "r.actual",
+    "passed": "r.passed",
+    "note": "r.note",
+}
+
+_JOIN_USERS = f"JOIN {Users.table_name} u ON u.user_id = r.user_id"
+_JOIN_POLICIES = f"JOIN {Policies.table_name} p ON p.policy_id = r.policy_id"
+
+
+def _checks_where(filters):
+    where, params = [], []
+    for name, op, value in filters:
+        col = CHECK_COLUMNS.get(name)
+        if col is None:
+            raise ValueError(f"unknown column '{name}'")
+        if op == "in":
+            where.append(f"{col} IN ({_marks(value)})")
+            params.extend(value)
+        elif op in QUERY_OPS:
+            where.append(f"{col} {op} ?")
+            params.append(value)
+        else:
+            raise ValueError(f"unsupported operator '{op}'")
+    return (" WHERE " + " AND ".join(where) if where else ""), params
+
+
+def _checks_from(sort):
+    """FROM clause led by the table whose index yields `sort` order, so a page needs no full sort."""
+    lead = CHECK_COLUMNS[sort][0] if sort else "r"
+    if lead == "u":
+        return (
+            f"FROM {Users.table_name} u CROSS JOIN {_TABLE} r ON r.user_id = u.user_id {_JOIN_POLICIES}"
+        ), ["r.user_id", "r.policy_id"]
+    if lead == "p":
+        return (
+            f"FROM {Policies.table_name} p CROSS JOIN {_TABLE} r ON r.policy_id = p.policy_id {_JOIN_USERS}"
+        ), ["r.policy_id", "r.user_id"]
+    return f"FROM {_TABLE} r {_JOIN_USERS} {_JOIN_POLICIES}", ["r.user_id", "r.policy_id"]
+
+
+def count_checks(conn, filters=()):
+    where, params = _checks_where(filters)
+    used = {CHECK_COLUMNS[name][0] for name, _, _ in filters}
+    joins = [j for alias, j in (("u", _JOIN_USERS), ("p", _JOIN_POLICIES)) if alias in used]
+    return conn.execute(f"SELECT COUNT(*) FROM {_TABLE} r {' '.join(joins)}{where}", params).fetchone()[0]
+
+
+def iter_checks(conn, filters=(), sort=None, descending=False, limit=None, offset=0):
+    """Yield one dict per stored (user, policy) outcome matching `filters`.
+
+    Filters are (column, op, value) over CHECK_COLUMNS. Rows come in `sort`
+    order straight from the cursor, so callers can page or stream without
+    holding the result. Ties (and the default order) go by user_id then
+    policy_id, or policy_id then user_id when sorting on a policy column;
+    `descending` reverses the tie order too so one index scan serves it.
+    """
+    if sort is not None and sort not in CHECK_COLUMNS:
+        raise ValueError(f"unknown sort column '{sort}'")
+    where, params = _checks_where(filters)
+    source, ties = _checks_from(sort)
+    direction = " DESC" if descending else ""
+    order = ([CHECK_COLUMNS[sort]] if sort else []) + ties
+    sql = (
+        f"SELECT {', '.join(CHECK_COLUMNS.values())} {source}{where} "
+        f"ORDER BY {', '.join(c + direction for c in order)}"
+    )
+    if limit is not None:
+        sql += " LIMIT ? OFFSET ?"
+        params += [int(limit), int(offset)]
+    names = list(CHECK_COLUMNS)
+    expected = {}   # raw policy value -> decoded; only a handful of distinct values
+    n = 0
+    for row in conn.execute(sql, params):
+        n += 1
+        check = dict(zip(names, row))
+        raw = check["expected"]
+        if raw not in expected:
+            expected[raw] = decode_policy_value(raw)
+        check["expected"] = expected[raw]
+        check["passed"] = bool(check["passed"])
+        yield check
+    metrics.rows_read(_TABLE, n)
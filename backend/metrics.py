@@ -0,0 +1,313 @@
+import bisect
+import fcntl
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from backend.settings import Settings
+
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+FLUSH_INTERVAL = 1.0   # seconds between snapshots of a shared worker's metrics
+
+_settings = Settings("metrics", {"enabled": True})
+_registry = []
+_shared = {"dir": None, "flushed": 0.0, "dirty": False}
+
+
+def configure(enabled=None, app=None):
+    if enabled is not None:
+        _settings.update({"enabled": bool(enabled)}, app)
+
+
+def enabled():
+    return _settings["enabled"]
+
+
+def _escape(v):
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)] + list(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _num(v):
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class Counter:
+    """Monotonic counter with a fixed set of label names."""
+
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.label_names = name, help, tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount=1, *labels):
+        if not _settings["enabled"]:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+        _shared["dirty"] = True
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+    @staticmethod
+    def merge(into, labels, v):
+        into[labels] = into.get(labels, 0) + v
+
+    def samples(self, values=None):
+        items = sorted((self.snapshot() if values is None else values).items())
+        for labels, v in items:
+            yield f"{self.name}{_labels(self.label_names, labels)} {_num(v)}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram with a fixed set of label names."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=BUCKETS):
+        self.name, self.help, self.label_names = name, help, tuple(labels)
+        self.buckets = tuple(buckets)
+        self._values = {}   # labels -> [per-bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, *labels):
+        if not _settings["enabled"]:
+            return
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._values.get(labels)
+            if row is None:
+                row = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            row[i] += 1
+            row[-1] += value
+        _shared["dirty"] = True
+
+    def count(self, *labels):
+        row = self._values.get(labels)
+        return sum(row[:-1]) if row else 0
+
+    def snapshot(self):
+        with self._lock:
+            return {k: list(v) for k, v in self._values.items()}
+
+    @staticmethod
+    def merge(into, labels, row):
+        current = into.get(labels)
+        into[labels] = list(row) if current is None else [a + b for a, b in zip(current, row)]
+
+    def samples(self, values=None):
+        items = sorted((self.snapshot() if values is None else values).items())
+        for labels, row in items:
+            total = 0
+            for le, n in zip(self.buckets + ("+Inf",), row[:-1]):
+                total += n
+                le_label = 'le="+Inf"' if le == "+Inf" else f'le="{_num(float(le))}"'
+                yield f"{self.name}_bucket{_labels(self.label_names, labels, [le_label])} {total}"
+            yield f"{self.name}_sum{_labels(self.label_names, labels)} {_num(row[-1])}"
+            yield f"{self.name}_count{_labels(self.label_names, labels)} {total}"
+
+
+REQUEST_SECONDS = Histogram(
+    "pcc_http_request_duration_seconds", "Request latency until the response is returned.",
+    ("method", "route", "status"),
+)
+PHASE_SECONDS = Histogram("pcc_phase_duration_seconds", "Time spent in named processing phases.", ("phase",))
+ROWS_READ = Counter("pcc_db_rows_read_total", "Rows read from SQLite.", ("table",))
+ROWS_WRITTEN = Counter("pcc_db_rows_written_total", "Rows inserted, updated or deleted in SQLite.", ("table",))
+POLICY_ERRORS = Counter(
+    "pcc_policy_evaluation_errors_total", "Policy checks that raised or used an unsupported operator.",
+    ("policy_id", "kind"),
+)
+
+
+@contextmanager
+def phase(name):
+    """Time a block into pcc_phase_duration_seconds{phase=name}."""
+    if not _settings["enabled"]:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        PHASE_SECONDS.observe(time.perf_counter() - t0, name)
+
+
+def observe_phase(name, seconds):
+    PHASE_SECONDS.observe(seconds, name)
+
+
+def timed_iter(name, iterable):
+    """Yield from iterable, recording the total time spent producing items as one phase."""
+    if not _settings["enabled"]:
+        yield from iterable
+        return
+    elapsed = 0.0
+    it = iter(iterable)
+    while True:
+        t0 = time.perf_counter()
+        try:
+            item = next(it)
+        except StopIteration:
+            elapsed += time.perf_counter() - t0
+            break
+        elapsed += time.perf_counter() - t0
+        yield item
+    PHASE_SECONDS.observe(elapsed, name)
+
+
+def rows_read(table, n):
+    if n:
+        ROWS_READ.inc(n, table)
+
+
+def rows_written(table, n):
+    if n and n > 0:
+        ROWS_WRITTEN.inc(n, table)
+
+
+def policy_error(policy_id, kind):
+    POLICY_ERRORS.inc(1, str(policy_id), kind)
+
+
+def _reset():
+    for m in _registry:   # fresh locks: another thread may have held one at fork time
+        m._lock = threading.Lock()
+        m._values = {}
+    _shared["flushed"], _shared["dirty"] = 0.0, False
+
+
+def share(directory):
+    """Aggregate metrics across processes forked from now on, through files in `directory`.
+
+    Call in the parent before forking workers. Each process starts from zero
+    after fork and snapshots its values to `<directory>/<pid>.json` (see
+    flush()); render() sums every snapshot, and retire() folds the snapshot of
+    an exited worker into the totals, so counters survive worker recycling.
+    """
+    if _shared["dir"] is not None:
+        return
+    os.makedirs(directory, exist_ok=True)
+    _shared["dir"] = directory
+    os.register_at_fork(after_in_child=_reset)
+    flush()
+
+
+def _path(name):
+    return os.path.join(_shared["dir"], name)
+
+
+@contextmanager
+def _locked(mode):
+    with open(_path(".lock"), "a") as f:
+        fcntl.flock(f, mode)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _write(name, data):
+    tmp = _path(f".{name}.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp, _path(name))   # readers see the old or the new snapshot, never half of one
+
+
+def _read(name):
+    try:
+        with open(_path(name), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _merge(totals, data):
+    for m in _registry:
+        for labels, v in data.get(m.name, ()):
+            m.merge(totals[m.name], tuple(labels), v)
+
+
+def flush(max_age=None):
+    """Snapshot this process's metrics for the other processes; no-op unless shared.
+
+    With `max_age`, only when something changed and the last snapshot is older.
+    """
+    if _shared["dir"] is None:
+        return
+    now = time.monotonic()
+    if max_age is not None and (not _shared["dirty"] or now - _shared["flushed"] < max_age):
+        return
+    _shared["flushed"], _shared["dirty"] = now, False
+    _write(f"{os.getpid()}.json", {m.name: [[list(k), v] for k, v in m.snapshot().items()] for m in _registry})
+
+
+def retire(pid):
+    """Fold an exited process's last snapshot into the retired totals (called by the parent)."""
+    if _shared["dir"] is None:
+        return
+    with _locked(fcntl.LOCK_EX):
+        data = _read(f"{pid}.json")
+        if not data:
+            return
+        totals = {m.name: {} for m in _registry}
+        _merge(totals, _read("retired.json"))
+        _merge(totals, data)
+        _write("retired.json", {name: [[list(k), v] for k, v in values.items()] for name, values in totals.items()})
+        os.remove(_path(f"{pid}.json"))
+
+
+def _collect():
+    """Per-metric values: this process's own, or the sum over every process when shared."""
+    if _shared["dir"] is None:
+        return {m.name: m.snapshot() for m in _registry}
+    flush()
+    totals = {m.name: {} for m in _registry}
+    with _locked(fcntl.LOCK_SH):
+        for name in os.listdir(_shared["dir"]):
+            if name.endswith(".json") and not name.startswith("."):
+                _merge(totals, _read(name))
+    return totals
+
+
+def render():
+    """All metrics in the Prometheus text exposition format, summed over workers when shared."""
+    values = _collect()
+    lines = []
+    for m in _registry:
+        lines.append(f"# HELP {m.name} {m.help}")
+        lines.append(f"# TYPE {m.name} {m.kind}")
+        lines.extend(m.samples(values[m.name]))
+    return "\n".join(lines) + "\n"
+
+
+def init_app(app):
+    """Record per-route request latency for every request handled by app."""
+    from flask import g, request
+
+    @app.before_request
+    def _start_timer():
+        g._metrics_t0 = time.perf_counter()
+
+    @app.after_request
+    def _observe(response):
+        t0 = g.pop("_metrics_t0", None)
+        if t0 is not None:
+            route = request.url_rule.rule if request.url_rule else "<unmatched>"
+            REQUEST_SECONDS.observe(time.perf_counter() - t0, request.method, route, str(response.status_code))
+        return response
@@ -0,0 +1,71 @@
+from .abs_model import Model
+from .Policies import Policies
+from .Users import Users
+
+
+class ComplianceResults(Model):
+    table_name = "compliance_results"   # materialized per-(user, policy) outcomes
+    pk_name = ""                        # composite key; rows are written by backend.materialize
+    conflict_target = "user_id, policy_id"
+    table_constraints = ("PRIMARY KEY (user_id, policy_id)",)
+    table_options = "WITHOUT ROWID"    # clustered on (user_id, policy_id) for in-order reads
+    db_columns = {
+        "user_id": "INTEGER NOT NULL",  # users.user_id
+        "policy_id": "TEXT NOT NULL",   # policies.policy_id
+        "actual": "BLOB",               # user value as stored (no type affinity)
+        "passed": "INTEGER",            # boolean as 0/1
+        "note": "TEXT",                 # "", "missing field", "unsupported operator ...", "error: ..."
+    }
+    sources = (Users, Policies)   # tables whose writes make stored results stale
+
+    @classmethod
+    def stale_table(cls, model):
+        """Keys of `model` rows written since their results were computed.
+
+        Filled by triggers, so writes from any connection or tool are seen;
+        backend.materialize clears a key when it refreshes that row's results.
+        """
+        return f"{cls.table_name}_stale_{model.table_name}"
+
+    @classmethod
+    def create_table(cls, conn):
+        super().create_table(conn)
+        conn.execute(
+            f"CREATE INDEX IF NOT EXISTS ix_{cls.table_name}_policy ON {cls.table_name} (policy_id)"
+        )
+        conn.execute(   # failing rows and sorting by outcome (the PK rides along in the index)
+            f"CREATE INDEX IF NOT EXISTS ix_{cls.table_name}_passed ON {cls.table_name} (passed)"
+        )
+        for model in cls.sources:
+            stale, key = cls.stale_table(model), model.pk_name
+            key_type = model.db_columns[key].split()[0]   # one-column key: cheap to mark per written row
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {stale} ({key} {key_type} PRIMARY KEY)")
+            for event, refs in (("INSERT", ("NEW",)), ("UPDATE", ("OLD", "NEW")), ("DELETE", ("OLD",))):
+                marks = " ".join(   # not OR IGNORE: an outer upsert's ON CONFLICT would override it
+                    f"INSERT INTO {stale} VALUES ({ref}.{key}) ON CONFLICT DO NOTHING;" for ref in refs
+                )
+                conn.execute(
+                    f"CREATE TRIGGER IF NOT EXISTS tr_{model.table_name}_{event.lower()}_stale "
+                    f"AFTER {event} ON {model.table_name} BEGIN {marks} END"
+                )
+        conn.commit()
+
+    @classmethod
+    def _keyed(cls):
+        raise TypeError(f"{cls.table_name} is keyed on (user_id, policy_id); use backend.materialize")
+
+    @classmethod
+    def get(cls, conn, pk):
+        cls._keyed()
+
+    @classmethod
+    def update(cls, conn, pk, **data):
+        cls._keyed()
+
+    @classmethod
+    def delete(cls, conn, pk):
+        cls._keyed()
+
+    @classmethod
+    def query(cls, conn, filters=(), after=None, limit=None):
+        cls._keyed()
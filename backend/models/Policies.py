@@ -11,3 +11,9 @@ class Policies(Model):
         "operator": "TEXT",               # comparison op (==, !=, >=, <=, >, <, in, includes)
         "value": "TEXT",                  # expected value (stored as TEXT; JSON string if needed)
     }
+    indexes = (   # /evaluate/checks and /evaluate/export walk policies in sort order (materialize.iter_checks)
+        ("description", "policy_id"),     # sort=description
+        ("field", "policy_id"),           # sort=field
+        ("operator", "policy_id"),        # sort=operator
+        ("value", "policy_id"),           # sort=expected (CHECK_COLUMNS maps it to p.value)
+    )
@@ -0,0 +1,14 @@
+from .abs_model import Model
+
+
+class PolicyStats(Model):
+    table_name = "policy_stats"   # observed outcomes per policy, used to order verdict checks
+    pk_name = "policy_id"
+    db_columns = {
+        "policy_id": "TEXT PRIMARY KEY",  # policies.policy_id
+        "signature": "TEXT",              # field/operator/value the counts were gathered for
+        "evaluated": "INTEGER",           # checks run
+        "failed": "INTEGER",              # checks that failed
+        "cost_ns": "REAL",                # total sampled check time (ns)
+        "cost_samples": "INTEGER",        # checks timed
+    }
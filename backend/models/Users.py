@@ -19,3 +19,11 @@ class Users(Model):
         "age": "INTEGER",              # user age (years)
         "income": "REAL",              # numeric income
     }
+    indexes = (                        # columns filtered by GET /users
+        ("username",),
+        ("email",),
+        ("role",),
+        ("age",),
+        ("income",),
+        ("login_count",),
+    )
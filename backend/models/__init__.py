@@ -1,6 +1,8 @@
 from .abs_model import Model
 from .Users import Users
 from .Policies import Policies
+from .ComplianceResults import ComplianceResults
+from .PolicyStats import PolicyStats
 
-__all__ = ["Users", "Policies"]
-__all_models__ = [Users, Policies]
+__all__ = ["Users", "Policies", "ComplianceResults", "PolicyStats"]
+__all_models__ = [Users, Policies, ComplianceResults, PolicyStats]
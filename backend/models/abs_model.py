@@ -1,14 +1,24 @@
-import sqlite3
 from abc import ABC
 from collections import OrderedDict
+from backend import metrics, versions
+
+QUERY_OPS = ("=", "!=", "<", "<=", ">", ">=", "in")
 
 
 class Model(ABC):
-    """Lightweight SQLite base model with simple CRUD utilities."""
+    """Lightweight SQLite base model with simple CRUD utilities.
+
+    Every committed write bumps the table's data version (backend.versions).
+    """
 
     table_name = ""
     pk_name = ""
     db_columns = OrderedDict()
+    table_constraints = ()  # extra table-level clauses, e.g. a composite PRIMARY KEY
+    table_options = ""      # e.g. "WITHOUT ROWID"
+    conflict_target = ""    # upsert key; defaults to pk_name
+    indexes = ()            # secondary indexes, one tuple of column names each
+    batch_size = 1000   # rows per transaction for bulk writes
 
     @classmethod
     def columns(cls):
@@ -16,8 +26,16 @@ class Model(ABC):
 
     @classmethod
     def create_table(cls, conn):
-        cols = ", ".join(f"{name} {ctype}" for name, ctype in cls.db_columns.items())
-        conn.execute(f"CREATE TABLE IF NOT EXISTS {cls.table_name} ({cols})")
+        defs = [f"{name} {ctype}" for name, ctype in cls.db_columns.items()]
+        defs.extend(cls.table_constraints)
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {cls.table_name} ({', '.join(defs)}) {cls.table_options}".rstrip()
+        )
+        for cols in cls.indexes:
+            conn.execute(
+                f"CREATE INDEX IF NOT EXISTS ix_{cls.table_name}_{'_'.join(cols)} "
+                f"ON {cls.table_name} ({', '.join(cols)})"
+            )
         conn.commit()
 
     @classmethod
@@ -31,6 +49,8 @@ class Model(ABC):
         cur = conn.cursor()
         cur.execute(sql, vals)
         conn.commit()
+        metrics.rows_written(cls.table_name, 1)
+        versions.bump(cls.table_name)
         return data.get(cls.pk_name, cur.lastrowid)
 
     @classmethod
@@ -47,6 +67,9 @@ class Model(ABC):
         cur = conn.cursor()
         cur.execute(sql, params)
         conn.commit()
+        metrics.rows_written(cls.table_name, cur.rowcount)
+        if cur.rowcount:
+            versions.bump(cls.table_name)
         return cur.rowcount
 
     @classmethod
@@ -56,6 +79,9 @@ class Model(ABC):
         cur = conn.cursor()
         cur.execute(f"DELETE FROM {cls.table_name} WHERE {cls.pk_name} = ?", (pk,))
         conn.commit()
+        metrics.rows_written(cls.table_name, cur.rowcount)
+        if cur.rowcount:
+            versions.bump(cls.table_name)
         return cur.rowcount
 
     @classmethod
@@ -66,26 +92,68 @@ class Model(ABC):
         ).fetchone()
         if not row:
             return None
+        metrics.rows_read(cls.table_name, 1)
         return dict(zip(cls.columns(), row))
 
     @classmethod
     def all(cls, conn):
         cols = ", ".join(cls.columns())
         rows = conn.execute(f"SELECT {cols} FROM {cls.table_name}").fetchall()
+        metrics.rows_read(cls.table_name, len(rows))
         return [dict(zip(cls.columns(), r)) for r in rows]
 
+    @classmethod
+    def iter_all(cls, conn, batch_size=1000):
+        """Yield rows from a live cursor without loading the whole table."""
+        cols = cls.columns()
+        cur = conn.execute(f"SELECT {', '.join(cols)} FROM {cls.table_name}")
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            metrics.rows_read(cls.table_name, len(rows))
+            for r in rows:
+                yield dict(zip(cols, r))
+
+    @classmethod
+    def query(cls, conn, filters=(), after=None, limit=None):
+        """Rows matching every (column, op, value) filter, in primary-key order.
+
+        `after` continues a keyset page: only rows with a greater primary key are
+        returned, so any page costs the same as the first.
+        """
+        where, params = [], []
+        for col, op, value in filters:
+            if col not in cls.db_columns:
+                raise ValueError(f"unknown column '{col}'")
+            if op == "in":
+                where.append(f"{col} IN ({', '.join('?' for _ in value)})")
+                params.extend(value)
+            elif op in QUERY_OPS:
+                where.append(f"{col} {op} ?")
+                params.append(value)
+            else:
+                raise ValueError(f"unsupported operator '{op}'")
+        if after is not None:
+            where.append(f"{cls.pk_name} > ?")
+            params.append(after)
+        cols = cls.columns()
+        sql = f"SELECT {', '.join(cols)} FROM {cls.table_name}"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" ORDER BY {cls.pk_name}"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        rows = conn.execute(sql, params).fetchall()
+        metrics.rows_read(cls.table_name, len(rows))
+        return [dict(zip(cols, r)) for r in rows]
+
     # ---- minimal extras ----
     @classmethod
     def upsert(cls, conn, **data):
         """Insert or update by primary key."""
-        pk = data.get(cls.pk_name)
-        try:
-            return cls.insert(conn, **data)
-        except sqlite3.IntegrityError:
-            if pk is None:
-                raise
-            cls.update(conn, pk, **data)
-            return pk
+        return cls.upsert_many(conn, [data])[0]
 
     @classmethod
     def delete_all(cls, conn):
@@ -93,4 +161,68 @@ class Model(ABC):
         cur = conn.cursor()
         cur.execute(f"DELETE FROM {cls.table_name}")
         conn.commit()
+        metrics.rows_written(cls.table_name, cur.rowcount)
+        versions.bump(cls.table_name)
         return cur.rowcount
+
+    # ---- bulk writes ----
+    @classmethod
+    def _batches(cls, rows, batch_size):
+        """Group consecutive rows with the same column set, at most batch_size each."""
+        all_cols = cls.columns()
+        batch, key = [], None
+        for row in rows:
+            cols = tuple(c for c in all_cols if c in row)
+            if batch and (cols != key or len(batch) >= batch_size):
+                yield key, batch
+                batch = []
+            key = cols
+            batch.append(row)
+        if batch:
+            yield key, batch
+
+    @classmethod
+    def _write_batches(cls, conn, rows, batch_size, sql_for):
+        ids = []
+        for cols, batch in cls._batches(rows, batch_size or cls.batch_size):
+            if not cols:
+                raise ValueError("no data to insert")
+            params = [[r[c] for c in cols] for r in batch]
+            try:
+                conn.executemany(sql_for(cols), params)
+                if cls.pk_name in cols:
+                    ids.extend(r[cls.pk_name] for r in batch)
+                else:
+                    # rowids allocated inside one write transaction are consecutive
+                    last = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+                    ids.extend(range(last - len(batch) + 1, last + 1))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            metrics.rows_written(cls.table_name, len(batch))
+            versions.bump(cls.table_name)
+        return ids
+
+    @classmethod
+    def insert_many(cls, conn, rows, batch_size=None):
+        """Insert rows with executemany, one transaction per batch; returns primary keys."""
+        def sql_for(cols):
+            placeholders = ", ".join("?" for _ in cols)
+            return f"INSERT INTO {cls.table_name} ({', '.join(cols)}) VALUES ({placeholders})"
+        return cls._write_batches(conn, rows, batch_size, sql_for)
+
+    @classmethod
+    def upsert_many(cls, conn, rows, batch_size=None):
+        """Insert or update rows by primary key (ON CONFLICT DO UPDATE), one transaction per batch."""
+        key = [c.strip() for c in (cls.conflict_target or cls.pk_name).split(",")]
+
+        def sql_for(cols):
+            placeholders = ", ".join("?" for _ in cols)
+            sql = f"INSERT INTO {cls.table_name} ({', '.join(cols)}) VALUES ({placeholders})"
+            if any(c not in cols for c in key):
+                return sql
+            updates = ", ".join(f"{c} = excluded.{c}" for c in cols if c not in key)
+            action = f"DO UPDATE SET {updates}" if updates else "DO NOTHING"
+            return f"{sql} ON CONFLICT({', '.join(key)}) {action}"
+        return cls._write_batches(conn, rows, batch_size, sql_for)
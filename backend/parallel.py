@@ -0,0 +1,126 @@
+import atexit
+import hashlib
+import multiprocessing
+import os
+import pickle
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from backend import metrics
+from backend.db import connect
+from backend.evaluators import evaluate_user
+from backend.models import Users
+from backend.settings import Settings
+
+WORKERS = os.cpu_count() or 1   # worker processes for parallel evaluation
+THRESHOLD = 20000               # below this many users evaluate in-process
+CHUNK_SIZE = 5000               # users per task
+
+_settings = Settings("parallel", {"workers": WORKERS, "threshold": THRESHOLD, "chunk_size": CHUNK_SIZE})
+_executors = {}   # worker count -> pool
+_executor_lock = threading.Lock()
+
+# per-worker-process state
+_worker_conns = {}
+_worker_plans = {}
+
+
+def configure(workers=None, threshold=None, chunk_size=None, app=None):
+    """Set worker count, in-process threshold and chunk size; with `app` for that Flask app only."""
+    values = {}
+    if workers is not None:
+        values["workers"] = max(1, int(workers))
+    if threshold is not None:
+        values["threshold"] = int(threshold)
+    if chunk_size is not None:
+        values["chunk_size"] = max(1, int(chunk_size))
+    _settings.update(values, app)
+    if app is None:
+        shutdown()
+
+
+def get_executor():
+    """Process pool for the active worker count; spawned workers so it is safe under threaded servers."""
+    workers = _settings["workers"]
+    with _executor_lock:
+        ex = _executors.get(workers)
+        if ex is None:
+            ex = _executors[workers] = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return ex
+
+
+def shutdown():
+    with _executor_lock:
+        executors = list(_executors.values())
+        _executors.clear()
+    for ex in executors:
+        ex.shutdown(wait=False, cancel_futures=True)
+
+
+atexit.register(shutdown)
+
+
+def _worker_conn(db_path):
+    conn = _worker_conns.get(db_path)
+    if conn is None:
+        conn = connect(db_path, readonly=True)
+        _worker_conns[db_path] = conn
+    return conn
+
+
+def _worker_plan(plan_key, plan_blob):
+    plan = _worker_plans.get(plan_key)
+    if plan is None:
+        _worker_plans.clear()
+        plan = pickle.loads(plan_blob)
+        _worker_plans[plan_key] = plan
+    return plan
+
+
+def _evaluate_slice(db_path, plan_key, plan_blob, lo, hi):
+    """Worker task: evaluate users with lo <= user_id < hi (hi None = open)."""
+    conn = _worker_conn(db_path)
+    plan = _worker_plan(plan_key, plan_blob)
+    cols = Users.columns()
+    sql = f"SELECT {', '.join(cols)} FROM {Users.table_name} WHERE user_id >= ?"
+    params = [lo]
+    if hi is not None:
+        sql += " AND user_id < ?"
+        params.append(hi)
+    rows = conn.execute(sql + " ORDER BY user_id", params)
+    return [evaluate_user(dict(zip(cols, r)), plan) for r in rows]
+
+
+def chunk_bounds(conn, chunk_size):
+    """Split the user_id space into [lo, hi) ranges of ~chunk_size users each."""
+    starts = [r[0] for r in conn.execute(
+        f"SELECT user_id FROM (SELECT user_id, ROW_NUMBER() OVER (ORDER BY user_id) AS rn "
+        f"FROM {Users.table_name}) WHERE (rn - 1) % ? = 0 ORDER BY user_id",
+        (chunk_size,),
+    )]
+    return [(lo, starts[i + 1] if i + 1 < len(starts) else None) for i, lo in enumerate(starts)]
+
+
+def iter_results(conn, db_path, plan, threshold=None, chunk_size=None):
+    """Yield per-user results in user order, fanning out to worker processes for large tables."""
+    threshold = _settings["threshold"] if threshold is None else threshold
+    chunk_size = chunk_size or _settings["chunk_size"]
+    total = conn.execute(f"SELECT COUNT(*) FROM {Users.table_name}").fetchone()[0]
+    if _settings["workers"] <= 1 or total < threshold:
+        for u in Users.iter_all(conn):
+            yield evaluate_user(u, plan)
+        return
+
+    blob = pickle.dumps(plan)
+    plan_key = hashlib.sha1(blob).hexdigest()
+    tasks = [(str(db_path), plan_key, blob, lo, hi) for lo, hi in chunk_bounds(conn, chunk_size)]
+    try:
+        for chunk in get_executor().map(_evaluate_slice, *zip(*tasks)):
+            metrics.rows_read(Users.table_name, len(chunk))   # read by a worker process, counted here
+            yield from chunk
+    except BrokenProcessPool:
+        shutdown()
+        raise
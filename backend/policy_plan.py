@@ -0,0 +1,60 @@
+import json
+import threading
+from backend import metrics, versions
+from backend.evaluators import compile_policies
+from backend.models import Policies
+
+_lock = threading.Lock()
+_cached = {}   # database file -> (policy version, plan)
+
+
+def decode_policy_value(v):
+    if isinstance(v, str):
+        try:
+            return json.loads(v)
+        except Exception:
+            return v
+    return v
+
+
+def load_policies(conn):
+    """Read the policies table into decoded evaluator dicts."""
+    return [
+        {
+            "policy_id":  p.get("policy_id"),
+            "description": p.get("description"),
+            "field":       p.get("field"),
+            "operator":    p.get("operator"),
+            "value":       decode_policy_value(p.get("value")),
+        }
+        for p in Policies.all(conn)
+    ]
+
+
+def policy_version():
+    return versions.current(Policies.table_name)
+
+
+def bump_policy_version():
+    """Invalidate cached plans; Model writes do this already, call it after raw SQL writes to policies."""
+    return versions.bump(Policies.table_name)
+
+
+def _db_file(conn):
+    return conn.execute("PRAGMA database_list").fetchone()[2]
+
+
+def get_plan(conn):
+    """Return the compiled plan for the current policy-set version of conn's database."""
+    key = _db_file(conn)
+    version = policy_version()
+    cached_version, plan = _cached.get(key, (None, None))
+    if plan is not None and cached_version == version:
+        return plan
+    with _lock:
+        cached_version, plan = _cached.get(key, (None, None))
+        if plan is None or cached_version != version:
+            with metrics.phase("plan.compile"):
+                plan = compile_policies(load_policies(conn))
+            _cached[key] = (version, plan)
+    return plan
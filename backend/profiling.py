@@ -0,0 +1,245 @@
+import cProfile
+import functools
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from flask import current_app, request
+
+HEADER = "X-Profile"              # request header selecting the profiler: cprofile | sample
+TOKEN_HEADER = "X-Profile-Token"  # must match PROFILE_TOKEN when one is configured
+MODES = ("cprofile", "sample")
+PROFILE_DIR = Path(__file__).parent / ".." / "data" / "profiles"
+TOP_N = 30
+SAMPLE_INTERVAL = 0.001           # seconds between stack samples
+
+_busy = threading.Lock()          # one profiled request at a time
+
+
+def _label(filename, lineno, name):
+    return f"{name} ({os.path.basename(filename)}:{lineno})".replace(";", ":")
+
+
+class _Sampler:
+    """Time-weighted stack sampler running in the profiled thread itself.
+
+    A sys.setprofile hook records the current stack at most once per
+    `interval`, weighted by the time since the previous sample. Sampling in
+    the request thread avoids the GIL bias of a separate sampler thread.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.stacks = Counter()   # stack -> microseconds
+        self._last = None
+
+    def _hook(self, frame, event, arg):
+        now = time.perf_counter()
+        elapsed = now - self._last
+        if elapsed < self.interval:
+            return
+        self._last = now
+        stack = []
+        if event in ("c_return", "c_exception"):  # time since the last sample ended inside this builtin
+            stack.append(f"{getattr(arg, '__qualname__', repr(arg))} (~)".replace(";", ":"))
+        while frame is not None:
+            code = frame.f_code
+            stack.append(_label(code.co_filename, code.co_firstlineno, code.co_name))
+            frame = frame.f_back
+        self.stacks[tuple(reversed(stack))] += int(elapsed * 1e6)
+
+    def enable(self):
+        self._last = time.perf_counter()
+        sys.setprofile(self._hook)
+
+    def disable(self):
+        sys.setprofile(None)
+
+
+class _Session:
+    """One profiled request: start/pause around every slice of work, then write reports."""
+
+    def __init__(self, mode, interval):
+        self.mode = mode
+        self.started = time.time()
+        self.elapsed = 0.0
+        self._t0 = None
+        if mode == "cprofile":
+            self.profiler = cProfile.Profile()
+        else:
+            self.profiler = _Sampler(interval)
+
+    def enable(self):
+        self._t0 = time.perf_counter()
+        self.profiler.enable()
+
+    def disable(self):
+        self.profiler.disable()
+        self.elapsed += time.perf_counter() - self._t0
+
+    def finish(self, out_dir, name, top_n):
+        """Write <name>.top.txt and <name>.collapsed (and <name>.prof for cprofile)."""
+        out_dir.mkdir(parents=True, exist_ok=True)
+        base = out_dir / name
+        if self.mode == "cprofile":
+            stats = pstats.Stats(self.profiler)
+            stats.dump_stats(str(base) + ".prof")
+            top = _cprofile_top(stats, top_n)
+            collapsed = _cprofile_collapsed(stats)
+        else:
+            top = _sample_top(self.profiler.stacks, top_n)
+            collapsed = self.profiler.stacks
+        header = f"# {self.mode} profile, {self.elapsed * 1000:.1f} ms profiled\n"
+        (Path(str(base) + ".top.txt")).write_text(header + top, encoding="utf-8")
+        with open(str(base) + ".collapsed", "w", encoding="utf-8") as f:
+            for stack, weight in sorted(collapsed.items()):
+                if weight > 0:
+                    f.write(f"{';'.join(stack)} {weight}\n")
+        return top
+
+
+def _cprofile_top(stats, top_n):
+    rows = []
+    for (filename, lineno, name), (cc, nc, tt, ct, _) in stats.stats.items():
+        rows.append((tt, ct, nc, _label(filename, lineno, name)))
+    rows.sort(reverse=True)
+    lines = [f"{'self ms':>10} {'total ms':>10} {'calls':>9}  function"]
+    for tt, ct, nc, label in rows[:top_n]:
+        lines.append(f"{tt * 1000:10.2f} {ct * 1000:10.2f} {nc:9d}  {label}")
+    return "\n".join(lines) + "\n"
+
+
+def _cprofile_collapsed(stats, min_us=1, max_depth=64):
+    """Approximate collapsed stacks (microseconds) by splitting each caller->callee edge's time top-down."""
+    callees = {}
+    for func, (_, _, _, _, callers) in stats.stats.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((func, edge[3]))
+    roots = [f for f, (_, _, _, _, callers) in stats.stats.items() if not callers]
+    out = Counter()
+
+    def walk(func, path, budget, depth):
+        _, _, tt, ct, _ = stats.stats[func]
+        path = path + (_label(*func),)
+        share = budget / ct if ct else 0.0
+        out[path] += int(tt * share * 1e6)
+        if depth >= max_depth:
+            return
+        for callee, edge_ct in callees.get(func, ()):
+            part = edge_ct * share
+            if part * 1e6 >= min_us and _label(*callee) not in path:
+                walk(callee, path, part, depth + 1)
+
+    for root in roots:
+        walk(root, (), stats.stats[root][3], 0)
+    return out
+
+
+def _sample_top(stacks, top_n):
+    own, total = Counter(), Counter()
+    for stack, us in stacks.items():
+        own[stack[-1]] += us
+        for label in set(stack):
+            total[label] += us
+    all_us = sum(stacks.values()) or 1
+    lines = [f"{'self %':>7} {'total %':>8} {'self ms':>9}  function  ({len(stacks)} distinct stacks)"]
+    for label, us in own.most_common(top_n):
+        lines.append(f"{100 * us / all_us:7.1f} {100 * total[label] / all_us:8.1f} {us / 1000:9.1f}  {label}")
+    return "\n".join(lines) + "\n"
+
+
+class _ProfiledBody:
+    """Response iterable that profiles body generation and finishes the session on close."""
+
+    def __init__(self, session, body, finish):
+        self.session = session
+        self.body = body
+        self._finish = finish
+        self._it = None
+        self._done = False
+
+    def __iter__(self):
+        self._it = iter(self.body)
+        return self
+
+    def __next__(self):
+        self.session.enable()
+        try:
+            return next(self._it)
+        finally:
+            self.session.disable()
+
+    def close(self):
+        if self._done:
+            return
+        self._done = True
+        try:
+            close = getattr(self.body, "close", None)
+            if close is not None:
+                close()
+        finally:
+            self._finish()
+
+
+def _requested_mode(config):
+    mode = (request.headers.get(HEADER) or "").strip().lower()
+    if mode not in MODES:
+        return None
+    token = config.get("PROFILE_TOKEN")
+    if token and request.headers.get(TOKEN_HEADER) != token:
+        return None
+    return mode
+
+
+def _wrap(endpoint, view):
+    @functools.wraps(view)
+    def profiled_view(*args, **kwargs):
+        app = current_app._get_current_object()
+        mode = _requested_mode(app.config)
+        if mode is None:
+            return view(*args, **kwargs)
+        if not _busy.acquire(blocking=False):
+            response = app.make_response(view(*args, **kwargs))
+            response.headers[HEADER] = "busy"
+            return response
+
+        session = _Session(mode, app.config.get("PROFILE_SAMPLE_INTERVAL", SAMPLE_INTERVAL))
+        name = f"{time.strftime('%Y%m%dT%H%M%S')}-{int(session.started * 1000) % 1000:03d}-{endpoint}-{mode}"
+
+        def finish():
+            try:
+                top = session.finish(
+                    Path(app.config.get("PROFILE_DIR", PROFILE_DIR)), name, app.config.get("PROFILE_TOP_N", TOP_N),
+                )
+                app.logger.info("profile %s (%s %s)\n%s", name, request_method, request_path, top)
+            finally:
+                _busy.release()
+
+        request_method, request_path = request.method, request.full_path
+        try:
+            session.enable()
+            try:
+                response = app.make_response(view(*args, **kwargs))
+            finally:
+                session.disable()
+        except BaseException:
+            finish()
+            raise
+        response.headers[HEADER] = name
+        if response.is_streamed:
+            response.response = _ProfiledBody(session, response.response, finish)
+        else:
+            finish()
+        return response
+
+    return profiled_view
+
+
+def instrument(app):
+    """Wrap every registered view so a request carrying X-Profile is profiled."""
+    for endpoint, view in list(app.view_functions.items()):
+        if endpoint != "static":
+            app.view_functions[endpoint] = _wrap(endpoint, view)
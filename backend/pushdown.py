@@ -0,0 +1,243 @@
+from backend import metrics
+from backend.evaluators import check_outcome
+from backend.models import Users
+
+_SQL_OPS = {
+    "==": "=",
+    "!=": "!=",
+    ">=": ">=",
+    "<=": "<=",
+    ">":  ">",
+    "<":  "<",
+}
+
+
+def _family(v):
+    if isinstance(v, (int, float)):
+        return "numeric"
+    if isinstance(v, str):
+        return "text"
+    return None
+
+
+def column_families(conn, fields):
+    """Map each users column to 'numeric' or 'text' when its stored values are uniform."""
+    fields = [f for f in dict.fromkeys(fields) if f in Users.db_columns]
+    if not fields:
+        return {}
+    probes = []
+    for f in fields:
+        probes += [
+            f"COALESCE(SUM(typeof({f}) IN ('integer', 'real')), 0)",
+            f"COALESCE(SUM(typeof({f}) = 'text'), 0)",
+            f"COALESCE(SUM(typeof({f}) = 'blob'), 0)",
+        ]
+    row = conn.execute(f"SELECT {', '.join(probes)} FROM {Users.table_name}").fetchone()
+    out = {}
+    for k, f in enumerate(fields):
+        nums, texts, others = row[3 * k: 3 * k + 3]
+        if others:
+            continue
+        if not texts:
+            out[f] = "numeric"
+        elif not nums:
+            out[f] = "text"
+    return out
+
+
+def compile_check(template, families):
+    """Translate one check into (sql_condition, params), or None if it must run in Python."""
+    field = template["field"]
+    op = template["operator"]
+    expected = template["expected"]
+    family = families.get(field)
+    if family is None:
+        return None
+    if op in _SQL_OPS:
+        if _family(expected) != family:
+            return None
+        return f"{field} {_SQL_OPS[op]} ?", [expected]
+    if op == "in" and isinstance(expected, (list, tuple)):
+        if not expected:
+            return "0", []
+        if any(_family(x) != family for x in expected):
+            return None
+        return f"{field} IN ({', '.join('?' for _ in expected)})", list(expected)
+    if op == "includes" and family == "text" and isinstance(expected, str):
+        return f"instr({field}, ?) > 0", [expected]
+    return None
+
+
+class PushdownQuery:
+    """SELECT evaluating every pushable check as a 1/0/NULL column."""
+
+    def __init__(self, conn, plan):
+        self.plan = plan
+        self.fields = [f for f in plan.fields if f in Users.db_columns]
+        families = column_families(conn, self.fields)
+        self.pushed = []
+        self.fallback = []
+        exprs, params = [], []
+        for j, (_, _, _, template) in enumerate(plan.checks):
+            field = template["field"]
+            if field not in Users.db_columns:
+                continue
+            compiled = compile_check(template, families)
+            if compiled is None:
+                self.fallback.append(j)
+                continue
+            cond, cond_params = compiled
+            exprs.append(f"CASE WHEN {field} IS NULL THEN NULL WHEN {cond} THEN 1 ELSE 0 END")
+            params.extend(cond_params)
+            self.pushed.append(j)
+        self.exprs = exprs
+        self.params = params
+        field_pos = {f: 2 + i for i, f in enumerate(self.fields)}
+        self._actual_pos = [field_pos.get(t["field"]) for _, _, _, t in plan.checks]
+        self._pushed_pos = {j: 2 + len(self.fields) + k for k, j in enumerate(self.pushed)}
+
+    def select(self, where="", extra=()):
+        cols = ["user_id", "username"] + self.fields + self.exprs + list(extra)
+        sql = f"SELECT {', '.join(cols)} FROM {Users.table_name}"
+        if where:
+            sql += f" WHERE {where}"
+        return sql + " ORDER BY user_id"
+
+    def outcomes(self, row):
+        """(actual, passed, note) for every check of one row from `select()`."""
+        out = []
+        for j, (_, fn, operand, template) in enumerate(self.plan.checks):
+            pos = self._actual_pos[j]
+            actual = None if pos is None else row[pos]
+            if actual is not None and j in self._pushed_pos:
+                out.append((actual, row[self._pushed_pos[j]] == 1, ""))
+            else:
+                out.append((actual, *check_outcome(fn, operand, template, actual)))
+        return out
+
+    def results(self, cursor):
+        """Turn rows from `select()` into evaluate_user-shaped dicts."""
+        templates = [t for _, _, _, t in self.plan.checks]
+        n = 0
+        for row in cursor:
+            n += 1
+            checks = []
+            overall_ok = True
+            for template, (actual, passed, note) in zip(templates, self.outcomes(row)):
+                if not passed:
+                    overall_ok = False
+                check = template.copy()
+                check["actual"] = actual
+                check["passed"] = passed
+                check["note"] = note
+                checks.append(check)
+            yield {
+                "username": row[1],
+                "overall_compliant": overall_ok,
+                "checks": checks,
+            }
+        metrics.rows_read(Users.table_name, n)
+
+
+def evaluate_all(conn, plan):
+    """Evaluate every user inside SQLite; same output as the per-user loop."""
+    query = PushdownQuery(conn, plan)
+    cur = conn.execute(query.select(), query.params)
+    return list(query.results(cur))
+
+
+def _new_group(n):
+    return {"users": 0, "compliant": 0, "counts": [[0, 0, 0] for _ in range(n)]}
+
+
+def _aggregate_sql(conn, query, group_by):
+    """All checks pushed down: one GROUP BY query, no rows leave SQLite."""
+    n = len(query.plan)
+    aliases = {j: f"p{k}" for k, j in enumerate(query.pushed)}
+    inner = [f"{group_by or 'NULL'} AS grp"] + [f"{e} AS {aliases[j]}" for j, e in zip(query.pushed, query.exprs)]
+    cols = ["grp", "COUNT(*)"]
+    all_pass = []
+    for j in range(n):
+        alias = aliases.get(j)
+        if alias is None:
+            cols += ["0", "COUNT(*)", "COUNT(*)"]
+            all_pass.append("0")
+            continue
+        cols += [
+            f"COALESCE(SUM({alias} IS 1), 0)",
+            f"COALESCE(SUM({alias} IS NOT 1), 0)",
+            f"COALESCE(SUM({alias} IS NULL), 0)",
+        ]
+        all_pass.append(f"{alias} IS 1")
+    cols.append(f"COALESCE(SUM({' AND '.join(all_pass) or '1'}), 0)")
+    sql = (
+        f"SELECT {', '.join(cols)} FROM (SELECT {', '.join(inner)} FROM {Users.table_name}) "
+        f"GROUP BY grp ORDER BY grp"
+    )
+    groups = {}
+    for row in conn.execute(sql, query.params):
+        g = _new_group(n)
+        g["users"] = row[1]
+        g["compliant"] = row[-1]
+        g["counts"] = [list(row[2 + 3 * j: 5 + 3 * j]) for j in range(n)]
+        groups[row[0]] = g
+    return groups
+
+
+def _aggregate_rows(conn, query, group_by):
+    """Some checks need Python: one pass over rows, counting only."""
+    n = len(query.plan)
+    extra = [group_by] if group_by else []
+    groups = {}
+    for row in conn.execute(query.select(extra=extra), query.params):
+        key = row[-1] if group_by else None
+        g = groups.get(key)
+        if g is None:
+            g = groups[key] = _new_group(n)
+        g["users"] += 1
+        ok = True
+        for c, (actual, passed, _) in zip(g["counts"], query.outcomes(row)):
+            if passed:
+                c[0] += 1
+            else:
+                ok = False
+                c[1] += 1
+                if actual is None:
+                    c[2] += 1
+        g["compliant"] += ok
+    return groups
+
+
+def aggregate_counts(conn, plan, group_by=None):
+    """Per-policy pass/fail/missing counts and compliant-user counts, optionally per group.
+
+    `group_by` must be a trusted users column name.
+    """
+    query = PushdownQuery(conn, plan)
+    if query.fallback:
+        groups = _aggregate_rows(conn, query, group_by)
+    else:
+        groups = _aggregate_sql(conn, query, group_by)
+
+    total = _new_group(len(plan))
+    for g in groups.values():
+        total["users"] += g["users"]
+        total["compliant"] += g["compliant"]
+        for t, c in zip(total["counts"], g["counts"]):
+            t[0] += c[0]
+            t[1] += c[1]
+            t[2] += c[2]
+    out = {
+        "users": total["users"],
+        "compliant": total["compliant"],
+        "policies": [
+            {"policy_id": t["policy_id"], "passed": c[0], "failed": c[1], "missing": c[2]}
+            for (_, _, _, t), c in zip(plan.checks, total["counts"])
+        ],
+    }
+    if group_by:
+        out["groups"] = [
+            {"value": key, "users": g["users"], "compliant": g["compliant"]}
+            for key, g in sorted(groups.items(), key=lambda kv: (kv[0] is not None, str(kv[0])))
+        ]
+    return out
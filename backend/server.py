@@ -0,0 +1,265 @@
+import os
+import random
+import select
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import threading
+import time
+from werkzeug.serving import ThreadedWSGIServer, WSGIRequestHandler
+from backend import db, jobs, metrics, parallel, versions
+from backend.policy_plan import get_plan
+
+HOST = "127.0.0.1"
+PORT = 8000
+WORKERS = os.cpu_count() or 1   # worker processes accepting on the shared socket
+THREADS = 8                     # requests a worker handles at once (one pooled connection each)
+MAX_REQUESTS = 0                # requests before a worker is replaced; 0 = never
+MAX_REQUESTS_JITTER = 0         # random extra requests per worker, so they are not replaced together
+GRACEFUL_TIMEOUT = 30.0         # seconds a stopping worker gets to finish its requests and jobs
+TIMEOUT = 60.0                  # seconds a client connection may stall before it is dropped
+BACKLOG = 2048
+POLL = 0.5                      # seconds between checks of the stop flag
+
+
+def _log(message):
+    try:
+        print(f"[{os.getpid()}] {message}", file=sys.stderr, flush=True)
+    except OSError:
+        pass   # stderr gone (e.g. a closed pipe); not a reason to stop serving
+
+
+class _Handler(WSGIRequestHandler):
+    timeout = TIMEOUT
+    access_log = False
+
+    def log_request(self, code="-", size="-"):
+        if self.access_log:
+            super().log_request(code, size)
+
+
+class _WorkerServer(ThreadedWSGIServer):
+    """Werkzeug's threaded server on an inherited socket, with at most `threads` requests in flight."""
+
+    daemon_threads = False
+    block_on_close = True   # server_close() waits for requests in flight
+
+    def __init__(self, sock, app, threads):
+        host, port = sock.getsockname()[:2]
+        super().__init__(host, port, app, handler=_Handler, fd=sock.fileno())
+        self.socket.settimeout(POLL)   # workers race for each connection; a loser's accept() times out
+        self.slots = threading.BoundedSemaphore(threads)
+        self.handled = 0
+
+    def process_request(self, request, client_address):
+        self.handled += 1
+        try:
+            super().process_request(request, client_address)
+        except BaseException:
+            self.slots.release()
+            raise
+
+    def process_request_thread(self, request, client_address):
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            self.slots.release()
+
+
+def _worker(sock, app, options):
+    """Body of a forked worker: accept until stopped, recycled or orphaned, drain, exit."""
+    stop = threading.Event()
+    master = os.getppid()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, signal.SIG_IGN)    # the master turns Ctrl-C into SIGTERM
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+    _Handler.access_log = options["access_log"]
+
+    server = _WorkerServer(sock, app, options["threads"])
+    limit = None
+    if options["max_requests"] > 0:
+        limit = options["max_requests"] + random.randint(0, max(0, options["max_requests_jitter"]))
+    while not stop.is_set() and (limit is None or server.handled < limit) and os.getppid() == master:
+        if not server.slots.acquire(timeout=POLL):
+            continue   # every thread busy; leave new connections to the other workers
+        before = server.handled
+        server.handle_request()
+        if server.handled == before:
+            server.slots.release()
+        metrics.flush(metrics.FLUSH_INTERVAL)
+    if limit is not None and server.handled >= limit:
+        _log(f"worker recycled after {server.handled} requests")
+    server.server_close()
+    jobs.shutdown(wait=True)
+    parallel.shutdown()
+    db.close_pools()
+    metrics.flush()
+
+
+class Master:
+    """Parent process: owns the listening socket and keeps `workers` forked workers running.
+
+    The app (and its compiled policy plan) is built here once and inherited by
+    every worker. Metrics are summed over workers, past and present, through
+    snapshot files in a temporary directory. SIGHUP builds a fresh app with `factory` and replaces the
+    workers gracefully; SIGTERM/SIGINT stop them and exit.
+    """
+
+    def __init__(self, app, factory, host=HOST, port=PORT, workers=WORKERS, threads=THREADS,
+                 max_requests=MAX_REQUESTS, max_requests_jitter=MAX_REQUESTS_JITTER,
+                 graceful_timeout=GRACEFUL_TIMEOUT, access_log=False):
+        self.app = app
+        self.factory = factory
+        self.host, self.port = host, port
+        self.size = max(1, int(workers))
+        self.graceful_timeout = graceful_timeout
+        self.options = {
+            "threads": max(1, int(threads)),
+            "max_requests": int(max_requests),
+            "max_requests_jitter": int(max_requests_jitter),
+            "access_log": access_log,
+        }
+        self.generation = 0
+        self.workers = {}      # pid -> generation
+        self.stopping = {}     # pid -> deadline for SIGKILL
+        self.signals = []
+        self.sock = None
+        self.failed_at = None  # last time a worker exited with an error; respawns pause for a second
+
+    def _prepare(self):
+        """Compile the plan and drop what must not cross fork (connections, pools, threads)."""
+        with self.app.app_context(), db.DBManager(readonly=True) as d:   # the app's database, not the default
+            get_plan(d.conn)
+        db.close_pools()
+        parallel.shutdown()
+        jobs.shutdown()
+        metrics.flush()
+
+    def _spawn(self):
+        pid = os.fork()
+        if pid:
+            self.workers[pid] = self.generation
+            return
+        code = 0
+        try:
+            signal.set_wakeup_fd(-1)
+            os.close(self._wakeup_r)
+            os.close(self._wakeup_w)
+            _worker(self.sock, self.app, self.options)
+        except BaseException as e:
+            _log(f"worker failed: {e!r}")
+            code = 1
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(code)
+
+    def _stop(self, pids):
+        deadline = time.monotonic() + self.graceful_timeout
+        for pid in pids:
+            if pid not in self.stopping:
+                self.stopping[pid] = deadline
+                try:
+                    os.kill(pid, signal.SIGTERM)
+                except ProcessLookupError:
+                    pass
+
+    def _reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            metrics.retire(pid)
+            generation = self.workers.pop(pid, None)
+            stopped = self.stopping.pop(pid, None) is not None
+            code = os.waitstatus_to_exitcode(status)
+            if generation is not None and not stopped and code != 0:
+                _log(f"worker {pid} exited with status {code}")
+                self.failed_at = time.monotonic()
+
+    def _kill_overdue(self):
+        now = time.monotonic()
+        for pid, deadline in list(self.stopping.items()):
+            if now >= deadline:
+                _log(f"worker {pid} did not stop within {self.graceful_timeout}s; killing it")
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+                self.stopping[pid] = float("inf")
+
+    def _reload(self):
+        _log("reloading")
+        try:
+            app = self.factory()
+            for model in db.MODELS:
+                versions.bump(model.table_name)   # the file may have been changed outside the server
+            self.app = app
+            self._prepare()
+        except Exception as e:
+            _log(f"reload failed, keeping the current workers: {e!r}")
+            return
+        old = list(self.workers)
+        self.generation += 1
+        for _ in range(self.size):
+            self._spawn()
+        self._stop(old)
+
+    def _on_signal(self, signum, frame):
+        self.signals.append(signum)
+
+    def _wait(self, timeout):
+        try:
+            select.select([self._wakeup_r], [], [], timeout)
+            os.read(self._wakeup_r, 4096)
+        except (BlockingIOError, InterruptedError):
+            pass
+
+    def run(self):
+        self.sock = socket.create_server((self.host, self.port), backlog=BACKLOG)
+        self.sock.set_inheritable(True)
+        versions.share(model.table_name for model in db.MODELS)
+        self.metrics_dir = tempfile.mkdtemp(prefix="pcc-metrics-")
+        metrics.share(self.metrics_dir)
+        self._prepare()
+
+        self._wakeup_r, self._wakeup_w = os.pipe()
+        os.set_blocking(self._wakeup_r, False)
+        os.set_blocking(self._wakeup_w, False)
+        signal.set_wakeup_fd(self._wakeup_w)
+        for signum in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+            signal.signal(signum, self._on_signal)
+
+        _log(f"listening on http://{self.host}:{self.sock.getsockname()[1]} with {self.size} workers")
+        for _ in range(self.size):
+            self._spawn()
+        try:
+            while True:
+                self._wait(1.0)
+                pending, self.signals = self.signals, []
+                if signal.SIGTERM in pending or signal.SIGINT in pending:
+                    break
+                if signal.SIGHUP in pending:
+                    self._reload()
+                self._reap()
+                self._kill_overdue()
+                if self.failed_at is not None and time.monotonic() - self.failed_at < 1.0:
+                    continue
+                current = sum(1 for g in self.workers.values() if g == self.generation)
+                for _ in range(self.size - current):
+                    self._spawn()
+        finally:
+            _log("shutting down")
+            self._stop(list(self.workers))
+            while self.workers:
+                self._wait(0.1)
+                self._reap()
+                self._kill_overdue()
+            self.sock.close()
+            shutil.rmtree(self.metrics_dir, ignore_errors=True)
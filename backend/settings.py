@@ -0,0 +1,37 @@
+from flask import current_app, has_app_context
+
+_EXTENSION = "pcc_settings"
+
+
+class Settings:
+    """One module's settings: the process defaults, overridden per Flask app.
+
+    Reads return the value set for the app whose context is active (a request,
+    or `with app.app_context()`), else the process default. Modules keep
+    indexing `_settings[...]` as they would a dict.
+    """
+
+    def __init__(self, name, defaults):
+        self.name = name
+        self.defaults = defaults
+
+    def _scoped(self):
+        if has_app_context():
+            return current_app.extensions.get(_EXTENSION, {}).get(self.name)
+        return None
+
+    def __getitem__(self, key):
+        scoped = self._scoped()
+        if scoped is not None and key in scoped:
+            return scoped[key]
+        return self.defaults[key]
+
+    def __setitem__(self, key, value):
+        self.defaults[key] = value
+
+    def update(self, values, app=None):
+        """Set process defaults, or with `app` values for that app only."""
+        if app is None:
+            self.defaults.update(values)
+        else:
+            app.extensions.setdefault(_EXTENSION, {}).setdefault(self.name, {}).update(values)
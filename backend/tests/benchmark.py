@@ -0,0 +1,247 @@
+# benchmark.py
+# Timed scenarios over synthetic data; results go to a JSON file for comparison across commits.
+#   python -m backend.tests.benchmark --scale 100k --out bench.json
+#   python -m backend.tests.benchmark --scale 100k --out new.json --compare bench.json
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from backend.evaluators import compile_policies, evaluate_user
+from backend.models import Users
+from backend.tests import datagen
+
+SCENARIOS = ("evaluate_user", "model_crud", "upload_csv", "upload_json", "evaluate_endpoint")
+EVAL_BATCH = 10_000     # users generated per batch outside the timed region
+CRUD_SAMPLE = 1_000     # single-row get/update/delete operations per run
+
+
+def _timed(fn, repeat):
+    """Best of `repeat` runs of fn() -> rows; returns (seconds, all_runs, rows)."""
+    runs, rows = [], 0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        rows = fn()
+        runs.append(time.perf_counter() - t0)
+    return min(runs), runs, rows
+
+
+def _record(results, name, timing, **extra):
+    seconds, runs, rows = timing
+    entry = {
+        "scenario": name,
+        "seconds": round(seconds, 6),
+        "runs": [round(r, 6) for r in runs],
+        "rows": rows,
+        "rows_per_sec": round(rows / seconds, 1) if seconds and rows else None,
+        **extra,
+    }
+    results.append(entry)
+    print(f"{name:<44} {seconds:9.3f}s  {entry['rows_per_sec'] or '':>12} rows/s", flush=True)
+
+
+def bench_evaluate_user(ctx, results):
+    plan = compile_policies(datagen.generate_policies())
+    policies = datagen.generate_policies()
+
+    def run(p):
+        elapsed, n = 0.0, 0
+        users = datagen.generate_users(ctx["users"], ctx["seed"])
+        while True:
+            batch = [u for _, u in zip(range(EVAL_BATCH), users)]
+            if not batch:
+                return elapsed, n
+            t0 = time.perf_counter()
+            for u in batch:
+                evaluate_user(u, p)
+            elapsed += time.perf_counter() - t0
+            n += len(batch)
+
+    for name, p in (("evaluate_user[plan]", plan), ("evaluate_user[list]", policies)):
+        runs = []
+        for _ in range(ctx["repeat"]):
+            elapsed, n = run(p)
+            runs.append(elapsed)
+        _record(results, name, (min(runs), runs, n))
+
+
+def bench_model_crud(ctx, results):
+    path = os.path.join(ctx["tmp"], "crud.db")
+    rng = random.Random(ctx["seed"])
+
+    def fresh():
+        if os.path.exists(path):
+            os.remove(path)
+        conn = sqlite3.connect(path)
+        Users.create_table(conn)
+        return conn
+
+    def insert_many():
+        conn = fresh()
+        try:
+            return len(Users.insert_many(conn, datagen.generate_users(ctx["users"], ctx["seed"])))
+        finally:
+            conn.close()
+
+    _record(results, "model.insert_many", _timed(insert_many, ctx["repeat"]))
+
+    conn = sqlite3.connect(path)
+    try:
+        ids = [r[0] for r in conn.execute("SELECT user_id FROM users")]
+        sample = [rng.choice(ids) for _ in range(min(CRUD_SAMPLE, len(ids)))]
+        _record(results, "model.iter_all", _timed(lambda: sum(1 for _ in Users.iter_all(conn)), ctx["repeat"]))
+        _record(results, "model.get", _timed(lambda: sum(1 for pk in sample if Users.get(conn, pk)), ctx["repeat"]))
+        _record(results, "model.update", _timed(
+            lambda: sum(Users.update(conn, pk, login_count=pk % 97) for pk in sample), ctx["repeat"]))
+        _record(results, "model.upsert_many", _timed(
+            lambda: len(Users.upsert_many(conn, ({"user_id": pk, "age": 30} for pk in sample))), ctx["repeat"]))
+        per_run = min(CRUD_SAMPLE, len(ids) // ctx["repeat"])
+        victims = iter(rng.sample(ids, per_run * ctx["repeat"]))
+        _record(results, "model.delete", _timed(
+            lambda: sum(Users.delete(conn, next(victims)) for _ in range(per_run)), ctx["repeat"]))
+    finally:
+        conn.close()
+
+
+def _make_client(ctx, name):
+    from backend.app import serving_app
+    path = os.path.join(ctx["tmp"], name)
+    if os.path.exists(path):
+        os.remove(path)
+    app = serving_app({"DB_PATH": path, "HTTP_CACHE_ENABLED": False})   # best-of-N must not time cache hits
+    client = app.test_client()
+    r = client.post("/policies", json=datagen.generate_policies())
+    assert r.status_code == 201, r.data
+    return client
+
+
+def _bench_upload(ctx, results, ext):
+    src = ctx["files"][ext]
+
+    def run():
+        client = _make_client(ctx, f"upload_{ext}.db")
+        with open(src, "rb") as f:
+            r = client.post("/upload/users", data={"file": (f, os.path.basename(src))})
+        body = r.get_json()
+        assert r.status_code == 201 and body["rejected"] == 0, r.data[:500]
+        return body["stored"]
+
+    _record(results, f"upload.users[{ext}]", _timed(run, ctx["repeat"]), bytes=os.path.getsize(src))
+
+
+def bench_upload_csv(ctx, results):
+    _bench_upload(ctx, results, "csv")
+
+
+def bench_upload_json(ctx, results):
+    _bench_upload(ctx, results, "json")
+
+
+def bench_evaluate_endpoint(ctx, results):
+    from backend.api.evaluate import ENGINES
+    client = _make_client(ctx, "evaluate.db")
+    with open(ctx["files"]["json"], "rb") as f:
+        r = client.post("/upload/users", data={"file": (f, "users.json")})
+    assert r.status_code == 201 and r.get_json()["rejected"] == 0, r.data[:500]
+    n = ctx["users"]
+
+    def get(url):
+        def run():
+            r = client.get(url, buffered=False)
+            size = sum(len(chunk) for chunk in r.response)
+            r.close()
+            assert r.status_code == 200, url
+            ctx.setdefault("sizes", {})[url] = size
+            return n
+        return run
+
+    urls = [f"/evaluate?engine={e}&stream=1" for e in ENGINES]
+    urls += ["/evaluate?format=bitset", "/evaluate?format=bitset&engine=vector", "/evaluate/summary"]
+    urls += ["/evaluate?mode=verdict&engine=python&stream=1", "/evaluate?mode=verdict&stream=1"]
+    if n <= ctx["buffered_limit"]:
+        urls.append("/evaluate")
+    for url in urls:
+        timing = _timed(get(url), ctx["repeat"])
+        _record(results, f"GET {url}", timing, bytes=ctx["sizes"][url])
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def _compare(results, baseline_path):
+    with open(baseline_path, encoding="utf-8") as f:
+        base = {r["scenario"]: r for r in json.load(f)["results"]}
+    print(f"\ncompared with {baseline_path} (ratio > 1 is slower):")
+    for r in results:
+        b = base.get(r["scenario"])
+        if b and b["seconds"]:
+            print(f"{r['scenario']:<44} {r['seconds'] / b['seconds']:6.2f}x")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark evaluation, uploads and model CRUD.")
+    ap.add_argument("--scale", default="1k", help="user count or one of " + ", ".join(datagen.SCALES))
+    ap.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated subset of " + ", ".join(SCENARIOS))
+    ap.add_argument("--repeat", type=int, default=3, help="runs per scenario; the best is reported")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--buffered-limit", type=int, default=200_000,
+                    help="also time the buffered (non-streaming) /evaluate up to this many users")
+    ap.add_argument("--out", default="benchmark-results.json")
+    ap.add_argument("--compare", help="previous results file to compare against")
+    args = ap.parse_args(argv)
+
+    n = datagen.SCALES.get(args.scale.lower()) or int(args.scale)
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        ap.error(f"unknown scenarios: {sorted(unknown)}")
+
+    with tempfile.TemporaryDirectory(prefix="pcc-bench-") as tmp:
+        ctx = {"users": n, "seed": args.seed, "repeat": max(1, args.repeat), "tmp": tmp,
+               "buffered_limit": args.buffered_limit}
+        if {"upload_csv", "upload_json", "evaluate_endpoint"} & set(scenarios):
+            ctx["files"] = {
+                "csv": datagen.write_users_csv(os.path.join(tmp, "users.csv"), n, args.seed),
+                "json": datagen.write_users_json(os.path.join(tmp, "users.json"), n, args.seed),
+            }
+        results = []
+        started = datetime.now(timezone.utc).isoformat()
+        for s in scenarios:
+            globals()[f"bench_{s}"](ctx, results)
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "started": started,
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "users": n,
+            "policies": len(datagen.generate_policies()),
+            "seed": args.seed,
+            "repeat": ctx["repeat"],
+        },
+        "results": results,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nwrote {args.out}")
+    if args.compare:
+        _compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+# conftest.py
+# Shared pytest fixtures: an app on a fresh temporary database.
+import os
+import pytest
+from backend import db, jobs, parallel
+from backend.tests import datagen
+
+
+@pytest.fixture
+def app(tmp_path):
+    from backend.app import serving_app
+    app = serving_app({
+        "DB_PATH": os.path.join(tmp_path, "test.db"),
+        "EVAL_JOB_DIR": os.path.join(tmp_path, "jobs"),
+        "METRICS_ENABLED": False,
+    })
+    with app.app_context():   # direct db/jobs calls in tests use this app's settings
+        yield app
+    jobs.shutdown()
+    parallel.shutdown()
+    db.close_pools()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def seeded(client):
+    """Client on a database holding datagen's policies and 50 users."""
+    assert client.post("/policies", json=datagen.generate_policies()).status_code == 201
+    assert client.post("/users", json=list(datagen.generate_users(50))).status_code == 201
+    return client
@@ -0,0 +1,106 @@
+# datagen.py
+# Deterministic synthetic users/policies for benchmarks.
+#   python -m backend.tests.datagen --users 100000 --out /tmp/bench
+import argparse
+import csv
+import json
+import os
+import random
+from backend.evaluators import OPS
+from backend.models import Users
+from backend.models.Users import ALLOWED_ROLES
+
+SCALES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+
+_FIRST = ["Taylor", "Alex", "Jordan", "Sam", "Morgan", "Casey", "Riley", "Jamie", "Avery", "Quinn"]
+_LAST = ["Johnson", "Garcia", "Smith", "Brown", "Lee", "Martin", "Clark", "Lopez", "Young", "King"]
+_DOMAINS = ["example.org", "data.dev", "corp.io", "mail.com"]
+_ROLES = sorted(ALLOWED_ROLES)
+_PW_CHARS = "abcdefghijkmnopqrstuvwxyzABCDEFGHJKLMNPQRSTUVWXYZ23456789"
+
+USER_FIELDS = [c for c in Users.columns() if c != "user_id"]
+
+
+def _password(rng):
+    body = "".join(rng.choice(_PW_CHARS) for _ in range(9))
+    return "Aa1" + body
+
+
+def generate_users(n, seed=0, missing_rate=0.02):
+    """Yield n valid user dicts; `missing_rate` of optional fields are None."""
+    rng = random.Random(seed)
+    for i in range(n):
+        first, last = rng.choice(_FIRST), rng.choice(_LAST)
+        u = {
+            "username": f"{first[0].lower()}{last.lower()}{i:07d}",
+            "name": first,
+            "lastname": last,
+            "email": f"{first.lower()}.{last.lower()}{i}@{rng.choice(_DOMAINS)}",
+            "role": rng.choice(_ROLES),
+            "password": _password(rng),
+            "mfa_enabled": int(rng.random() < 0.7),
+            "login_count": rng.randint(0, 500),
+            "age_days": rng.randint(0, 4000),
+            "age": rng.randint(14, 80),
+            "income": round(rng.uniform(0, 250_000), 2),
+        }
+        for k in ("email", "role", "mfa_enabled", "age", "income"):
+            if rng.random() < missing_rate:
+                u[k] = None
+        yield u
+
+
+def generate_policies():
+    """A fixed policy set exercising every operator in OPS."""
+    policies = [
+        {"policy_id": "b_mfa", "description": "MFA enabled", "field": "mfa_enabled", "operator": "==", "value": 1},
+        {"policy_id": "b_not_guest", "description": "Not a guest", "field": "role", "operator": "!=", "value": "guest"},
+        {"policy_id": "b_adult", "description": "Adult", "field": "age", "operator": ">=", "value": 18},
+        {"policy_id": "b_age_max", "description": "Age <= 65", "field": "age", "operator": "<=", "value": 65},
+        {"policy_id": "b_logins", "description": "More than 5 logins", "field": "login_count", "operator": ">", "value": 5},
+        {"policy_id": "b_fresh", "description": "Account younger than 10 years", "field": "age_days", "operator": "<", "value": 3650},
+        {"policy_id": "b_roles", "description": "Staff role", "field": "role", "operator": "in", "value": ["admin", "analyst", "devops"]},
+        {"policy_id": "b_corp_mail", "description": "Corporate email", "field": "email", "operator": "includes", "value": "@corp.io"},
+        {"policy_id": "b_income", "description": "Income reported", "field": "income", "operator": ">=", "value": 0},
+        {"policy_id": "b_missing", "description": "Field not in schema", "field": "department", "operator": "==", "value": "it"},
+    ]
+    assert {p["operator"] for p in policies} == set(OPS)
+    return policies
+
+
+def write_users_csv(path, n, seed=0):
+    # CSV has no null and the upload path rejects empty numeric cells, so no missing values here
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=USER_FIELDS)
+        w.writeheader()
+        for u in generate_users(n, seed, missing_rate=0):
+            w.writerow(u)
+    return path
+
+
+def write_users_json(path, n, seed=0):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("[")
+        for i, u in enumerate(generate_users(n, seed)):
+            f.write(("," if i else "") + json.dumps(u))
+        f.write("]")
+    return path
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Write synthetic users (CSV + JSON) and policies.")
+    ap.add_argument("--users", default="1k", help="count or one of " + ", ".join(SCALES))
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", default=".")
+    args = ap.parse_args(argv)
+    n = SCALES.get(args.users.lower()) or int(args.users)
+    os.makedirs(args.out, exist_ok=True)
+    write_users_csv(os.path.join(args.out, f"users_{n}.csv"), n, args.seed)
+    write_users_json(os.path.join(args.out, f"users_{n}.json"), n, args.seed)
+    with open(os.path.join(args.out, "policies.json"), "w", encoding="utf-8") as f:
+        json.dump(generate_policies(), f, indent=2)
+    print(f"wrote {n} users and {len(generate_policies())} policies to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+# test_app.py
+# App factory: settings scoped to each app, and the lazy `backend.app:app` entry point.
+import os
+from backend import app as app_module, db
+from backend.tests import datagen
+
+
+def _app(tmp_path, name):
+    return app_module.serving_app({
+        "DB_PATH": os.path.join(tmp_path, f"{name}.db"),
+        "EVAL_JOB_DIR": os.path.join(tmp_path, f"{name}-jobs"),
+        "METRICS_ENABLED": False,
+    })
+
+
+def test_a_second_app_does_not_reconfigure_the_first(tmp_path):
+    first = _app(tmp_path, "first")
+    users = list(datagen.generate_users(3))
+    try:
+        assert first.test_client().post("/users", json=users).status_code == 201
+        second = _app(tmp_path, "second")
+        assert second.test_client().get("/users").get_json() == []
+        assert len(first.test_client().get("/users").get_json()) == 3
+        with first.app_context():
+            assert db.current_db_path() == os.path.join(tmp_path, "first.db")
+        assert db.current_db_path() == str(db.DB_PATH)   # process default untouched
+    finally:
+        db.close_pools()
+
+
+def test_module_level_app_is_built_on_first_access(monkeypatch):
+    built = []
+    monkeypatch.setattr(app_module, "serving_app", lambda: built.append(1) or "the app")
+    vars(app_module).pop("app", None)
+    try:
+        assert app_module.app == "the app" and app_module.app == "the app"
+        assert built == [1]
+    finally:
+        vars(app_module).pop("app", None)
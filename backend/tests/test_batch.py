@@ -0,0 +1,77 @@
+# test_batch.py
+# python -m backend evaluate: offline results against the server's, summary and exit status.
+import csv
+import gzip
+import io
+import json
+from backend import __main__ as cli
+from backend.evaluators import compile_policies, evaluate_user
+from backend.tests import datagen
+from backend.validators import validate_user
+
+
+def _files(tmp_path, users):
+    users_path = tmp_path / "users.json"
+    users_path.write_text(json.dumps(users), encoding="utf-8")
+    policies_path = tmp_path / "policies.json"
+    policies_path.write_text(json.dumps(datagen.generate_policies()), encoding="utf-8")
+    return str(users_path), str(policies_path)
+
+
+def _evaluate(users, policies, tmp_path, out, *extra):
+    summary = tmp_path / "summary.json"
+    code = cli.main(["evaluate", "--users", users, "--policies", policies, "-o", str(tmp_path / out),
+                     "--summary", str(summary), "--workers", "2", "--chunk-size", "7", *extra])
+    return code, json.loads(summary.read_text(encoding="utf-8"))
+
+
+def test_ndjson_results_and_summary(tmp_path):
+    users = list(datagen.generate_users(30, seed=4))
+    users[5]["password"] = "short"
+    users[12]["age"] = -3
+    code, summary = _evaluate(*_files(tmp_path, users), tmp_path, "out.ndjson")
+    assert code == 0
+
+    plan = compile_policies(datagen.generate_policies())
+    live = [evaluate_user(validate_user(u), plan) for i, u in enumerate(users) if i not in (5, 12)]
+    lines = (tmp_path / "out.ndjson").read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line) for line in lines] == json.loads(json.dumps(live))
+
+    assert (summary["users"], summary["evaluated"], summary["rejected"]) == (30, 28, 2)
+    assert summary["compliant"] == sum(r["overall_compliant"] for r in live)
+    assert [(e["row"], e["field"]) for e in summary["errors"]] == [(6, "password"), (13, "age")]
+    for i, p in enumerate(summary["policies"]):
+        assert p["passed"] == sum(r["checks"][i]["passed"] for r in live)
+
+
+def test_csv_rows_match_the_server_export(client, tmp_path):
+    users = list(datagen.generate_users(25, seed=5))
+    users_path, policies_path = _files(tmp_path, users)
+    code, _ = _evaluate(users_path, policies_path, tmp_path, "out.csv.gz")
+    assert code == 0
+    with gzip.open(tmp_path / "out.csv.gz", "rt", encoding="utf-8", newline="") as f:
+        offline = list(csv.DictReader(f))
+
+    assert client.post("/policies", json=datagen.generate_policies()).status_code == 201
+    assert client.post("/users", json=users).status_code == 201
+    served = list(csv.DictReader(io.StringIO(client.get("/evaluate/export").get_data(as_text=True))))
+
+    def key(row):
+        return row["username"], row["policy_id"]
+    assert len(offline) == 25 * 10
+    assert sorted(offline, key=key) == sorted(served, key=key)
+
+
+def test_exit_status_for_bad_policies_and_a_malformed_users_file(tmp_path):
+    users_path, policies_path = _files(tmp_path, list(datagen.generate_users(20)))
+    bad_policies = tmp_path / "bad.json"
+    bad_policies.write_text('[{"policy_id": "x", "field": "age", "operator": "~", "value": 1}]', encoding="utf-8")
+    assert cli.main(["evaluate", "--users", users_path, "--policies", str(bad_policies),
+                     "-o", str(tmp_path / "x.ndjson")]) == 2
+
+    text = json.dumps(list(datagen.generate_users(20)))[:-1] + ', {"username": '
+    cut = tmp_path / "cut.json"
+    cut.write_text(text, encoding="utf-8")
+    code, summary = _evaluate(str(cut), policies_path, tmp_path, "cut.ndjson")
+    assert code == 1 and "error" in summary
+    assert len((tmp_path / "cut.ndjson").read_text(encoding="utf-8").splitlines()) == summary["evaluated"] == 20
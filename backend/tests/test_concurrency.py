@@ -0,0 +1,66 @@
+# test_concurrency.py
+# A long streamed /evaluate read held open while uploads write to the same database.
+# With the default WAL profile the uploads must finish while the read is still in progress.
+import io
+import json
+import sqlite3
+import threading
+import time
+import pytest
+from backend import db
+from backend.tests import datagen
+
+USERS = 5_000   # enough rows that the read is still open when the uploads run
+
+
+def _users_file(n, seed, prefix):
+    users = []
+    for u in datagen.generate_users(n, seed):
+        u["username"] = prefix + u["username"]
+        users.append(u)
+    return io.BytesIO(json.dumps(users).encode("utf-8"))
+
+
+def _reader(app, state, chunk_delay):
+    client = app.test_client()
+    state["read_start"] = time.perf_counter()
+    r = client.get("/evaluate?engine=python&stream=1", buffered=False)
+    lines = 0
+    try:
+        for chunk in r.response:
+            lines += chunk.count(b"\n")
+            time.sleep(chunk_delay)  # slow consumer keeps the read statement open
+    finally:
+        r.close()
+    state["read_end"] = time.perf_counter()
+    state["read_status"] = r.status_code
+    state["read_rows"] = lines
+
+
+def test_uploads_finish_during_a_long_read(app, client):
+    assert client.post("/policies", json=datagen.generate_policies()).status_code == 201
+    r = client.post("/upload/users", data={"file": (_users_file(USERS, 0, ""), "base.json")})
+    assert r.status_code == 201, r.data[:500]
+
+    state = {}
+    reader = threading.Thread(target=_reader, args=(app, state, 0.005))
+    reader.start()
+    while "read_start" not in state:
+        time.sleep(0.01)
+    time.sleep(0.2)  # let the first chunks go out so the read is in flight
+    statuses = []
+    for i in range(3):
+        r = client.post("/upload/users", data={"file": (_users_file(100, i + 1, f"w{i}_"), f"w{i}.json")})
+        statuses.append(r.status_code)
+    writes_done = time.perf_counter()
+    reader.join()
+
+    assert statuses == [201, 201, 201], statuses   # DELETE journal mode: 500 "database is locked"
+    assert state["read_status"] == 200 and state["read_rows"] == USERS, state
+    assert writes_done < state["read_end"], "uploads were blocked by the reader"
+
+
+def test_readonly_pool_cannot_write(app):
+    with db.DBManager(readonly=True) as d:
+        with pytest.raises(sqlite3.OperationalError):
+            d.conn.execute("INSERT INTO policies (policy_id, field, operator, value) VALUES ('x', 'age', '>', '1')")
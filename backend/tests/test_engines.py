@@ -0,0 +1,116 @@
+# test_engines.py
+# The vector, sql, parallel and stored engines against live evaluate_user results.
+import json
+import pytest
+from backend import db, parallel, vectorized
+from backend.evaluators import compile_policies, evaluate_user
+from backend.models import Users
+from backend.policy_plan import get_plan
+
+ENGINES = ["stored", "python", "vector", "sql", "parallel"]
+
+# value types that do not match the column's stored type: SQL pushdown must evaluate these in Python
+MIXED = [
+    {"policy_id": "m_income_text", "description": "", "field": "income", "operator": "==", "value": "abc"},
+    {"policy_id": "m_age_mixed_in", "description": "", "field": "age", "operator": "in", "value": [30, "40", 50.0]},
+    {"policy_id": "m_logins_float", "description": "", "field": "login_count", "operator": ">", "value": 5.5},
+    {"policy_id": "m_mfa_bool", "description": "", "field": "mfa_enabled", "operator": "==", "value": True},
+    {"policy_id": "m_name_lt", "description": "", "field": "name", "operator": "<", "value": "M"},
+]
+
+
+@pytest.fixture
+def mixed(app, seeded):
+    assert seeded.post("/policies", json=MIXED).status_code == 201
+    parallel.configure(workers=2, threshold=10, chunk_size=7, app=app)   # 50 users: several chunks on the pool
+    return seeded
+
+
+def _live():
+    with db.DBManager() as d:
+        plan = get_plan(d.conn)
+        return json.loads(json.dumps([evaluate_user(u, plan) for u in Users.iter_all(d.conn)]))
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_engines_match_live_evaluation(mixed, engine):
+    live = _live()
+    assert any(c["note"] == "missing field" for r in live for c in r["checks"])   # NULLs are covered
+
+    r = mixed.get(f"/evaluate?engine={engine}")
+    assert r.status_code == 200 and r.get_json() == live
+
+    lines = mixed.get(f"/evaluate?engine={engine}&stream=1").get_data(as_text=True).splitlines()
+    assert [json.loads(line) for line in lines] == live
+    assert mixed.get(f"/evaluate?engine={engine}&stream=array").get_json() == live
+
+
+@pytest.mark.parametrize("engine", ["stored", "python"])
+def test_verdicts_match_full_results(mixed, engine):
+    live = _live()
+    body = mixed.get(f"/evaluate?mode=verdict&engine={engine}").get_json()
+    assert [(v["username"], v["overall_compliant"]) for v in body] == [
+        (r["username"], r["overall_compliant"]) for r in live
+    ]
+    for v, r in zip(body, live):
+        failed = {c["policy_id"] for c in r["checks"] if not c["passed"]}
+        assert v["failed_policy"] in failed if failed else v["failed_policy"] is None
+
+
+def test_vector_engine_falls_back_for_expected_values_float64_cannot_hold(seeded):
+    pytest.importorskip("numpy")
+    plan = compile_policies([
+        {"policy_id": "huge_lt", "description": "", "field": "login_count", "operator": "<", "value": 10 ** 400},
+        {"policy_id": "huge_ge", "description": "", "field": "age_days", "operator": ">=", "value": -10 ** 400},
+        {"policy_id": "huge_in", "description": "", "field": "age", "operator": "in", "value": [30, 10 ** 400]},
+    ])
+    with db.DBManager(readonly=True) as d:
+        live = [evaluate_user(u, plan) for u in Users.iter_all(d.conn)]
+        assert vectorized.evaluate_all(d.conn, plan) == live
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_engines_on_an_empty_table(client, engine):
+    assert client.post("/policies", json=MIXED).status_code == 201
+    r = client.get(f"/evaluate?engine={engine}")
+    assert r.status_code == 200 and r.get_json() == []
+    assert client.get(f"/evaluate?engine={engine}&stream=1").get_data() == b""
+    assert client.get(f"/evaluate?engine={engine}&stream=array").get_json() == []
+
+
+def test_bad_parameters_are_rejected(seeded):
+    assert seeded.get("/evaluate?engine=nope").status_code == 400
+    assert seeded.get("/evaluate?format=xml").status_code == 400
+    assert seeded.get("/evaluate?mode=nope").status_code == 400
+    assert seeded.get("/evaluate?mode=verdict&engine=sql").status_code == 400
+    assert seeded.get("/evaluate?mode=verdict&format=bitset").status_code == 400
+
+
+def _expected_summary(live, roles):
+    policies = {}
+    for r in live:
+        for c in r["checks"]:
+            p = policies.setdefault(c["policy_id"], {"passed": 0, "failed": 0, "missing": 0})
+            p["passed" if c["passed"] else "failed"] += 1
+            p["missing"] += c["note"] == "missing field"
+    groups = {}
+    for r, role in zip(live, roles):
+        g = groups.setdefault(role, {"value": role, "users": 0, "compliant": 0})
+        g["users"] += 1
+        g["compliant"] += r["overall_compliant"]
+    return policies, groups
+
+
+@pytest.mark.parametrize("extra", [[], MIXED], ids=["pushed-down", "mixed-types"])
+def test_summary_counts_match_live_evaluation(seeded, extra):
+    if extra:
+        assert seeded.post("/policies", json=extra).status_code == 201
+    live = _live()
+    roles = [u["role"] for u in seeded.get("/users").get_json()]
+    policies, groups = _expected_summary(live, roles)
+
+    body = seeded.get("/evaluate/summary?group_by=role").get_json()
+    assert body["users"] == 50 and body["compliant"] == sum(r["overall_compliant"] for r in live)
+    assert {p["policy_id"]: {k: p[k] for k in ("passed", "failed", "missing")} for p in body["policies"]} == policies
+    assert {g["value"]: {k: g[k] for k in ("value", "users", "compliant")} for g in body["groups"]} == groups
+    assert seeded.get("/evaluate/summary?group_by=password").status_code == 400
@@ -0,0 +1,96 @@
+# test_evaluate.py
+# /evaluate endpoints against a temporary database.
+import base64
+import pytest
+from backend import db, http_cache, metrics, parallel
+
+
+def test_subset_by_username_returns_every_match(seeded):
+    dup = {**seeded.get("/users/4").get_json(), "password": "Aa1duplicate"}
+    dup.pop("user_id")
+    created = seeded.post("/users", json=dup).get_json()["created_ids"]
+
+    r = seeded.post("/evaluate", json={"usernames": [dup["username"], "nobody"], "user_ids": [4]})
+    assert r.status_code == 200
+    body = r.get_json()
+    assert [x["user_id"] for x in body["results"]] == [4, *created]
+    assert body["missing"] == {"user_ids": [], "usernames": ["nobody"]}
+
+
+def test_verdict_runs_do_not_invalidate_full_results(seeded):
+    def entries():
+        return http_cache.stats()["entries"]
+
+    http_cache.clear()
+    assert seeded.get("/evaluate").status_code == 200
+    assert entries() == 1
+    verdict = seeded.get("/evaluate?mode=verdict&engine=python")   # records policy_stats
+    assert verdict.status_code == 200 and "ETag" not in verdict.headers
+    assert entries() == 1   # its key was out of date once the stats were written: not stored
+
+    assert seeded.get("/evaluate").status_code == 200
+    assert entries() == 1   # full results do not read policy_stats: still a hit
+    assert seeded.get("/evaluate?mode=verdict").status_code == 200   # stored engine records nothing
+    assert entries() == 2
+
+
+
+@pytest.mark.parametrize("engine,threshold,stale", [
+    ("stored", 10, False), ("stored", 10, True),        # stale marks: every user is evaluated live
+    ("python", 10, False), ("vector", 10, False), ("sql", 10, False),
+    ("parallel", 10, False), ("parallel", 1000, False),  # below the threshold: evaluated in process
+])
+def test_each_engine_counts_the_users_it_reads_once(app, seeded, engine, threshold, stale):
+    if stale:
+        with db.DBManager() as d:
+            d.conn.execute("INSERT INTO compliance_results_stale_users (user_id) VALUES (1)")
+            d.conn.commit()
+    parallel.configure(workers=2, threshold=threshold, app=app)
+    metrics.configure(enabled=True, app=app)
+    before = metrics.ROWS_READ.value("users")
+    assert seeded.get(f"/evaluate?engine={engine}").status_code == 200
+    assert metrics.ROWS_READ.value("users") - before == 50
+
+
+def _decode_bitset(body):
+    """Expand format=bitset into /evaluate results, as described in the README."""
+    results = []
+    for username, bits, failures in zip(body["users"], body["bits"], body["failures"]):
+        raw = base64.b64decode(bits)
+        failed = {j: (actual, note) for j, actual, note in failures}
+        checks = []
+        for j, policy in enumerate(body["policies"]):
+            passed = bool(raw[j // 8] >> (j % 8) & 1)
+            assert passed == (j not in failed)
+            actual, note = failed.get(j, (None, ""))
+            checks.append({**policy, "actual": actual, "passed": passed, "note": note})
+        results.append({"username": username, "overall_compliant": not failed, "checks": checks})
+    return results
+
+
+@pytest.mark.parametrize("engine", ["stored", "python", "vector", "sql", "parallel"])
+def test_bitset_round_trips_to_the_full_results(seeded, engine):
+    full = seeded.get(f"/evaluate?engine={engine}").get_json()
+    body = seeded.get(f"/evaluate?engine={engine}&format=bitset").get_json()
+    assert body["format"] == "bitset" and len(body["policies"]) == 10   # two bytes per user
+    for r in full:   # actual values are only sent for failed checks
+        for c in r["checks"]:
+            if c["passed"]:
+                c["actual"] = None
+    assert _decode_bitset(body) == full
+
+
+@pytest.mark.parametrize("body", [
+    {"user_ids": "1"}, {"user_ids": [1, True]}, {"usernames": [1]}, {"user_ids": []},
+    {"user_ids": list(range(1, 1002))},
+])
+def test_bad_subset_requests_are_rejected(seeded, body):
+    r = seeded.post("/evaluate", json=body)
+    assert r.status_code == 400 and "error" in r.get_json()
+
+
+def test_single_user_evaluation_and_its_errors(seeded):
+    full = seeded.get("/evaluate?engine=python").get_json()
+    assert seeded.get("/evaluate/3").get_json() == {**full[2], "user_id": 3}
+    assert seeded.get("/evaluate/999").status_code == 404
+    assert seeded.get("/evaluate/3?mode=nope").status_code == 400
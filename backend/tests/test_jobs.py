@@ -0,0 +1,74 @@
+# test_jobs.py
+# Background evaluation jobs: results, cancellation and deduplication.
+import json
+import threading
+import time
+from backend import db, jobs
+from backend.evaluators import evaluate_user
+from backend.models import Users
+from backend.policy_plan import get_plan
+
+
+def _wait(client, job_id, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        body = client.get(f"/evaluate/jobs/{job_id}").get_json()
+        if body["status"] in ("done", "failed"):
+            return body
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_job_result_matches_live_evaluation(seeded):
+    r = seeded.post("/evaluate/jobs?engine=python")
+    assert r.status_code == 202
+    job = r.get_json()
+    assert _wait(seeded, job["id"])["status"] == "done"
+
+    again = seeded.post("/evaluate/jobs?engine=python").get_json()
+    assert again["id"] == job["id"] and again["deduplicated"] is True
+
+    lines = seeded.get(job["result_url"] + "?stream=1").get_data(as_text=True).splitlines()
+    with db.DBManager() as d:
+        plan = get_plan(d.conn)
+        live = [evaluate_user(u, plan) for u in Users.iter_all(d.conn)]
+    assert [json.loads(line) for line in lines] == json.loads(json.dumps(live))
+
+
+def test_unknown_job_and_bad_engine(seeded):
+    assert seeded.get("/evaluate/jobs/" + "0" * 32).status_code == 404
+    assert seeded.post("/evaluate/jobs?engine=nope").status_code == 400
+
+
+def _blocked(release):
+    def produce():
+        release.wait(10)
+        return iter(())
+    return produce
+
+
+def test_cancelled_jobs_fail_and_are_not_reused(app):
+    jobs.configure(workers=1, app=app)
+    release = threading.Event()
+    try:
+        running, _ = jobs.submit(("k", 1), 0, {}, _blocked(release), json.dumps)
+        queued, created = jobs.submit(("k", 2), 0, {}, _blocked(release), json.dumps)
+        assert created and queued.status == "queued"
+        jobs.shutdown()
+        assert queued.status == "failed" and "cancelled" in queued.error
+        assert jobs.get(queued.id).status == "failed"   # the state file says so too
+
+        retry, created = jobs.submit(("k", 2), 0, {}, _blocked(release), json.dumps)
+        assert created and retry.id != queued.id
+    finally:
+        release.set()
+        jobs.shutdown(wait=True)
+
+
+def test_jobs_of_other_processes_are_deduplicated(app):
+    done, _ = jobs.submit(("k", 3), 0, {}, lambda: iter(()), json.dumps)
+    jobs.shutdown(wait=True)
+    jobs._jobs.clear()   # as seen from another worker: only the spool directory is shared
+
+    again, created = jobs.submit(("k", 3), 0, {}, lambda: iter(()), json.dumps)
+    assert not created and again.id == done.id and again.status == "done"
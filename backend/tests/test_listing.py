@@ -0,0 +1,73 @@
+# test_listing.py
+# GET /users and GET /policies: filters and keyset pagination.
+import pytest
+from backend.api import listing
+from backend.tests import datagen
+
+
+def _pages(client, url, limit):
+    items, cursor, pages = [], None, 0
+    while True:
+        sep = "&" if "?" in url else "?"
+        body = client.get(f"{url}{sep}limit={limit}" + (f"&cursor={cursor}" if cursor else "")).get_json()
+        assert len(body["items"]) <= limit
+        items += body["items"]
+        pages += 1
+        cursor = body["next"]
+        if cursor is None:
+            return items, pages
+
+
+@pytest.mark.parametrize("limit,pages", [(7, 8), (25, 2), (50, 1), (1000, 1)])
+def test_pages_add_up_to_the_full_list(seeded, limit, pages):
+    everyone = seeded.get("/users").get_json()
+    assert len(everyone) == 50
+    assert _pages(seeded, "/users", limit) == (everyone, pages)
+
+
+def test_filters_combine_with_paging(seeded):
+    everyone = seeded.get("/users").get_json()
+    expected = [
+        u for u in everyone
+        if u["role"] in ("admin", "devops") and u["age"] is not None and 20 <= u["age"] <= 60 and u["mfa_enabled"] == 1
+    ]
+    url = "/users?role=admin,devops&age_min=20&age_max=60&mfa_enabled=true"
+    assert seeded.get(url).get_json() == expected
+    assert _pages(seeded, url, 3)[0] == expected
+
+    u = everyone[10]
+    assert seeded.get(f"/users?username={u['username']}").get_json() == [u]
+    assert seeded.get("/users?income_min=1e9").get_json() == []
+
+
+def test_cursor_past_the_end_and_deleted_rows(seeded):
+    last = seeded.get("/users").get_json()[-1]["user_id"]
+    body = seeded.get(f"/users?cursor={listing.encode_cursor(last)}").get_json()
+    assert body == {"items": [], "next": None}
+
+    page = seeded.get("/users?limit=10").get_json()
+    assert seeded.delete(f"/users/{page['items'][-1]['user_id']}").status_code == 204   # the cursor row itself
+    rest = seeded.get(f"/users?limit=10&cursor={page['next']}").get_json()
+    assert rest["items"][0]["user_id"] == page["items"][-1]["user_id"] + 1
+
+
+@pytest.mark.parametrize("query", ["limit=0", "limit=1001", "limit=ten", "cursor=!!", "age_min=old", "mfa_enabled=maybe"])
+def test_bad_paging_and_filter_values_are_rejected(seeded, query):
+    r = seeded.get(f"/users?{query}")
+    assert r.status_code == 400 and "error" in r.get_json()
+
+
+def test_policies_page_by_policy_id(seeded):
+    everyone = seeded.get("/policies").get_json()
+    items, pages = _pages(seeded, "/policies", 3)
+    assert items == sorted(everyone, key=lambda p: p["id"]) and pages == 4
+    assert [p["id"] for p in seeded.get("/policies?operator=in,includes").get_json()] == ["b_corp_mail", "b_roles"]
+
+
+def test_email_and_role_filters_ignore_case(client):
+    user = {**next(datagen.generate_users(1)), "email": "Mixed.Case@Example.ORG", "role": "Admin"}
+    assert client.post("/users", json=user).status_code == 201
+    stored = client.get("/users").get_json()[0]
+    assert (stored["email"], stored["role"]) == ("mixed.case@example.org", "admin")
+    assert client.get("/users?email=Mixed.Case@Example.ORG").get_json() == [stored]
+    assert client.get("/users?role=ADMIN,guest").get_json() == [stored]
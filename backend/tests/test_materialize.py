@@ -0,0 +1,135 @@
+# test_materialize.py
+# compliance_results stays equal to live evaluation across API writes, and
+# writes made around the API are detected.
+import sqlite3
+import pytest
+from backend import db, materialize
+from backend.evaluators import compile_policies, evaluate_user
+from backend.models import ComplianceResults, Users
+from backend.policy_plan import load_policies
+from backend.tests import datagen
+
+
+def _report(deep=True):
+    with db.DBManager() as d:
+        return materialize.check_consistency(d.conn, compile_policies(load_policies(d.conn)), deep=deep)
+
+
+def _assert_consistent():
+    report = _report()
+    assert report["consistent"] and report["stale"] == 0 and report["marked_stale"] == 0, report
+
+
+def test_api_writes_keep_results_consistent(seeded):
+    _assert_consistent()
+    user = seeded.get("/users/1").get_json()
+    new = {**next(datagen.generate_users(1, seed=7)), "username": "t_new_user"}
+
+    steps = [
+        lambda: seeded.post("/users", json=new),
+        lambda: seeded.put("/users/1", json={**new, "username": user["username"], "mfa_enabled": 0}),
+        lambda: seeded.patch("/users/3", json={"age": 12}),
+        lambda: seeded.delete("/users/2"),
+        lambda: seeded.post("/policies", json={
+            "policy_id": "t_income", "description": "Some income", "field": "income", "operator": ">", "value": 0,
+        }),
+        lambda: seeded.put("/policies/b_adult", json={
+            "policy_id": "b_adult", "description": "Adult", "field": "age", "operator": ">=", "value": 21,
+        }),
+        lambda: seeded.delete("/policies/b_mfa"),
+    ]
+    for step in steps:
+        r = step()
+        assert r.status_code in (200, 201, 204), r.get_json()
+        _assert_consistent()
+
+
+OUT_OF_BAND = [
+    "UPDATE users SET mfa_enabled = 1 - mfa_enabled WHERE user_id = 5",
+    "DELETE FROM users WHERE user_id = 5",
+    "INSERT INTO users (username, password, login_count) VALUES ('raw_insert', 'Aa1xxxxxxxxx', 0)",
+    "UPDATE policies SET value = '30' WHERE policy_id = 'b_adult'",
+]
+
+
+def _write_raw(sql):
+    raw = sqlite3.connect(db.current_db_path())
+    raw.execute(sql)
+    raw.commit()
+    raw.close()
+
+
+def _live_checks():
+    """(user_id, policy_id, passed, note) for every user x policy, evaluated live."""
+    with db.DBManager() as d:
+        plan = compile_policies(load_policies(d.conn))
+        return sorted(
+            (u["user_id"], c["policy_id"], c["passed"], c["note"])
+            for u in Users.iter_all(d.conn) for c in evaluate_user(u, plan)["checks"]
+        )
+
+
+@pytest.mark.parametrize("sql", OUT_OF_BAND)
+def test_writes_outside_the_api_are_detected(seeded, sql):
+    _write_raw(sql)
+
+    report = _report(deep=False)
+    assert not report["consistent"] and report["marked_stale"] == 1, report
+    with db.DBManager() as d:
+        plan = compile_policies(load_policies(d.conn))
+        assert not materialize.is_fresh(d.conn, plan)
+        live = [evaluate_user(u, plan) for u in Users.iter_all(d.conn)]
+        assert list(materialize.iter_results(d.conn, plan)) == live
+
+        materialize.ensure_consistent(d.conn, plan)
+    _assert_consistent()
+
+
+@pytest.mark.parametrize("sql", OUT_OF_BAND)
+def test_check_rows_follow_writes_outside_the_api(seeded, sql):
+    _write_raw(sql)
+    live = _live_checks()
+
+    r = seeded.get("/evaluate/checks?limit=1000&sort=user_id")
+    assert r.status_code == 200
+    page = r.get_json()
+    assert page["total"] == len(live)
+    assert sorted((c["user_id"], c["policy_id"], c["passed"], c["note"]) for c in page["items"]) == live
+
+    csv_rows = seeded.get("/evaluate/export?columns=user_id,policy_id,passed,note").get_data(as_text=True).splitlines()[1:]
+    assert sorted(csv_rows) == sorted(f"{u},{p},{str(ok).lower()},{n}" for u, p, ok, n in live)
+    assert _report(deep=True)["consistent"]
+
+
+def test_clear_upload_empties_results_and_marks(seeded):
+    with db.DBManager() as d:
+        d.conn.execute("UPDATE users SET age = 40 WHERE user_id = 1")
+        d.conn.commit()
+        materialize.clear(d.conn)
+        assert materialize.stale_marks(d.conn) == 0
+        assert d.conn.execute("SELECT COUNT(*) FROM compliance_results").fetchone()[0] == 0
+
+
+def test_results_table_has_no_single_column_key(seeded):
+    with db.DBManager() as d:
+        for call in (
+            lambda: ComplianceResults.get(d.conn, 1),
+            lambda: ComplianceResults.update(d.conn, 1, passed=0),
+            lambda: ComplianceResults.delete(d.conn, 1),
+            lambda: ComplianceResults.query(d.conn),
+        ):
+            with pytest.raises(TypeError):
+                call()
+
+
+@pytest.mark.parametrize("sort,index", [
+    ("description", "ix_policies_description_policy_id"), ("field", "ix_policies_field_policy_id"),
+    ("operator", "ix_policies_operator_policy_id"), ("expected", "ix_policies_value_policy_id"),
+])
+def test_policy_column_sorts_walk_their_index(seeded, sort, index):
+    source, ties = materialize._checks_from(sort)
+    order = ", ".join([materialize.CHECK_COLUMNS[sort]] + ties)
+    with db.DBManager(readonly=True) as d:
+        columns = ", ".join(materialize.CHECK_COLUMNS.values())
+        plan = [r[3] for r in d.conn.execute(f"EXPLAIN QUERY PLAN SELECT {columns} {source} ORDER BY {order} LIMIT 10")]
+    assert f"SCAN p USING INDEX {index}" in plan, plan
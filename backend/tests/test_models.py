@@ -0,0 +1,52 @@
+# test_models.py
+# Model.insert_many / upsert_many: batching, returned keys, conflicts and rollback.
+import sqlite3
+import pytest
+from backend import db, versions
+from backend.models import Policies, Users
+from backend.tests import datagen
+
+
+def _user_rows(n, seed=0):
+    rows = []
+    for u in datagen.generate_users(n, seed):
+        rows.append({k: v for k, v in u.items() if v is not None})   # column sets vary from row to row
+    return rows
+
+
+def test_insert_many_returns_the_keys_of_every_row_in_order(app):
+    rows = _user_rows(20)
+    assert len({tuple(sorted(r)) for r in rows}) > 1
+    with db.DBManager() as d:
+        first = Users.insert_many(d.conn, rows[:5])
+        Users.delete(d.conn, first[-1])   # the next rowid reuses the freed maximum
+        ids = Users.insert_many(d.conn, rows[5:], batch_size=4)
+        assert len(ids) == 15 and ids == sorted(set(ids))
+        for uid, row in zip(ids, rows[5:]):
+            assert Users.get(d.conn, uid)["username"] == row["username"]
+
+
+def test_upsert_many_updates_given_columns_and_keeps_the_rest(app):
+    policies = [{**p, "value": str(p["value"])} for p in datagen.generate_policies()]
+    with db.DBManager() as d:
+        Policies.upsert_many(d.conn, policies, batch_size=3)
+        before = versions.current(Policies.table_name)
+        Policies.upsert_many(d.conn, [
+            {"policy_id": "b_adult", "value": "21"},
+            {"policy_id": "b_new", "description": "New", "field": "age", "operator": "<", "value": "99"},
+        ])
+        assert versions.current(Policies.table_name) > before
+        adult = Policies.get(d.conn, "b_adult")
+        assert (adult["value"], adult["description"], adult["operator"]) == ("21", "Adult", ">=")
+        assert Policies.get(d.conn, "b_new")["description"] == "New"
+        assert len(Policies.all(d.conn)) == len(policies) + 1
+
+
+def test_a_failing_batch_is_rolled_back_and_earlier_batches_kept(app):
+    rows = [{"policy_id": f"p{i}", "description": "", "field": "age", "operator": ">", "value": "1"} for i in range(6)]
+    rows[4]["policy_id"] = "p0"   # duplicate key in the second batch
+    with db.DBManager() as d:
+        with pytest.raises(sqlite3.IntegrityError):
+            Policies.insert_many(d.conn, rows, batch_size=3)
+        assert sorted(p["policy_id"] for p in Policies.all(d.conn)) == ["p0", "p1", "p2"]
+        assert not d.conn.in_transaction
@@ -0,0 +1,38 @@
+# test_parallel.py
+# Process-pool evaluation: chunking over a sparse user_id space, order, and plan changes.
+from backend import db, parallel
+from backend.evaluators import evaluate_user
+from backend.models import Users
+from backend.policy_plan import get_plan
+
+
+def _ids(conn):
+    return [r[0] for r in conn.execute("SELECT user_id FROM users ORDER BY user_id")]
+
+
+def test_chunks_cover_a_sparse_id_space_once(seeded):
+    for uid in (1, 2, 17, 18, 19, 50):
+        assert seeded.delete(f"/users/{uid}").status_code == 204
+    with db.DBManager() as d:
+        ids = _ids(d.conn)
+        bounds = parallel.chunk_bounds(d.conn, 6)
+    assert len(bounds) == -(-len(ids) // 6) and bounds[-1][1] is None
+    covered = [uid for lo, hi in bounds for uid in ids if uid >= lo and (hi is None or uid < hi)]
+    assert covered == ids
+    assert all(sum(lo <= uid < hi for uid in ids) == 6 for lo, hi in bounds[:-1])
+
+
+def test_pool_results_follow_user_order_and_policy_changes(app, seeded):
+    parallel.configure(workers=2, app=app)
+    assert seeded.delete("/users/7").status_code == 204
+    with db.DBManager() as d:
+        plan = get_plan(d.conn)
+        live = [evaluate_user(u, plan) for u in Users.iter_all(d.conn)]
+        assert list(parallel.iter_results(d.conn, db.current_db_path(), plan, threshold=0, chunk_size=5)) == live
+
+    policy = {"policy_id": "b_adult", "description": "Adult", "field": "age", "operator": ">=", "value": 60}
+    assert seeded.put("/policies/b_adult", json=policy).status_code == 200
+    with db.DBManager() as d:
+        changed = get_plan(d.conn)
+        live = [evaluate_user(u, changed) for u in Users.iter_all(d.conn)]
+        assert list(parallel.iter_results(d.conn, db.current_db_path(), changed, threshold=0, chunk_size=5)) == live
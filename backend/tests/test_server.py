@@ -0,0 +1,135 @@
+# test_server.py
+# The pre-fork server (backend.server.Master) in a child process on an ephemeral port.
+import json
+import os
+import re
+import signal
+import sqlite3
+import subprocess
+import sys
+import time
+import urllib.request
+import pytest
+from backend.tests import datagen
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork"), reason="the pre-fork server needs os.fork()")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_SERVE = """
+import sys
+from backend import server
+from backend.app import serving_app
+config = {"DB_PATH": sys.argv[1], "EVAL_JOB_DIR": sys.argv[2]}
+factory = lambda: serving_app(config)
+server.Master(factory(), factory, port=0, workers=int(sys.argv[3]), max_requests=int(sys.argv[4]),
+              graceful_timeout=5).run()
+"""
+
+
+@pytest.fixture
+def serve(tmp_path):
+    procs = []
+
+    def start(workers=2, max_requests=0):
+        p = subprocess.Popen(
+            [sys.executable, "-c", _SERVE, str(tmp_path / "test.db"), str(tmp_path / "jobs"),
+             str(workers), str(max_requests)],
+            cwd=ROOT, stderr=subprocess.PIPE, text=True,
+        )
+        procs.append(p)
+        port = re.search(r":(\d+) with", p.stderr.readline()).group(1)
+        return p, f"http://127.0.0.1:{port}"
+
+    yield start
+    for p in procs:
+        if p.poll() is None:
+            p.send_signal(signal.SIGTERM)
+            p.wait(timeout=30)
+
+
+def _get(url):
+    with urllib.request.urlopen(url, timeout=10) as r:
+        return r.status, r.read().decode("utf-8")
+
+
+def _ping_count(base):
+    _, text = _get(base + "/metrics")
+    return sum(
+        float(line.split()[-1]) for line in text.splitlines()
+        if line.startswith("pcc_http_request_duration_seconds_count") and 'route="/ping"' in line
+    )
+
+
+def test_metrics_are_summed_over_workers_and_survive_recycling(serve):
+    _, base = serve(workers=3, max_requests=4)
+    seen = []
+    for _ in range(8):
+        for _ in range(3):
+            assert _get(base + "/ping")[0] == 200
+        seen.append(_ping_count(base))
+    assert seen == sorted(seen), seen   # never drops, though workers are replaced every few requests
+    time.sleep(2 * 1.0 + 0.5)   # idle workers snapshot within metrics.FLUSH_INTERVAL
+    assert _ping_count(base) == 24
+
+
+def _post(url, payload):
+    req = urllib.request.Request(url, data=json.dumps(payload).encode("utf-8"),
+                                 headers={"Content-Type": "application/json"}, method="POST")
+    with urllib.request.urlopen(req, timeout=10) as r:
+        return r.status
+
+
+def _children(pid):
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return {int(p) for p in f.read().split()}
+
+
+def _eventually(check, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if check():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def _usernames(base):
+    return {u["username"] for u in json.loads(_get(base + "/users")[1])}
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/task"), reason="lists worker processes through /proc")
+def test_sighup_reloads_the_workers_and_sees_writes_made_outside(serve, tmp_path):
+    p, base = serve(workers=2)
+    assert _post(base + "/users", list(datagen.generate_users(3))) == 201
+    before = _usernames(base)
+    assert _eventually(lambda: len(_children(p.pid)) == 2)
+    old = _children(p.pid)
+
+    raw = sqlite3.connect(tmp_path / "test.db")
+    raw.execute("INSERT INTO users (username, password) VALUES ('outside', 'Aa1outside')")
+    raw.commit()
+    raw.close()
+
+    p.send_signal(signal.SIGHUP)
+    assert _eventually(lambda: not _children(p.pid) & old and len(_children(p.pid)) == 2)
+    assert _usernames(base) == before | {"outside"}
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/task"), reason="lists worker processes through /proc")
+def test_crashed_and_recycled_workers_are_replaced(serve):
+    p, base = serve(workers=2, max_requests=5)
+    assert _eventually(lambda: len(_children(p.pid)) == 2)
+    first = _children(p.pid)
+    os.kill(min(first), signal.SIGKILL)
+    for _ in range(20):   # recycles the survivors as well
+        assert _get(base + "/ping")[0] == 200
+    assert _eventually(lambda: len(_children(p.pid)) == 2 and not _children(p.pid) & first)
+
+
+def test_sigterm_stops_the_workers_and_exits(serve):
+    p, base = serve(workers=2)
+    assert _get(base + "/ping")[0] == 200
+    p.send_signal(signal.SIGTERM)
+    assert p.wait(timeout=30) == 0
+    assert "shutting down" in p.stderr.read()
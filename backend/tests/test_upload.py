@@ -0,0 +1,117 @@
+# test_upload.py
+# /upload/users and /upload/policies: batching, clear and reject semantics.
+import io
+import json
+from backend.tests import datagen
+
+
+def _upload(client, kind, text, name, **form):
+    data = {"file": (io.BytesIO(text.encode("utf-8")), name), **form}
+    return client.post(f"/upload/{kind}", data=data)
+
+
+def _users_json(n, seed=1, prefix="up_"):
+    return json.dumps([{**u, "username": prefix + u["username"]} for u in datagen.generate_users(n, seed)])
+
+
+def _usernames(client):
+    return {u["username"] for u in client.get("/users").get_json()}
+
+
+def test_clear_with_a_file_malformed_past_the_first_batch_keeps_the_table(seeded):
+    before = _usernames(seeded)
+    text = _users_json(1500)[:-1] + ', {"username": "broken"'   # valid first batch, then a cut-off element
+    r = _upload(seeded, "users", text, "users.json", clear="1")
+    assert r.status_code == 400 and "error" in r.get_json()
+    assert r.get_json()["cleared"] is False
+    assert _usernames(seeded) == before
+
+
+def _policies_csv(rows):
+    lines = ["policy_id,description,field,operator,value"]
+    lines += [",".join(f'"{v}"' for v in row) for row in rows]
+    return "\n".join(lines) + "\n"
+
+
+def test_bad_rows_are_rejected_with_every_problem_and_the_rest_stored(seeded):
+    users = json.loads(_users_json(5))
+    users[1].update(password="short", email="nope")
+    users[3]["age"] = 200
+    r = _upload(seeded, "users", json.dumps(users), "users.json")
+    assert r.status_code == 201
+    body = r.get_json()
+    assert (body["stored"], body["rejected"], body["cleared"]) == (3, 2, False)
+    assert [(e["row"], e["field"]) for e in body["errors"]] == [(2, "password"), (2, "email"), (4, "age")]
+    assert body["errors_by_field"] == {"password": 1, "email": 1, "age": 1}
+    assert _usernames(seeded) >= {users[i]["username"] for i in (0, 2, 4)}
+    assert not _usernames(seeded) & {users[i]["username"] for i in (1, 3)}
+
+
+def test_csv_upload_matches_the_json_upload(client, tmp_path):
+    path = datagen.write_users_csv(tmp_path / "users.csv", 30, seed=3)
+    with open(path, encoding="utf-8") as f:
+        r = _upload(client, "users", f.read(), "users.csv")
+    assert r.status_code == 201 and r.get_json()["stored"] == 30
+    users = client.get("/users").get_json()
+    expected = list(datagen.generate_users(30, seed=3, missing_rate=0))
+    assert [(u["username"], u["age"], u["income"], u["mfa_enabled"]) for u in users] == [
+        (u["username"], u["age"], u["income"], u["mfa_enabled"]) for u in expected
+    ]
+
+
+def test_clear_replaces_the_table_and_the_stored_results(seeded):
+    r = _upload(seeded, "users", _users_json(20, seed=2, prefix="new_"), "users.json", clear="1")
+    assert r.status_code == 201 and r.get_json()["cleared"] is True
+    assert _usernames(seeded) == {"new_" + u["username"] for u in datagen.generate_users(20, 2)}
+    assert seeded.get("/evaluate?engine=stored").get_json() == seeded.get("/evaluate?engine=python").get_json()
+
+
+def test_clear_is_not_applied_when_every_row_is_rejected(seeded):
+    before = _usernames(seeded)
+    users = [{**u, "password": "short"} for u in json.loads(_users_json(3))]
+    r = _upload(seeded, "users", json.dumps(users), "users.json", clear="1")
+    assert r.status_code == 400 and r.get_json()["cleared"] is False
+    assert r.get_json()["rejected"] == 3
+    assert _usernames(seeded) == before
+
+
+def test_dry_run_validates_everything_and_writes_nothing(seeded):
+    before = _usernames(seeded)
+    users = json.loads(_users_json(4))
+    users[2]["role"] = "pirate"
+    r = _upload(seeded, "users", json.dumps(users), "users.json", dry_run="1", clear="1")
+    assert r.status_code == 200
+    assert r.get_json() == {
+        "dry_run": True, "valid": 3, "rejected": 1,
+        "errors": [{"row": 3, "field": "role", "error": r.get_json()["errors"][0]["error"]}],
+        "errors_by_field": {"role": 1},
+    }
+    assert _usernames(seeded) == before
+    assert _upload(seeded, "users", '[{"username": ', "users.json", dry_run="1").status_code == 400
+
+
+def test_malformed_file_without_clear_keeps_the_batches_before_the_error(seeded):
+    text = _users_json(1500)[:-1] + ', {"username": "broken"'
+    r = _upload(seeded, "users", text, "users.json")
+    assert r.status_code == 400 and "error" in r.get_json()
+    assert r.get_json()["stored"] == 1500   # every batch before the cut-off element was written
+    assert len(_usernames(seeded)) == 50 + r.get_json()["stored"]
+
+
+def test_policies_csv_upload_coerces_values(client):
+    text = _policies_csv([
+        ("p_age", "Adult", "age", ">=", "18"),
+        ("p_roles", "Staff", "role", "in", "admin, devops"),
+        ("p_mail", "Corp mail", "email", "includes", "@corp.io"),
+        ("p_mfa", "MFA", "mfa_enabled", "==", "true"),
+    ])
+    r = _upload(client, "policies", text, "policies.csv")
+    assert r.status_code == 201 and r.get_json()["stored"] == 4
+    values = {p["id"]: p["value"] for p in client.get("/policies").get_json()}
+    assert values == {"p_age": 18, "p_roles": ["admin", "devops"], "p_mail": "@corp.io", "p_mfa": True}
+
+
+def test_upload_request_errors(client):
+    assert client.post("/upload/users", data={}).status_code == 400
+    assert _upload(client, "users", "x", "users.xml").status_code == 400
+    assert _upload(client, "policies", "[]", "policies.txt").status_code == 400
@@ -0,0 +1,34 @@
+# test_validators.py
+# Batch validation: every bad row and field is reported in one pass.
+import pytest
+from backend import validators
+from backend.tests import datagen
+
+
+def _users():
+    users = list(datagen.generate_users(5))
+    users[1] = {**users[1], "password": "short", "email": "nope"}
+    users[3] = {**users[3], "age": -1}
+    return users
+
+
+def test_batch_mode_reports_every_problem():
+    users = _users()
+    valid, errors = validators.validate_users(users, batch=True)
+    assert len(valid) == 3
+    assert [(e["row"], e["field"]) for e in errors] == [(2, "password"), (2, "email"), (4, "age")]
+    assert validators.validate_users(users[0], batch=True) == ([validators.validate_user(users[0])], [])
+
+    with pytest.raises(validators.ValidationError):   # without batch the first bad row stops it
+        validators.validate_users(users)
+
+    policies = datagen.generate_policies()[:2] + [{"policy_id": "x", "description": "", "field": "age", "operator": "~", "value": 1}]
+    valid, errors = validators.validate_policies(policies, batch=True)
+    assert len(valid) == 2 and [e["row"] for e in errors] == [3]
+
+
+def test_post_users_rejects_the_body_with_every_error(client):
+    r = client.post("/users", json=_users())
+    assert r.status_code == 400
+    assert [(e["row"], e["field"]) for e in r.get_json()["errors"]] == [(2, "password"), (2, "email"), (4, "age")]
+    assert client.get("/users").get_json() == []   # nothing stored
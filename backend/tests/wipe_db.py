@@ -1,11 +1,14 @@
 # wipe_db.py
-from backend.db import DBManager
+from backend.db import DBManager, init_db
 
 with DBManager() as db:
     cur = db.conn.cursor()
     cur.execute("DROP TABLE IF EXISTS users")
     cur.execute("DROP TABLE IF EXISTS policies")
+    cur.execute("DROP TABLE IF EXISTS compliance_results")
+    cur.execute("DROP TABLE IF EXISTS compliance_results_stale_users")
+    cur.execute("DROP TABLE IF EXISTS compliance_results_stale_policies")
+    cur.execute("DROP TABLE IF EXISTS policy_stats")
     db.conn.commit()
-with DBManager() as db:
-    pass
-print("Dropped tables: users, policies")
+init_db()
+print("Dropped tables: users, policies, compliance_results (and its stale marks), policy_stats")
@@ -1,4 +1,6 @@
 import re
+from concurrent.futures.process import BrokenProcessPool
+from backend import parallel as process_pool
 from backend.evaluators import OPS
 from backend.models import Policies
 from backend.models.Users import ALLOWED_ROLES
@@ -7,37 +9,63 @@ ALLOWED_OPERATORS = set(OPS.keys())
 REQUIRED_POLICY_KEYS = Policies.db_columns.keys()
 _EMAIL_RE = re.compile(r"^[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}$")
 
+BATCH_CHUNK = 5000              # rows per task when a batch is validated in parallel
+BATCH_PARALLEL_THRESHOLD = 20000  # smaller batches are validated in-process
 
-def validate_policy(policy):
-    """Validate a single policy object."""
+
+class ValidationError(ValueError):
+    """Every problem found in one object, as (field, message) pairs."""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__("; ".join(m for _, m in errors))
+
+
+def check_policy(policy):
+    """Validate a single policy; returns (policy, errors) with every problem found."""
     if not isinstance(policy, dict):
-        raise ValueError("policy must be a JSON object")
+        return None, [(None, "policy must be a JSON object")]
+    errors = []
     keys = set(policy.keys())
     missing = REQUIRED_POLICY_KEYS - keys
     if missing:
-        raise ValueError(f"missing required keys: {sorted(missing)}")
+        errors.append((None, f"missing required keys: {sorted(missing)}"))
     extra = keys - REQUIRED_POLICY_KEYS
     if extra:
-        raise ValueError(f"unexpected keys: {sorted(extra)}")
+        errors.append((None, f"unexpected keys: {sorted(extra)}"))
     op = policy.get("operator")
-    if op not in ALLOWED_OPERATORS:
-        raise ValueError(f"invalid operator '{op}'. allowed: {sorted(ALLOWED_OPERATORS)}")
     v = policy.get("value")
-    if op == "in" and not isinstance(v, (list, tuple, set)):
-        raise ValueError("operator 'in' requires 'value' to be a list")
-    if op == "includes" and not isinstance(v, str):
-        raise ValueError("operator 'includes' requires 'value' to be a string")
-    return dict(policy)
+    if op not in ALLOWED_OPERATORS:
+        errors.append(("operator", f"invalid operator '{op}'. allowed: {sorted(ALLOWED_OPERATORS)}"))
+    elif op == "in" and not isinstance(v, (list, tuple, set)):
+        errors.append(("value", "operator 'in' requires 'value' to be a list"))
+    elif op == "includes" and not isinstance(v, str):
+        errors.append(("value", "operator 'includes' requires 'value' to be a string"))
+    return (None if errors else dict(policy)), errors
 
 
-def validate_policies(policies):
-    """Validate a list or single policy."""
+def validate_policy(policy):
+    """Validate a single policy object."""
+    out, errors = check_policy(policy)
+    if errors:
+        raise ValidationError(errors)
+    return out
+
+
+def validate_policies(policies, batch=False, parallel=False):
+    """Validate a list or single policy.
+
+    With `batch` every row is checked and (valid, errors) is returned as by
+    validate_batch; otherwise the first bad policy raises ValidationError.
+    """
     if policies is None:
         raise ValueError("missing JSON body")
     if isinstance(policies, dict):
         policies = [policies]
     if not isinstance(policies, list):
         raise ValueError("policies must be a list of objects")
+    if batch:
+        return validate_batch("policies", policies, parallel)
     return [validate_policy(p) for p in policies]
 
 
@@ -88,11 +116,19 @@ def validate_password(v):
     pwd = v
     if len(pwd) < 8:
         raise ValueError("password must be at least 8 characters")
-    if not any(c.islower() for c in pwd):
+    lower = upper = digit = False
+    for c in pwd:  # one pass for all three character classes
+        if c.islower():
+            lower = True
+        elif c.isupper():
+            upper = True
+        elif c.isdigit():
+            digit = True
+    if not lower:
         raise ValueError("password must contain a lowercase letter")
-    if not any(c.isupper() for c in pwd):
+    if not upper:
         raise ValueError("password must contain an uppercase letter")
-    if not any(c.isdigit() for c in pwd):
+    if not digit:
         raise ValueError("password must contain a digit")
     return pwd
 
@@ -166,31 +202,95 @@ def validate_income(v):
     return fv
 
 
+USER_FIELDS = (   # field -> validator, in the order errors are reported
+    ("username", validate_username),
+    ("password", validate_password),
+    ("name", validate_name),
+    ("lastname", validate_lastname),
+    ("email", validate_email),
+    ("role", validate_role),
+    ("mfa_enabled", validate_mfa_enabled),
+    ("login_count", validate_login_count),
+    ("age_days", validate_age_days),
+    ("age", validate_age),
+    ("income", validate_income),
+)
+
+
+def check_user(u):
+    """Validate a single user; returns (user, errors) with every problem found."""
+    if not isinstance(u, dict):
+        return None, [(None, "user must be a JSON object")]
+    out, errors = {}, []
+    get = u.get
+    for field, fn in USER_FIELDS:
+        try:
+            out[field] = fn(get(field))
+        except ValueError as e:
+            errors.append((field, str(e)))
+    return (None if errors else out), errors
+
+
 def validate_user(u):
     """Validate a single user object."""
-    if not isinstance(u, dict):
-        raise ValueError("user must be a JSON object")
-    out = {}
-    out["username"] = validate_username(u.get("username"))
-    out["password"] = validate_password(u.get("password"))
-    out["name"] = validate_name(u.get("name"))
-    out["lastname"] = validate_lastname(u.get("lastname"))
-    out["email"] = validate_email(u.get("email"))
-    out["role"] = validate_role(u.get("role"))
-    out["mfa_enabled"] = validate_mfa_enabled(u.get("mfa_enabled"))
-    out["login_count"] = validate_login_count(u.get("login_count"))
-    out["age_days"] = validate_age_days(u.get("age_days"))
-    out["age"] = validate_age(u.get("age"))
-    out["income"] = validate_income(u.get("income"))
+    out, errors = check_user(u)
+    if errors:
+        raise ValidationError(errors)
     return out
 
 
-def validate_users(users):
-    """Validate a list or single user."""
+def validate_users(users, batch=False, parallel=False):
+    """Validate a list or single user.
+
+    With `batch` every row is checked and (valid, errors) is returned as by
+    validate_batch; otherwise the first bad user raises ValidationError.
+    """
     if users is None:
         raise ValueError("missing JSON body")
     if isinstance(users, dict):
         users = [users]
     if not isinstance(users, list):
         raise ValueError("users must be a list of objects")
+    if batch:
+        return validate_batch("users", users, parallel)
     return [validate_user(u) for u in users]
+
+
+_CHECKS = {"users": check_user, "policies": check_policy}
+
+
+def _check_chunk(kind, start, items):
+    check = _CHECKS[kind]
+    valid, errors = [], []
+    for row, item in enumerate(items, start=start):
+        out, errs = check(item)
+        if errs:
+            errors.extend({"row": row, "field": f, "error": m} for f, m in errs)
+        else:
+            valid.append(out)
+    return valid, errors
+
+
+def validate_batch(kind, items, parallel=False):
+    """Validate a whole list of "users" or "policies" without stopping at the first bad row.
+
+    Returns (valid, errors): the validated objects of the good rows, and one
+    {row, field, error} entry per problem (rows are 1-based). With `parallel`,
+    batches of at least BATCH_PARALLEL_THRESHOLD rows are split into
+    BATCH_CHUNK-row tasks on the evaluation process pool.
+    """
+    if not (parallel and len(items) >= BATCH_PARALLEL_THRESHOLD):
+        return _check_chunk(kind, 1, items)
+    starts = range(0, len(items), BATCH_CHUNK)
+    valid, errors = [], []
+    try:
+        for v, e in process_pool.get_executor().map(
+            _check_chunk, [kind] * len(starts), [s + 1 for s in starts],
+            [items[s:s + BATCH_CHUNK] for s in starts],
+        ):
+            valid.extend(v)
+            errors.extend(e)
+    except BrokenProcessPool:
+        process_pool.shutdown()
+        raise
+    return valid, errors
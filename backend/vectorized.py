@@ -0,0 +1,177 @@
+try:
+    import numpy as np
+except ImportError:  # optional dependency; callers fall back to evaluate_user
+    np = None
+
+import operator as _op
+from backend import metrics
+from backend.evaluators import check_outcome
+from backend.models import Users
+
+NUMERIC_FIELDS = tuple(
+    k for k, ctype in Users.db_columns.items()
+    if k != Users.pk_name and ctype.split()[0] in ("INTEGER", "REAL")
+)
+_MAX_EXACT = 2 ** 53
+CHUNK_SIZE = 50000   # users per matrix when results are iterated
+
+_NP_OPS = {
+    "==": _op.eq,
+    "!=": _op.ne,
+    ">=": _op.ge,
+    "<=": _op.le,
+    ">":  _op.gt,
+    "<":  _op.lt,
+}
+
+
+def available():
+    return np is not None
+
+
+def _exact_number(v):
+    """A policy value float64 holds exactly, so NumPy compares it as Python would."""
+    return isinstance(v, float) or (isinstance(v, int) and abs(v) < _MAX_EXACT)
+
+
+def _vectorizable_fields(conn, fields, where="", params=()):
+    """Numeric columns whose stored values (in the `where` rows) are all exact in float64."""
+    out = set()
+    for f in fields:
+        if f not in NUMERIC_FIELDS:
+            continue
+        bad, biggest = conn.execute(
+            f"SELECT SUM(typeof({f}) NOT IN ('integer', 'real', 'null')), MAX(ABS({f})) FROM {Users.table_name}{where}",
+            params,
+        ).fetchone()
+        if not bad and (biggest is None or biggest < _MAX_EXACT):
+            out.add(f)
+    return out
+
+
+def _column_check(op, expected, values, nulls):
+    fn = _NP_OPS.get(op)
+    if fn is not None and _exact_number(expected):
+        return fn(values, expected) & ~nulls
+    if op == "in" and isinstance(expected, (list, tuple)) and all(_exact_number(x) for x in expected):
+        return np.isin(values, np.asarray(expected, dtype=float)) & ~nulls
+    return None
+
+
+def _fallback_column(fn, operand, template, actuals, passed_col, notes, j):
+    for i, actual in enumerate(actuals):
+        if actual is None:
+            continue
+        passed, note = check_outcome(fn, operand, template, actual)
+        passed_col[i] = passed
+        if note:
+            notes[(i, j)] = note
+
+
+class ResultMatrix:
+    """Users x policies evaluation result held column-wise."""
+
+    def __init__(self, plan, user_ids, usernames, columns, passed, notes):
+        self.plan = plan
+        self.user_ids = user_ids
+        self.usernames = usernames
+        self.columns = columns
+        self.passed = passed
+        self.notes = notes
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    def overall(self):
+        return self.passed.all(axis=1)
+
+    def results(self):
+        """Yield per-user dicts identical to evaluators.evaluate_user output."""
+        checks_meta = self.plan.checks
+        actual_cols = [self.columns.get(t["field"]) for _, _, _, t in checks_meta]
+        notes = self.notes
+        for i, (username, row, ok) in enumerate(zip(self.usernames, self.passed.tolist(), self.overall().tolist())):
+            checks = []
+            for j, (_, _, _, template) in enumerate(checks_meta):
+                col = actual_cols[j]
+                actual = None if col is None else col[i]
+                check = template.copy()
+                check["actual"] = actual
+                check["passed"] = row[j]
+                check["note"] = "missing field" if actual is None else notes.get((i, j), "")
+                checks.append(check)
+            yield {
+                "username": username,
+                "overall_compliant": ok,
+                "checks": checks,
+            }
+
+
+def evaluate_matrix(conn, plan, after=None, limit=None):
+    """Evaluate users against `plan` column-at-a-time with NumPy.
+
+    All users by default; `after`/`limit` select the next `limit` users with
+    user_id > after, in user_id order.
+    """
+    if np is None:
+        raise RuntimeError("numpy is required for the vectorized engine")
+    fields = [f for f in plan.fields if f in Users.db_columns]
+    select = ["user_id", "username"] + [f for f in fields if f not in ("user_id", "username")]
+    sql = f"SELECT {', '.join(select)} FROM {Users.table_name}"
+    params = []
+    if after is not None:
+        sql += " WHERE user_id > ?"
+        params.append(after)
+    sql += " ORDER BY user_id"
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit)
+    rows = conn.execute(sql, params).fetchall()
+    n = len(rows)
+    metrics.rows_read(Users.table_name, n)
+    transposed = list(zip(*rows)) if rows else [()] * len(select)
+    columns = dict(zip(select, transposed))
+
+    if after is None and limit is None:
+        fast = _vectorizable_fields(conn, fields)
+    elif rows:
+        fast = _vectorizable_fields(conn, fields, " WHERE user_id BETWEEN ? AND ?", (rows[0][0], rows[-1][0]))
+    else:
+        fast = set()
+    arrays = {}
+    for f in fast:
+        values = np.array([np.nan if v is None else v for v in columns[f]], dtype=float)
+        arrays[f] = (values, np.isnan(values))
+
+    passed = np.zeros((n, len(plan)), dtype=bool)
+    notes = {}
+    for j, (_, fn, operand, template) in enumerate(plan.checks):
+        field = template["field"]
+        if field not in columns:
+            continue
+        col = None
+        if field in arrays:
+            values, nulls = arrays[field]
+            col = _column_check(template["operator"], template["expected"], values, nulls)
+        if col is None:
+            col = passed[:, j]
+            _fallback_column(fn, operand, template, columns[field], col, notes, j)
+        else:
+            passed[:, j] = col
+    return ResultMatrix(plan, list(columns["user_id"]), list(columns["username"]), columns, passed, notes)
+
+
+def iter_results(conn, plan, chunk_size=CHUNK_SIZE):
+    """Per-user results in user_id order, evaluating `chunk_size` users at a time so memory stays bounded."""
+    after = None
+    while True:
+        matrix = evaluate_matrix(conn, plan, after=after, limit=chunk_size)
+        yield from matrix.results()
+        if len(matrix) < chunk_size:
+            return
+        after = matrix.user_ids[-1]
+
+
+def evaluate_all(conn, plan):
+    """Vectorized equivalent of `[evaluate_user(u, plan) for u in Users.all(conn)]`."""
+    return list(evaluate_matrix(conn, plan).results())
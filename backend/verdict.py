@@ -0,0 +1,117 @@
+import json
+from backend import materialize, metrics, versions
+from backend.evaluators import evaluate_verdict
+from backend.models import ComplianceResults, PolicyStats, Users
+
+COST_SAMPLE = 32          # time the checks of one user in every COST_SAMPLE
+DEFAULT_COST_NS = 250.0   # assumed cost of a check that has never been timed
+
+_STATS_COLS = PolicyStats.columns()
+_UPSERT = (
+    f"INSERT INTO {PolicyStats.table_name} ({', '.join(_STATS_COLS)}) VALUES ({', '.join('?' for _ in _STATS_COLS)}) "
+    f"ON CONFLICT(policy_id) DO UPDATE SET "
+    + ", ".join(
+        f"{c} = CASE WHEN signature = excluded.signature THEN {c} + excluded.{c} ELSE excluded.{c} END"
+        for c in ("evaluated", "failed", "cost_ns", "cost_samples")
+    )
+    + ", signature = excluded.signature"
+)
+
+
+def signature(template):
+    """Identity of a policy's check; stats gathered for another field/operator/value are ignored."""
+    return json.dumps([template["field"], template["operator"], template["expected"]], sort_keys=True, default=str)
+
+
+class VerdictStats:
+    """Per-check counters for one run, merged into policy_stats by save_stats."""
+
+    def __init__(self, n):
+        self.users = 0
+        self.evaluated = [0] * n
+        self.failed = [0] * n
+        self.cost_ns = [0] * n
+        self.cost_samples = [0] * n
+
+    def sample(self):
+        """Called once per user; True when this user's checks should be timed."""
+        self.users += 1
+        return self.users % COST_SAMPLE == 1
+
+    def record(self, j, passed, elapsed_ns):
+        self.evaluated[j] += 1
+        if not passed:
+            self.failed[j] += 1
+        if elapsed_ns is not None:
+            self.cost_ns[j] += elapsed_ns
+            self.cost_samples[j] += 1
+
+
+def load_order(conn, plan):
+    """Check indexes ordered by expected cost per failure found (cheap, likely failures first)."""
+    stored = {r["policy_id"]: r for r in PolicyStats.all(conn)}
+    scores = []
+    for j, (_, _, _, t) in enumerate(plan.checks):
+        r = stored.get(t["policy_id"])
+        if r is None or r["signature"] != signature(t):
+            r = {"evaluated": 0, "failed": 0, "cost_ns": 0.0, "cost_samples": 0}
+        fail_rate = (r["failed"] + 1) / (r["evaluated"] + 2)   # Laplace prior: unseen checks score 0.5
+        cost = r["cost_ns"] / r["cost_samples"] if r["cost_samples"] else DEFAULT_COST_NS
+        scores.append(cost / fail_rate)
+    return sorted(range(len(plan)), key=lambda j: (scores[j], j))
+
+
+def save_stats(conn, plan, stats):
+    """Add one run's counters to policy_stats (rows for a changed policy start over)."""
+    rows = [
+        (t["policy_id"], signature(t), stats.evaluated[j], stats.failed[j], stats.cost_ns[j], stats.cost_samples[j])
+        for j, (_, _, _, t) in enumerate(plan.checks)
+        if stats.evaluated[j]
+    ]
+    if not rows:
+        return
+    try:
+        conn.executemany(_UPSERT, rows)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    metrics.rows_written(PolicyStats.table_name, len(rows))
+    versions.bump(PolicyStats.table_name)
+
+
+def _iter_stored(conn, plan, order):
+    """Verdicts from the failing rows of compliance_results; the first failure in `order` is reported."""
+    rank = {plan.checks[j][3]["policy_id"]: r for r, j in enumerate(order)}
+    failures = conn.execute(
+        f"SELECT user_id, policy_id FROM {ComplianceResults.table_name} WHERE passed = 0 ORDER BY user_id"
+    )
+    pending = next(failures, None)
+    for uid, username in conn.execute(f"SELECT user_id, username FROM {Users.table_name} ORDER BY user_id"):
+        first = None
+        while pending is not None and pending[0] <= uid:
+            if pending[0] == uid:
+                r = rank.get(pending[1])
+                if r is not None and (first is None or r < rank[first]):
+                    first = pending[1]
+            pending = next(failures, None)
+        yield {"username": username, "overall_compliant": first is None, "failed_policy": first}
+
+
+def iter_verdicts(conn, plan, engine="python", stats=None):
+    """Yield {username, overall_compliant, failed_policy} per user in user_id order.
+
+    engine="stored" reads compliance_results when materialize.is_fresh;
+    otherwise (and for engine="python") each user is evaluated with early
+    exit in the adaptive order, recording outcomes into `stats`.
+    """
+    order = load_order(conn, plan)
+    if engine != "stored" or not materialize.is_fresh(conn, plan):
+        for u in Users.iter_all(conn):  # rows counted by the model
+            yield evaluate_verdict(u, plan, order, stats)
+        return
+    n = 0
+    for v in _iter_stored(conn, plan, order):
+        n += 1
+        yield v
+    metrics.rows_read(Users.table_name, n)
@@ -0,0 +1,45 @@
+import multiprocessing
+import threading
+
+_lock = threading.Lock()
+_versions = {}
+_slots = {}        # table -> index into _shared, for tables passed to share()
+_shared = None
+
+
+def share(names):
+    """Keep the versions of `names` in shared memory from now on.
+
+    Call in the parent before forking worker processes: a bump in any worker is
+    then seen by all of them (and by workers forked later). Current values carry over.
+    """
+    global _lock, _shared
+    if _shared is not None:
+        return
+    ctx = multiprocessing.get_context("fork")
+    names = list(names)
+    shared = ctx.RawArray("Q", len(names))
+    for i, name in enumerate(names):
+        shared[i] = _versions.get(name, 0)
+    _shared = shared
+    _lock = ctx.Lock()
+    _slots.update((name, i) for i, name in enumerate(names))
+
+
+def current(name):
+    """Return the data version for a table."""
+    i = _slots.get(name)
+    if i is not None:
+        return _shared[i]
+    return _versions.get(name, 0)
+
+
+def bump(name):
+    """Advance the data version for a table after a committed write."""
+    with _lock:
+        i = _slots.get(name)
+        if i is not None:
+            _shared[i] += 1
+            return _shared[i]
+        _versions[name] = _versions.get(name, 0) + 1
+        return _versions[name]
@@ -2,6 +2,18 @@
 const API_BASE = '/api';
 export { API_BASE };
 
+// Query string from an object; empty values are skipped and arrays are comma-joined.
+export function qs(params = {}) {
+  const sp = new URLSearchParams();
+  for (const [k, v] of Object.entries(params)) {
+    if (v === null || v === undefined || v === '') continue;
+    if (Array.isArray(v)) { if (v.length) sp.set(k, v.join(',')); }
+    else sp.set(k, String(v));
+  }
+  const s = sp.toString();
+  return s ? `?${s}` : '';
+}
+
 export async function http(method, path, body) {
   const isForm = typeof FormData !== 'undefined' && body instanceof FormData;
 
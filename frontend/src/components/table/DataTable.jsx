@@ -12,8 +12,18 @@ export default function DataTable({
   getRowId,
   pageSize = 10,
   height = 520,
+  server = null,   // { rowCount, paginationModel, onPaginationModelChange, sortModel, onSortModelChange, loading }
 }) {
   const cols = columns.length ? columns : inferColumns(rows, columnOptions);
+  const serverProps = server ? {
+    paginationMode: 'server',
+    sortingMode: 'server',
+    filterMode: 'server',
+    disableColumnFilter: true,
+    ...server,
+  } : {
+    initialState: { pagination: { paginationModel: { pageSize } } },
+  };
 
   return (
     <div style={{ height }}>
@@ -22,8 +32,8 @@ export default function DataTable({
         columns={cols}
         getRowId={getRowId || fallbackGetRowId}
         disableRowSelectionOnClick
-        pageSizeOptions={[pageSize, 25, 50]}
-        initialState={{ pagination: { paginationModel: { pageSize } } }}
+        pageSizeOptions={server ? [25, 50, 100] : [pageSize, 25, 50]}
+        {...serverProps}
       />
     </div>
   );
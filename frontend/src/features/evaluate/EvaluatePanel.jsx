@@ -1,68 +1,24 @@
 import * as React from 'react';
-import { Button, Stack, Autocomplete, TextField, Checkbox } from '@mui/material';
+import { Button, Stack, Autocomplete, TextField, Checkbox, MenuItem } from '@mui/material';
 import Section from '../../components/layout/Section';
 import Heading from '../../components/layout/Heading';
 import ToolbarX from '../../components/layout/Toolbar';
 import DataTable from '../../components/table/DataTable';
 import { useEvaluate } from './evaluate.store';
+import { policiesApi } from '../policies/policies.api';
 
-function exportCSV(rows, filename = 'evaluate.csv') {
-  if (!rows?.length) return;
-  const cols = Array.from(
-    rows.reduce((s, r) => { Object.keys(r).forEach(k => s.add(k)); return s; }, new Set())
-  );
-  const esc = (v) => {
-    if (v === null || v === undefined) return '';
-    const s = typeof v === 'object' ? JSON.stringify(v) : String(v);
-    return /[",\n]/.test(s) ? `"${s.replace(/"/g,'""')}"` : s;
-    };
-  const lines = [
-    cols.join(','),
-    ...rows.map(r => cols.map(c => esc(r[c])).join(',')),
-  ];
-  const blob = new Blob([lines.join('\n')], { type:'text/csv;charset=utf-8;' });
-  const a = document.createElement('a');
-  a.href = URL.createObjectURL(blob);
-  a.download = filename;
-  a.click();
-  URL.revokeObjectURL(a.href);
-}
+const COLUMN_ORDER = ['username', 'policy_id', 'description', 'field', 'operator', 'expected', 'actual', 'passed', 'note'];
 
 export default function EvaluatePanel() {
-  const { rows, refresh } = useEvaluate();
-
-  const flatRows = React.useMemo(() => {
-    if (!Array.isArray(rows)) return [];
-    const out = [];
-    for (const r of rows) {
-      const username = r?.username ?? '<unknown>';
-      for (const c of (r?.checks ?? [])) {
-        out.push({ username, ...c });
-      }
-    }
-    return out;
-  }, [rows]);
-
-  const policyOptions = React.useMemo(
-    () => Array.from(new Set(flatRows.map(x => x.policy_id ?? x.id))).filter(Boolean).sort(),
-    [flatRows]
-  );
-  const userOptions = React.useMemo(
-    () => Array.from(new Set(flatRows.map(x => x.username))).filter(Boolean).sort(),
-    [flatRows]
-  );
-
-  const [selPolicies, setSelPolicies] = React.useState([]);
-  const [selUsers, setSelUsers] = React.useState([]);
+  const { rows, total, loading, query, refresh, setQuery, exportUrl } = useEvaluate();
+  const [policyOptions, setPolicyOptions] = React.useState([]);
 
-  const filteredRows = React.useMemo(() => {
-    return flatRows.filter(r => {
-      const polKey = r.policy_id ?? r.id;
-      const okPol = selPolicies.length ? selPolicies.includes(polKey) : true;
-      const okUsr = selUsers.length ? selUsers.includes(r.username) : true;
-      return okPol && okUsr;
-    });
-  }, [flatRows, selPolicies, selUsers]);
+  React.useEffect(() => {
+    refresh();
+    policiesApi.list()
+      .then(ps => setPolicyOptions(ps.map(p => p.policy_id).filter(Boolean).sort()))
+      .catch(() => setPolicyOptions([]));
+  }, []);
 
   return (
     <Section>
@@ -74,8 +30,8 @@ export default function EvaluatePanel() {
             multiple
             disableCloseOnSelect
             options={policyOptions}
-            value={selPolicies}
-            onChange={(_, v) => setSelPolicies(v)}
+            value={query.policies}
+            onChange={(_, v) => setQuery({ policies: v })}
             size="small"
             sx={{ minWidth: 280 }}
             renderOption={(props, option, { selected }) => {
@@ -91,40 +47,57 @@ export default function EvaluatePanel() {
             renderInput={(params) => <TextField {...params} label="Filter by Policy" placeholder="Select policies" />}
           />
 
+          {/* usernames are typed (Enter adds one); the full user list is never loaded */}
           <Autocomplete
             multiple
-            disableCloseOnSelect
-            options={userOptions}
-            value={selUsers}
-            onChange={(_, v) => setSelUsers(v)}
+            freeSolo
+            options={[]}
+            value={query.users}
+            onChange={(_, v) => setQuery({ users: v.map(x => String(x).trim()).filter(Boolean) })}
             size="small"
             sx={{ minWidth: 240 }}
-            renderOption={(props, option, { selected }) => {
-              // prevent React key warning by not spreading the "key" prop
-              const { key, ...optionProps } = props;
-              return (
-                <li key={key} {...optionProps}>
-                  <Checkbox checked={selected} sx={{ mr: 1 }} />
-                  {option}
-                </li>
-              );
-            }}
-            renderInput={(params) => <TextField {...params} label="Filter by User" placeholder="Select users" />}
+            renderInput={(params) => <TextField {...params} label="Filter by User" placeholder="Type a username" />}
           />
 
-          <Button variant="outlined" onClick={() => { setSelPolicies([]); setSelUsers([]); }}>
+          <TextField
+            select
+            size="small"
+            label="Outcome"
+            value={query.passed}
+            onChange={(e) => setQuery({ passed: e.target.value })}
+            sx={{ minWidth: 120 }}
+          >
+            <MenuItem value="">All</MenuItem>
+            <MenuItem value="1">Passed</MenuItem>
+            <MenuItem value="0">Failed</MenuItem>
+          </TextField>
+
+          <Button variant="outlined" onClick={() => setQuery({ policies: [], users: [], passed: '' })}>
             Clear
           </Button>
-          <Button variant="outlined" onClick={() => exportCSV(filteredRows)}>Export CSV</Button>
+          <Button variant="outlined" href={exportUrl()} download>Export CSV</Button>
+          <Button variant="outlined" href={exportUrl('gzip')} download>CSV.gz</Button>
           <Button variant="contained" onClick={refresh}>Refresh</Button>
         </Stack>
       </ToolbarX>
 
       <DataTable
-        rows={filteredRows}
-        getRowId={(r, i) => `${r.username}-${(r.policy_id ?? r.id) ?? 'p'}-${r.field ?? ''}-${i}`}
-        columnOptions={{ render: { passed: (p) => (p.value ? '✓' : '✗') } }}
+        rows={rows}
+        getRowId={(r) => `${r.user_id}-${r.policy_id}`}
+        columnOptions={{
+          order: COLUMN_ORDER,
+          exclude: ['user_id'],
+          render: { passed: (p) => (p.value ? '✓' : '✗') },
+        }}
         height={600}
+        server={{
+          rowCount: total,
+          loading,
+          paginationModel: { page: query.page, pageSize: query.pageSize },
+          onPaginationModelChange: (m) => setQuery({ page: m.page, pageSize: m.pageSize }, true),
+          sortModel: query.sort ? [query.sort] : [],
+          onSortModelChange: (m) => setQuery({ sort: m[0] ?? null }),
+        }}
       />
     </Section>
   );
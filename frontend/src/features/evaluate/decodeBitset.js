@@ -0,0 +1,26 @@
+// Expands the compact `/evaluate?format=bitset` payload into the per-user
+// shape returned by plain `/evaluate` ({ username, overall_compliant, checks }).
+// Bit j of a user's bitset (LSB-first within each byte) is set when policy j
+// passed; `actual` and `note` are only sent for failed checks.
+function base64ToBytes(b64) {
+  const bin = atob(b64 || '');
+  const out = new Uint8Array(bin.length);
+  for (let i = 0; i < bin.length; i++) out[i] = bin.charCodeAt(i);
+  return out;
+}
+
+export function decodeBitset(payload) {
+  if (!payload || payload.format !== 'bitset') return payload;
+  const { policies = [], users = [], bits = [], failures = [] } = payload;
+
+  return users.map((username, i) => {
+    const bytes = base64ToBytes(bits[i]);
+    const failed = new Map((failures[i] || []).map(([j, actual, note]) => [j, { actual, note }]));
+    const checks = policies.map((p, j) => {
+      const passed = ((bytes[j >> 3] >> (j & 7)) & 1) === 1;
+      const f = failed.get(j);
+      return { ...p, actual: f ? f.actual : null, passed, note: f ? f.note : '' };
+    });
+    return { username, overall_compliant: failed.size === 0, checks };
+  });
+}
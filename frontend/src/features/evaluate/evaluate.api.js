@@ -1,2 +1,9 @@
-import { http } from '../../api/http'
-export const evaluateApi = { run: () => http('GET','/evaluate') }
+import { http, qs, API_BASE } from '../../api/http'
+import { decodeBitset } from './decodeBitset'
+export const evaluateApi = {
+  run: () => http('GET','/evaluate?format=bitset&engine=vector').then(decodeBitset),
+  // one page of flat check rows: { items, total, offset, limit }
+  checks: (params) => http('GET', `/evaluate/checks${qs(params)}`),
+  // streamed by the server; the browser saves it as a download
+  exportUrl: (params) => `${API_BASE}/evaluate/export${qs(params)}`,
+}
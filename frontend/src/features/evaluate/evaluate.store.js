@@ -1,8 +1,33 @@
 import { createStore } from '../../store/createStore'
 import { evaluateApi } from './evaluate.api'
+
+const filterParams = (q) => ({
+  username: q.users,
+  policy_id: q.policies,
+  passed: q.passed,
+  sort: q.sort?.field,
+  order: q.sort?.sort,
+})
+const toParams = (q) => ({ ...filterParams(q), limit: q.pageSize, offset: q.page * q.pageSize })
+
 export const useEvaluate = createStore([
-  (set)=>({
-    rows:[], error:'',
-    async refresh(){ try{ set({rows: await evaluateApi.run(), error:''}) }catch(e){ set({error:e.message}) } }
+  (set,get)=>({
+    rows:[], total:0, loading:false, error:'',
+    query:{ page:0, pageSize:25, sort:null, users:[], policies:[], passed:'' },
+    async refresh(){
+      const q = get().query
+      set({loading:true})
+      try{
+        const data = await evaluateApi.checks(toParams(q))
+        if (get().query === q) set({rows: data.items, total: data.total, error:''})
+      }catch(e){ set({error:e.message}) }
+      finally{ if (get().query === q) set({loading:false}) }
+    },
+    exportUrl(compress){ return evaluateApi.exportUrl({ ...filterParams(get().query), compress }) },
+    // filter changes go back to the first page; paging/sorting keep the filters
+    async setQuery(patch, keepPage=false){
+      set({query: {...get().query, ...patch, ...(keepPage ? {} : {page:0})}})
+      await get().refresh()
+    }
   })
 ])